@@ -0,0 +1,271 @@
+"""
+benchmarks/ann.py
+
+Measures VectorDatabase and YosemiteDatabase search: build time, index size on disk,
+peak RSS, throughput, p50/p99 latency and recall@k against exact search.
+
+Synthetic corpora are clustered Gaussian embeddings written to a memory-mapped file, so
+the 1M and 10M scales do not have to fit in memory (the annoy engine builds them with
+create_streaming). The text corpus is tutorials/documentai/docs, chunked and embedded
+with --model. Every case runs in a fresh process so its peak RSS is its own. With
+--baseline, results are compared against an earlier --output file and the run fails
+on a recall drop or latency rise beyond the tolerances.
+
+Example:
+    python benchmarks/ann.py --scales 10k 1m --engines annoy hnsw --output ann.json
+    python benchmarks/ann.py --text --model all-MiniLM-L6-v2 --baseline ann.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+DEFAULT_DOCS = os.path.join(os.path.dirname(__file__), "..", "..", "..", "tutorials", "documentai", "docs")
+
+BLOCK = 100_000
+
+def make_corpus(path: str, n: int, dimension: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Writes n clustered, unit-variance embeddings to path block by block and returns them memory-mapped."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    corpus = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dimension))
+    for start in range(0, n, BLOCK):
+        size = min(BLOCK, n - start)
+        corpus[start:start + size] = centers[rng.integers(0, clusters, size)] + 0.5 * rng.normal(size=(size, dimension))
+    corpus.flush()
+    return np.load(path, mmap_mode="r")
+
+def make_queries(n: int, dimension: int, clusters: int) -> np.ndarray:
+    """Queries from the same clusters as the corpus, but not in it."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    rng = np.random.default_rng(1)
+    return (centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dimension))).astype(np.float32)
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force top-k by cosine, one block of the corpus at a time."""
+    unit = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(corpus), BLOCK):
+        block = np.asarray(corpus[start:start + BLOCK], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1.0
+        scores = np.concatenate([best_scores, unit @ (block / norms[:, None]).T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))],
+                             axis=1)
+        top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+        best_ids, best_scores = np.take_along_axis(ids, top, axis=1), np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_ids, order, axis=1)
+
+def recall(found: List[List], truth: List[List]) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth))
+    total = sum(len(expected) for expected in truth)
+    return hits / total if total else 0.0
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+def timed_search(search, queries, k: int) -> Dict:
+    """Throughput over the whole batch, and p50/p99 latency with one query at a time."""
+    start = time.perf_counter()
+    found = search(queries, k)
+    batch = time.perf_counter() - start
+    latencies = []
+    for q in range(len(queries)):
+        start = time.perf_counter()
+        search(queries[q:q + 1], k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return {"found": found, "qps": len(queries) / batch if batch else float("inf"),
+            "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+
+def vector_case(config: Dict) -> Dict:
+    """One engine on one synthetic corpus; runs in its own process."""
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    corpus = np.load(config["corpus"], mmap_mode="r")
+    queries = np.load(config["queries"])
+    truth = np.load(config["truth"])[:, :config["k"]].tolist()
+    directory = tempfile.mkdtemp(dir=config["workdir"])
+    db = VectorDatabase(dimension=corpus.shape[1], engine=config["engine"], engine_options=config["engine_options"])
+
+    start = time.perf_counter()
+    if config["engine"] == "annoy":
+        rows = ((f"chunk {i}", corpus[i]) for i in range(len(corpus)))
+        db.create_streaming(os.path.join(directory, "db"), rows, num_trees=config["num_trees"])
+    else:
+        db.create([(f"chunk {i}", corpus[i]) for i in range(len(corpus))], num_trees=config["num_trees"])
+        db.save(os.path.join(directory, "db"))
+    build = time.perf_counter() - start
+
+    search = lambda batch, k: [[int(i) for i in row if i >= 0] for row in
+                               db.search_vectors(batch, k, search_k=config["search_k"]).indices]
+    measured = timed_search(search, queries, config["k"])
+    result = {"corpus": config["name"], "engine": config["engine"], "n": len(corpus), "dimension": corpus.shape[1],
+              "num_trees": config["num_trees"], "search_k": config["search_k"], "build_seconds": build,
+              "index_bytes": directory_size(os.path.join(directory, "db")),
+              "recall": recall(measured.pop("found"), truth), **measured, "peak_rss_mb": peak_rss_mb()}
+    shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+def text_case(config: Dict) -> Dict:
+    """VectorDatabase and YosemiteDatabase on the documentai docs; runs in its own process."""
+    from chunking import read_docs
+    from yosemite.ml.data.universal import YosemiteDatabase
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    texts = read_docs(config["docs"])
+    directory = tempfile.mkdtemp(dir=config["workdir"])
+    db = VectorDatabase(model_name=config["model"], chunker=config["chunker"], engine=config["engine"],
+                        engine_options=config["engine_options"])
+    start = time.perf_counter()
+    db.create(texts, num_trees=config["num_trees"])
+    db.save(os.path.join(directory, "vdb"))
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(db.sentences), size=min(config["queries"], len(db.sentences)), replace=False)
+    queries = [db.sentences[int(i)] for i in picked]
+    embedder = db._embedder()
+    query_vectors = np.asarray(embedder.embed(queries, as_tuples=False), dtype=np.float32)
+    k = config["k"]
+    truth = exact_neighbours(db.index.get_item_vectors(np.arange(len(db.sentences))), query_vectors, k).tolist()
+
+    search = lambda batch, n: [[int(i) for i in row if i >= 0] for row in db.search_vectors(batch, n).indices]
+    measured = timed_search(search, query_vectors, k)
+    results = [{"corpus": "documentai", "store": "VectorDatabase", "engine": config["engine"],
+                "n": len(db.sentences), "build_seconds": build, "index_bytes": directory_size(os.path.join(directory, "vdb")),
+                "recall": recall(measured.pop("found"), truth), **measured}]
+
+    # YosemiteDatabase narrows by keyword first, so recall is measured on chunk text
+    # against the exact top-k over every chunk, and a query is its text, embedding included.
+    yosemite = YosemiteDatabase(model_name=config["model"], chunker=config["chunker"], engine=config["engine"])
+    start = time.perf_counter()
+    yosemite.create(os.path.join(directory, "whoosh"))
+    yosemite.add([{"content": text} for text in texts])
+    build = time.perf_counter() - start
+    expected = [[db.sentences[i] for i in row] for row in truth]
+    search = lambda batch, n: [[chunk for _, chunk, _ in yosemite.search(query, k=n)] for query in batch]
+    measured = timed_search(search, queries, k)
+    results.append({"corpus": "documentai", "store": "YosemiteDatabase", "engine": config["engine"],
+                    "n": len(db.sentences), "build_seconds": build,
+                    "index_bytes": directory_size(os.path.join(directory, "whoosh")),
+                    "recall": recall(measured.pop("found"), expected), **measured})
+    for result in results:
+        result["peak_rss_mb"] = peak_rss_mb()
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def run_isolated(function, config: Dict):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, config).result()
+
+def compare(results: List[Dict], baseline: List[Dict], recall_drop: float, latency_rise: float) -> List[str]:
+    """Returns a line for every case that got worse than its baseline by more than the tolerances."""
+    key = lambda result: (result["corpus"], result.get("store", "VectorDatabase"), result["engine"])
+    previous = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        if result["recall"] < before["recall"] - recall_drop:
+            regressions.append(f"{key(result)}: recall {before['recall']:.3f} -> {result['recall']:.3f}")
+        if result["p50_ms"] > before["p50_ms"] * (1 + latency_rise):
+            regressions.append(f"{key(result)}: p50 {before['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall and latency of yosemite's vector stores.")
+    parser.add_argument("--scales", nargs="*", default=["10k"], choices=list(SCALES), help="Synthetic corpus sizes")
+    parser.add_argument("--engines", nargs="*", default=["annoy", "exact", "hnsw"], help="Engines to measure")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic embedding dimension")
+    parser.add_argument("--clusters", type=int, default=100, help="Clusters in the synthetic corpora")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per case")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query; recall is recall@k")
+    parser.add_argument("--num-trees", type=int, default=10, help="Annoy trees")
+    parser.add_argument("--search-k", type=int, default=-1, help="search_k passed to every search")
+    parser.add_argument("--text", action="store_true", help="Also run the documentai text corpus")
+    parser.add_argument("--docs", default=DEFAULT_DOCS, help="Directory of .txt/.pdf documents for --text")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model for --text")
+    parser.add_argument("--chunker", default="rule", help="Chunker backend for --text")
+    parser.add_argument("--workdir", default=None, help="Where corpora and indexes are written; a temporary directory by default")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", default=None, help="Fail if results are worse than this earlier --output")
+    parser.add_argument("--recall-drop", type=float, default=0.02, help="Tolerated absolute recall drop")
+    parser.add_argument("--latency-rise", type=float, default=0.25, help="Tolerated relative p50 rise")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="yosemite-ann-")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    for scale in args.scales:
+        n = SCALES[scale]
+        corpus_path = os.path.join(workdir, f"corpus-{scale}-{args.dimension}.npy")
+        if not os.path.isfile(corpus_path):
+            make_corpus(corpus_path, n, args.dimension, args.clusters)
+        queries_path = os.path.join(workdir, f"queries-{args.dimension}.npy")
+        queries = make_queries(args.queries, args.dimension, args.clusters)
+        np.save(queries_path, queries)
+        truth_path = os.path.join(workdir, f"truth-{scale}-{args.dimension}-{args.queries}-{args.k}.npy")
+        if not os.path.isfile(truth_path):
+            start = time.perf_counter()
+            np.save(truth_path, exact_neighbours(np.load(corpus_path, mmap_mode="r"), queries, args.k))
+            print(f"ground truth for {scale}: {time.perf_counter() - start:.1f} s")
+        for engine in args.engines:
+            config = {"name": f"synthetic-{scale}", "corpus": corpus_path, "queries": queries_path, "truth": truth_path,
+                      "engine": engine, "engine_options": {}, "num_trees": args.num_trees, "search_k": args.search_k,
+                      "k": args.k, "workdir": workdir}
+            try:
+                result = run_isolated(vector_case, config)
+            except (ImportError, MemoryError) as e:
+                print(f"Skipping {engine} at {scale}: {e}")
+                continue
+            results.append(result)
+            print(json.dumps(result))
+    if args.text:
+        for engine in args.engines:
+            config = {"docs": args.docs, "model": args.model, "chunker": args.chunker, "engine": engine,
+                      "engine_options": {}, "num_trees": args.num_trees, "queries": args.queries, "k": args.k,
+                      "workdir": workdir}
+            try:
+                text_results = run_isolated(text_case, config)
+            except (ImportError, OSError) as e:
+                print(f"Skipping the text corpus with {engine}: {e}")
+                continue
+            results.extend(text_results)
+            for result in text_results:
+                print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.recall_drop, args.latency_rise)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
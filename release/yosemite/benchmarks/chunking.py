@@ -0,0 +1,104 @@
+"""
+benchmarks/chunking.py
+
+Compares the Chunker backends on a directory of documents: model load time,
+throughput, and how often the rule-based splitter agrees with spaCy on where
+sentences end.
+
+Example:
+    python benchmarks/chunking.py --docs ../../tutorials/documentai/docs
+"""
+
+from yosemite.ml.text.util import Chunker
+from typing import List, Set
+import argparse
+import json
+import os
+import time
+
+DEFAULT_DOCS = os.path.join(os.path.dirname(__file__), "..", "..", "..", "tutorials", "documentai", "docs")
+
+def read_docs(directory: str) -> List[str]:
+    texts = []
+    for file_name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, file_name)
+        if file_name.endswith(".txt"):
+            with open(path, "r", encoding="utf-8") as file:
+                texts.append(file.read())
+        elif file_name.endswith(".pdf"):
+            try:
+                from PyPDF2 import PdfReader
+            except ImportError:
+                continue
+            with open(path, "rb") as file:
+                texts.append(" ".join(page.extract_text() for page in PdfReader(file).pages))
+    return texts
+
+def spacy_boundaries(chunker: Chunker, texts: List[str]) -> List[Set[int]]:
+    boundaries = []
+    for doc in chunker.sentence_nlp.pipe(texts):
+        boundaries.append({len(doc.text[:sent.end_char].rstrip()) for sent in doc.sents if sent.text.strip()})
+    return boundaries
+
+def rule_boundaries(chunker: Chunker, texts: List[str]) -> List[Set[int]]:
+    return [{end for _, end in chunker.splitter.spans(text)} for text in texts]
+
+def run(backend: str, texts: List[str], repeat: int):
+    start = time.perf_counter()
+    chunker = Chunker(backend=backend)
+    if chunker.splitter is None:
+        chunker.sentence_nlp
+    load = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sentences = sum(len(chunks) for _, chunks in chunker.chunk_many(texts))
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+    chars = sum(len(text) for text in texts)
+    return chunker, {
+        "backend": backend,
+        "load_seconds": load,
+        "seconds": elapsed,
+        "docs_per_second": len(texts) / elapsed if elapsed else float("inf"),
+        "chars_per_second": chars / elapsed if elapsed else float("inf"),
+        "sentences": sentences,
+    }
+
+def agreement(reference: List[Set[int]], candidate: List[Set[int]]):
+    matched = sum(len(r & c) for r, c in zip(reference, candidate))
+    predicted = sum(len(c) for c in candidate)
+    expected = sum(len(r) for r in reference)
+    precision = matched / predicted if predicted else 0.0
+    recall = matched / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Chunker backends.")
+    parser.add_argument("--docs", default=DEFAULT_DOCS, help="Directory of .txt/.pdf documents")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per backend; the fastest is reported")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    texts = read_docs(args.docs)
+    rule, rule_results = run("rule", texts, args.repeat)
+    results = {"docs": len(texts), "chars": sum(len(text) for text in texts), "backends": [rule_results]}
+
+    try:
+        spacy, spacy_results = run("spacy", texts, args.repeat)
+    except (ImportError, OSError) as e:
+        print(f"Skipping the spacy backend: {e}")
+    else:
+        results["backends"].append(spacy_results)
+        results["agreement"] = agreement(spacy_boundaries(spacy, texts), rule_boundaries(rule, texts))
+        results["speedup"] = spacy_results["seconds"] / rule_results["seconds"] if rule_results["seconds"] else None
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+benchmarks/importtime.py
+
+Records how long importing each part of yosemite takes, using `python -X importtime`
+in a fresh interpreter per module, and exits non-zero when a module goes over its
+budget or pulls in one of the heavy libraries that should only load on first use.
+
+Example:
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --scale 2 --output importtime.json
+"""
+
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+# Cumulative import time budgets, in milliseconds.
+BUDGETS = {
+    "yosemite": 25,
+    "yosemite.cli": 100,
+    "yosemite.core": 25,
+    "yosemite.ml": 25,
+    "yosemite.ml.text.util": 25,
+    "yosemite.ml.text.cross_encode": 25,
+    "yosemite.ml.text.semantic_search": 25,
+    "yosemite.ml.text.sentence_similarity": 25,
+    "yosemite.ml.text.loss": 25,
+    "yosemite.ml.llms": 25,
+    "yosemite.ml.data.db": 250,
+    "yosemite.ml.data.vdb": 300,
+    "yosemite.ml.data.universal": 400,
+    "yosemite.ml.experimental.database": 300,
+}
+
+# Libraries that cost seconds to import and must wait until they are actually used.
+HEAVY = ("torch", "sentence_transformers", "transformers", "spacy", "onnxruntime", "pandas", "pyspark",
+         "PyPDF2", "ebooklib", "anthropic", "openai", "instructor", "prompt_toolkit", "art")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure(module: str) -> Tuple[Optional[float], List[str], Optional[str]]:
+    """Imports module in a fresh interpreter; returns its cumulative milliseconds, the heavy libraries it loaded, and any error."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True)
+    total, loaded = None, []
+    for line in process.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        if name == module:
+            total = int(match.group(2)) / 1000.0
+        if name.split(".")[0] in HEAVY and name.split(".")[0] not in loaded:
+            loaded.append(name.split(".")[0])
+    if process.returncode != 0:
+        return None, loaded, process.stderr.strip().splitlines()[-1]
+    return total, loaded, None
+
+def run(budgets: Dict[str, float], repeat: int, scale: float) -> Tuple[List[dict], bool]:
+    results, passed = [], True
+    for module, budget in budgets.items():
+        runs = [measure(module) for _ in range(repeat)]
+        errors = [error for _, _, error in runs if error]
+        result = {"module": module, "budget_ms": budget * scale}
+        if errors:
+            # A missing optional dependency (a Rust extension, pyspark) is not a budget failure.
+            result.update({"status": "skipped", "error": errors[0]})
+        else:
+            result["ms"] = min(total for total, _, _ in runs)
+            result["heavy"] = runs[0][1]
+            result["status"] = "ok" if result["ms"] <= result["budget_ms"] and not result["heavy"] else "over"
+            passed = passed and result["status"] == "ok"
+        results.append(result)
+    return results, passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check yosemite's import time against a budget.")
+    parser.add_argument("--modules", nargs="*", default=None, help="Only check these modules")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest is reported")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. on slow machines")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    budgets = {module: BUDGETS.get(module, 25) for module in args.modules} if args.modules else BUDGETS
+    results, passed = run(budgets, args.repeat, args.scale)
+
+    for result in results:
+        if result["status"] == "skipped":
+            print(f"{result['module']:<40} {'-':>9} / {result['budget_ms']:>6.0f} ms  skipped ({result['error']})")
+            continue
+        heavy = f"  loads {', '.join(result['heavy'])}" if result["heavy"] else ""
+        print(f"{result['module']:<40} {result['ms']:>9.1f} / {result['budget_ms']:>6.0f} ms  {result['status']}{heavy}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
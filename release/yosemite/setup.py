@@ -41,6 +41,11 @@ Yosemite
 'spacy',
 'pyspark[sql]',
 "Whoosh",
+        ],
+        'onnx' : [
+'onnx',
+'onnxruntime',
+'transformers',
         ]
     }
 )
\ No newline at end of file
@@ -0,0 +1,33 @@
+import os
+import string
+import pytest
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    """Runs every test in its own directory, so defaults such as Database's ./databases/db never land in the tree."""
+    monkeypatch.chdir(tmp_path)
+
+WORDS = ["the", "is", "of", "doc", "document", "new", "changed", "brand", "topic", "more", "hello", "world"]
+
+@pytest.fixture(scope="session")
+def model(tmp_path_factory) -> str:
+    """The path of a tiny, randomly initialised SentenceTransformer, so tests never download a model."""
+    pytest.importorskip("sentence_transformers")
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    root = str(tmp_path_factory.mktemp("model"))
+    bert, path = os.path.join(root, "bert"), os.path.join(root, "st")
+    os.makedirs(bert)
+    vocab = (["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(string.ascii_lowercase + string.digits)
+             + ["##" + c for c in string.ascii_lowercase + string.digits] + list(".,!?'\"") + WORDS)
+    with open(os.path.join(bert, "vocab.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(bert, "vocab.txt")).save_pretrained(bert)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(bert)
+    transformer = models.Transformer(bert)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()]).save(path)
+    return path
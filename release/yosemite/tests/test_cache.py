@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pytest
+from yosemite.ml.text.util.cache import EmbeddingCache, QueryCache
+
+def _vectors(n: int, dimension: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+
+def test_round_trip_across_reopen(tmp_path):
+    texts = [f"text {i}" for i in range(10)]
+    vectors = _vectors(10)
+    cache = EmbeddingCache(str(tmp_path), "model", shard_size=4)
+    cache.put_many(texts, vectors)
+
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    found_vectors, found = reopened.get_many(texts + ["missing"])
+    assert found.tolist() == [True] * 10 + [False]
+    np.testing.assert_array_equal(found_vectors[:10], vectors)
+    assert reopened.shard_size == 4
+    assert len(reopened) == 10
+
+def test_duplicates_are_stored_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a", "a", "b"], _vectors(3))
+    cache.put_many(["b"], _vectors(1, seed=1))
+    assert len(cache) == 2
+
+def test_backends_are_kept_apart(tmp_path):
+    torch = EmbeddingCache(str(tmp_path), "model", backend="torch")
+    onnx = EmbeddingCache(str(tmp_path), "model", backend="onnx")
+    assert torch.path != onnx.path
+    torch.put_many(["a"], _vectors(1))
+    assert not onnx.get_many(["a"])[1].any()
+
+def test_reopening_with_another_backend_raises(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", backend="onnx")
+    cache.put_many(["a"], _vectors(1))
+    with open(os.path.join(cache.path, "meta.json"), "r+", encoding="utf-8") as file:
+        meta = file.read().replace('"onnx"', '"onnx-int8"')
+        file.seek(0)
+        file.write(meta)
+        file.truncate()
+    with pytest.raises(ValueError):
+        EmbeddingCache(str(tmp_path), "model", backend="onnx")
+
+def test_recovers_from_an_interrupted_write(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", shard_size=4)
+    vectors = _vectors(6)
+    cache.put_many([f"text {i}" for i in range(6)], vectors)
+    # A put_many that wrote vectors into two shards, plus half an index record, then died.
+    with open(os.path.join(cache.path, "shard-00001.f32"), "ab") as file:
+        file.write(_vectors(2, seed=1).tobytes())
+    with open(os.path.join(cache.path, "shard-00002.f32"), "wb") as file:
+        file.write(_vectors(1, seed=2).tobytes())
+    with open(os.path.join(cache.path, "index.bin"), "ab") as file:
+        file.write(b"\0" * 7)
+
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert len(reopened) == 6
+    assert not os.path.exists(os.path.join(cache.path, "shard-00002.f32"))
+    assert os.path.getsize(os.path.join(cache.path, "shard-00001.f32")) == 2 * 8 * 4
+
+    added = _vectors(3, seed=3)
+    reopened.put_many(["new 0", "new 1", "new 2"], added)
+    again = EmbeddingCache(str(tmp_path), "model")
+    found_vectors, found = again.get_many([f"text {i}" for i in range(6)] + ["new 0", "new 1", "new 2"])
+    assert found.all()
+    np.testing.assert_array_equal(found_vectors, np.concatenate([vectors, added]))
+
+def test_query_cache_evicts_by_bytes():
+    cache = QueryCache(max_bytes=400, ttl=None)
+    cache.put_many("model", ["a", "b", "c"], _vectors(3, dimension=32))
+    found = cache.get_many("model", ["a", "b", "c"])[1]
+    assert found.tolist() == [False, True, True]
+    assert cache.get_many("other", ["c"])[1].tolist() == [False]
+    assert cache.get_many("model", ["  c "])[1].tolist() == [True]
+
+def test_vector_database_reuses_one_cache(tmp_path, model):
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    db = VectorDatabase(model_name=model, chunker="rule", cache_dir=str(tmp_path / "cache"))
+    db.create(["Doc one.", "Doc two."])
+    cache = db._cache
+    db.add(["Doc one.", "Doc three."])
+    db.add(["Doc three."])
+    assert db._cache is cache
+    assert (cache.hits, cache.misses, len(cache)) == (2, 3, 3)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from yosemite.ml.data.filters import Column, MetadataColumns
+from yosemite.ml.data.vdb import VectorDatabase
+
+def _tuples(n: int, dimension: int = 8, seed: int = 0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+    return [(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)]
+
+def test_column_rows_cover_saved_and_added_rows():
+    column = Column(np.array([0, 1, 0, 2], dtype=np.int32), ["a", "b", "c"])
+    column.extend("b", 2)
+    column.extend("d", 1)
+    assert column.rows(["a"]).tolist() == [0, 2]
+    assert column.rows(["b", "d"]).tolist() == [1, 4, 5, 6]
+    assert column.rows(["missing"]).tolist() == []
+
+def test_column_with_repeated_values():
+    # A streamed id table interns only consecutive runs, so "a" can have two codes.
+    column = Column(np.array([0, 1, 2], dtype=np.int32), ["a", "b", "a"])
+    assert column.rows(["a"]).tolist() == [0, 2]
+    assert np.unpackbits(column.bitmap("a"), count=3).tolist() == [1, 0, 1]
+
+def test_metadata_filters_and_or():
+    metadata = MetadataColumns()
+    metadata.extend({"source": "x", "tenant": "1"}, 2)
+    metadata.extend({"source": "y"}, 1)
+    metadata.extend({"source": "x", "tenant": "2"}, 1)
+    assert metadata.mask({"source": "x"}).tolist() == [True, True, False, True]
+    assert metadata.mask({"source": "x", "tenant": ["2", "3"]}).tolist() == [False, False, False, True]
+    with pytest.raises(ValueError):
+        metadata.mask({"unknown": "x"})
+
+def test_create_with_tuples_keeps_ids():
+    db = VectorDatabase(dimension=8)
+    tuples = _tuples(4)
+    db.create(tuples, ids=["a", "b", "c", "d"])
+    assert list(db.document_ids) == ["a", "b", "c", "d"]
+    found = db.search_vectors(np.array([tuples[2][1]], dtype=np.float32), 1, filter={"document_id": "c"})
+    assert found.indices[0][0] == 2
+
+def test_create_requires_one_id_per_tuple():
+    with pytest.raises(ValueError):
+        VectorDatabase(dimension=8).create(_tuples(3), ids=["a"])
+
+def test_second_create_resets_metadata(model):
+    db = VectorDatabase(model_name=model, chunker="rule")
+    db.create(["Doc one. Doc two.", "Doc three."], metadata=[{"a": "1"}, {"a": "2"}])
+    db.create(["Doc four."], metadata=[{"b": "3"}])
+    assert db.metadata.rows == len(db.sentences) == 1
+    assert db.metadata.row(0) == {"b": "3"}
@@ -0,0 +1,36 @@
+import os
+import string
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from yosemite.ml.text.util.onnx_engine import OnnxEngine
+
+@pytest.fixture(scope="module")
+def cross_encoder(tmp_path_factory) -> str:
+    """The path of a tiny, randomly initialised single-label cross-encoder, with weights large enough that truncation shows in its scores."""
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    path = str(tmp_path_factory.mktemp("cross_encoder"))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(string.ascii_lowercase + string.digits)
+    with open(os.path.join(path, "vocab.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=128, num_labels=1,
+                        initializer_range=0.5)
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+def test_predict_truncates_to_max_length(cross_encoder, tmp_path):
+    from sentence_transformers import CrossEncoder
+
+    engine = OnnxEngine(cross_encoder, kind="cross_encoder", cache_dir=str(tmp_path), quantize=False)
+    pairs = [("a b c", " ".join(string.ascii_lowercase * 2)), ("x", "y z")]
+    reference = CrossEncoder(cross_encoder, max_length=8, device="cpu").predict(pairs)
+
+    np.testing.assert_allclose(engine.predict(pairs, max_length=8), reference, atol=1e-4)
+    assert not np.allclose(engine.predict(pairs)[0], reference[0], atol=1e-4)
+    assert engine.check_parity(max_length=8)["passed"]
@@ -0,0 +1,28 @@
+import numpy as np
+from yosemite.ml.text.util import SentenceTransformer
+
+def test_embed_parallel_matches_encode(tmp_path, model):
+    embedder = SentenceTransformer(model, cache=str(tmp_path / "cache"))
+    sentences = [f"doc {i}" for i in range(10)]
+    vectors = np.concatenate(list(embedder.embed_parallel(sentences, processes=1, chunk_size=4)))
+    np.testing.assert_allclose(vectors, SentenceTransformer(model).encode(sentences), atol=1e-5)
+
+def test_mostly_cached_input_is_not_read_far_ahead(tmp_path, model):
+    embedder = SentenceTransformer(model, cache=str(tmp_path / "cache"))
+    sentences = [f"doc {i}" for i in range(200)]
+    embedder.encode(sentences[:-2])
+    consumed = []
+
+    def stream():
+        for sentence in sentences:
+            consumed.append(sentence)
+            yield sentence
+
+    chunks = embedder.embed_parallel(stream(), processes=1, chunk_size=4)
+    first = next(chunks)
+    # One window is two chunks per process; the misses at the very end must not be searched for first.
+    assert len(consumed) <= 2 * 4
+    vectors = np.concatenate([first] + list(chunks))
+    assert len(vectors) == 200
+    np.testing.assert_allclose(vectors[-2:], SentenceTransformer(model).encode(sentences[-2:]), atol=1e-5)
+    assert len(embedder.cache) == 200
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+import pytest
+from yosemite.ml.data.quantize import QuantizedIndex
+
+DIMENSION = 16
+
+@pytest.mark.parametrize("mode", QuantizedIndex.modes)
+def test_rescored_search_finds_the_exact_neighbour(mode):
+    vectors = np.random.default_rng(0).standard_normal((200, DIMENSION)).astype(np.float32)
+    index = QuantizedIndex(DIMENSION, mode, rescore=20)
+    index.add_items(np.arange(200), vectors)
+    index.build(10)
+    try:
+        ids, distances = index.get_nns_by_vector(vectors[42], 5, include_distances=True)
+        assert ids[0] == 42 and distances[0] == pytest.approx(0.0, abs=1e-3)
+    finally:
+        index.close()
+
+@pytest.mark.parametrize("mode", QuantizedIndex.modes)
+def test_empty_index_returns_no_results(mode):
+    index = QuantizedIndex(DIMENSION, mode)
+    index.build(10)
+    assert index.get_nns_by_vector(np.ones(DIMENSION), 3, include_distances=True) == ([], [])
+    index.close()
+
+def test_close_removes_the_temporary_directory():
+    index = QuantizedIndex(DIMENSION, "int8")
+    index.add_items(np.arange(3), np.ones((3, DIMENSION), dtype=np.float32))
+    index.build(10)
+    path = index._temporary
+    assert os.path.isdir(path)
+    index.close()
+    assert not os.path.exists(path)
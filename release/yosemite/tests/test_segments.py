@@ -0,0 +1,98 @@
+import threading
+import numpy as np
+from yosemite.ml.data.engines import create_engine
+from yosemite.ml.data.segments import SegmentedIndex
+
+DIMENSION = 8
+
+def _index(**options) -> SegmentedIndex:
+    options = {"delta_size": 10, "max_segments": 3, "background": False, **options}
+    return SegmentedIndex(DIMENSION, lambda: create_engine("exact", DIMENSION), **options)
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype(np.float32)
+
+def _brute_force(vectors: np.ndarray, live: np.ndarray, query: np.ndarray, n: int) -> list:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed[live] @ (query / np.linalg.norm(query))
+    return live[np.argsort(-scores, kind="stable")[:n]].tolist()
+
+def test_search_matches_brute_force_across_segments_and_delta():
+    index, vectors = _index(), _vectors(55)
+    # Five full deltas become segments; the last five vectors stay in the delta.
+    for start in range(0, 55, 10):
+        index.add_items(np.arange(start, min(start + 10, 55)), vectors[start:start + 10])
+    assert len(index.segments) >= 2 and sum(len(segment) for segment in index.segments) < 55
+    query = _vectors(1, seed=1)[0]
+    assert index.get_nns_by_vector(query, 10) == _brute_force(vectors, np.arange(55), query, 10)
+
+def test_deletes_are_hidden_and_counted_once():
+    index, vectors = _index(), _vectors(40)
+    index.add_items(np.arange(40), vectors)
+    for i in [3, 3, 17, 39, 1000]:
+        index.delete(i)
+    assert index.get_n_items() == 37
+    live = np.array([i for i in range(40) if i not in (3, 17, 39)])
+    query = vectors[17]
+    assert index.get_nns_by_vector(query, 40) == _brute_force(vectors, live, query, 40)
+    assert index.live(np.array([2, 3, 39])).tolist() == [True, False, False]
+
+def test_compact_merges_and_purges_tombstones():
+    index, vectors = _index(purge_ratio=0.2), _vectors(60)
+    index.add_items(np.arange(60), vectors)
+    for i in range(0, 60, 2):
+        index.delete(i)
+    index.compact()
+    assert len(index.segments) <= 3
+    assert not index.tombstones
+    assert sum(len(segment) for segment in index.segments) == 30
+    assert sorted(index.get_nns_by_vector(vectors[1], 60)) == list(range(1, 60, 2))
+
+def test_rebuild_makes_one_segment_with_new_trees():
+    index = SegmentedIndex(DIMENSION, lambda: create_engine("annoy", DIMENSION), delta_size=10, background=False)
+    vectors = _vectors(35)
+    index.add_items(np.arange(35), vectors)
+    index.delete(5)
+    index.rebuild(num_trees=4)
+    assert len(index.segments) == 1 and index.num_trees == 4
+    assert index.get_n_items() == 34
+    assert 5 not in index.segments[0].ids.tolist()
+
+def test_rebuild_and_background_compaction_do_not_duplicate_items():
+    index = _index(background=True, delta_size=5, max_segments=2)
+    vectors = _vectors(200)
+    try:
+        writer = threading.Thread(target=lambda: [index.add_items(np.arange(i, i + 5), vectors[i:i + 5])
+                                                  for i in range(0, 200, 5)])
+        writer.start()
+        index.rebuild(num_trees=2)
+        writer.join()
+        index.compact()
+        ids = np.concatenate([segment.ids for segment in index.segments])
+        assert sorted(ids.tolist()) == list(range(200))
+        assert index.get_n_items() == 200
+    finally:
+        index.close()
+
+def test_set_tombstones_ignores_missing_ids():
+    index = _index()
+    index.add_items(np.arange(20), _vectors(20))
+    index.compact()
+    index.set_tombstones(np.array([1, 2, 500]))
+    assert index.tombstones == {1, 2}
+    assert index.get_n_items() == 18
+
+def test_replacing_the_index_stops_its_compactor(tmp_path):
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    vectors = _vectors(20)
+    db = VectorDatabase(dimension=DIMENSION, delta_size=4)
+    db.create([(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)])
+    db.save(str(tmp_path / "db"))
+    before = {thread.ident for thread in threading.enumerate()}
+    for _ in range(3):
+        db.load(str(tmp_path / "db"))
+        db.delete("missing")
+        db.index.add_items(np.arange(20, 25), _vectors(5, seed=1))
+    db.close()
+    assert {thread.ident for thread in threading.enumerate()} <= before
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+import pytest
+
+pytest.importorskip("whoosh")
+from whoosh.fields import ID, TEXT, Schema
+from yosemite.ml.data.db import Database
+from yosemite.serve.client import Client
+from yosemite.serve.server import SearchServer
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    path = str(tmp_path / "whoosh")
+    db = Database()
+    db.create(path, schema=Schema(id=ID(stored=True, unique=True), content=TEXT(stored=True)))
+    db.add([{"id": "a", "content": "hello world"}, {"id": "b", "content": "goodbye moon"}])
+    return path
+
+def _start(server: SearchServer) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.time() + 60
+    while not os.path.exists(server.socket_path):
+        assert thread.is_alive() and time.time() < deadline
+        time.sleep(0.02)
+    return thread
+
+def test_round_trip(tmp_path, database, model):
+    server = SearchServer(str(tmp_path / "s.sock"), database=database, model_name=model, cross_encoder=None)
+    thread = _start(server)
+    assert server.embedder is None
+    with Client(server.socket_path, timeout=60) as client:
+        assert client.ping() == os.getpid()
+        assert client.search("hello", store="text") == [{"document_id": "a", "text": "hello world"}]
+        assert client.search_batch(["goodbye", "hello"], k=1) == [[{"document_id": "b", "text": "goodbye moon"}],
+                                                                   [{"document_id": "a", "text": "hello world"}]]
+        vectors = client.embed(["hello world", "goodbye moon"])
+        assert vectors.shape == (2, 32)
+        with pytest.raises(RuntimeError, match="cross-encoder"):
+            client.rerank("hello", ["a"])
+        with pytest.raises(RuntimeError, match="VectorDatabase"):
+            client.search("hello", store="vectors")
+        stats = client.stats()
+        assert stats["stores"]["text"]["documents"] == 2 and stats["requests"] >= 5
+        client.shutdown()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert not os.path.exists(server.socket_path)
+
+def test_text_only_server_loads_no_model(tmp_path, database):
+    server = SearchServer(str(tmp_path / "s.sock"), database=database)
+    server.load()
+    assert server.embedder is None and server.cross_encoder is None
+
+def test_stop_before_serving(tmp_path, database):
+    server = SearchServer(str(tmp_path / "s.sock"), database=database)
+    server.stop()
+    server.serve_forever()
+    assert not os.path.exists(server.socket_path)
+
+def test_client_without_server(tmp_path):
+    with pytest.raises(ConnectionError):
+        Client(str(tmp_path / "missing.sock"))
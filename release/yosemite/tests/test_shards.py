@@ -0,0 +1,47 @@
+import os
+import pytest
+from yosemite.ml.data.shards import ShardedDatabase, rebalance, read_shards, shard_of
+
+DOCUMENTS = [f"Document {i} of topic {i % 5}." for i in range(30)]
+IDS = [f"doc-{i}" for i in range(30)]
+
+@pytest.fixture
+def sharded(tmp_path, model) -> str:
+    path = str(tmp_path / "shards")
+    with ShardedDatabase(path, 2, model_name=model, chunker="rule") as db:
+        db.add(DOCUMENTS, ids=IDS)
+        db.save()
+    return path
+
+def test_reopen_uses_the_saved_model(sharded, model):
+    with ShardedDatabase(sharded) as db:
+        assert db.options["model_name"] == model
+        assert db.options["chunker"] == "rule"
+        assert sum(db.counts()) == 30
+        assert db.counts() == [sum(shard_of(doc_id, 2) == n for doc_id in IDS) for n in range(2)]
+        hits = db.search(DOCUMENTS[7], 30)
+        assert len(hits) == 30
+        assert {hit[3] for hit in hits} == set(IDS)
+        assert db.delete("doc-3") == 1
+        assert "doc-3" not in {hit[3] for hit in db.search(DOCUMENTS[3], 30)}
+
+def test_contradicting_options_raise(sharded):
+    with pytest.raises(ValueError):
+        ShardedDatabase(sharded, model_name="all-MiniLM-L6-v2")
+
+def test_rebalance_keeps_every_document(sharded):
+    rebalance(sharded, 3)
+    assert read_shards(sharded) == 3
+    with ShardedDatabase(sharded) as db:
+        assert sum(db.counts()) == 30
+        assert {hit[3] for hit in db.search(DOCUMENTS[0], 30)} == set(IDS)
+
+def test_rebalance_refuses_other_engines(tmp_path, model):
+    path, cache = str(tmp_path / "exact"), str(tmp_path / "cache")
+    with ShardedDatabase(path, 2, model_name=model, chunker="rule", engine="exact", cache_dir=cache) as db:
+        db.add(DOCUMENTS[:6], ids=IDS[:6])
+        db.save()
+    # Each shard process writes its own cache.
+    assert sorted(os.listdir(cache)) == ["shard-000", "shard-001"]
+    with pytest.raises(ValueError):
+        rebalance(path, 3)
@@ -0,0 +1,86 @@
+import json
+import os
+import numpy as np
+import pytest
+from yosemite.ml.data.storage import IdTable, TextArena, _append, read_manifest
+from yosemite.ml.data.vdb import VectorDatabase
+
+def _tuples(n: int, dimension: int = 8, seed: int = 0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+    return [(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)]
+
+def test_text_arena_round_trip(tmp_path):
+    texts = ["", "héllo", "world", "x" * 1000]
+    assert TextArena.write(str(tmp_path), "t", texts) == 4
+    assert list(TextArena.open(str(tmp_path), "t")) == texts
+    assert TextArena.append(str(tmp_path), "t", ["more"], 4) == 5
+    # Strings past keep, like those of an append whose manifest was never written, are replaced.
+    TextArena.append(str(tmp_path), "t", ["again"], 4)
+    assert list(TextArena.open(str(tmp_path), "t")) == texts + ["again"]
+    assert list(TextArena.open(str(tmp_path), "t", count=2)) == texts[:2]
+
+def test_npy_append_keeps_a_valid_header(tmp_path):
+    path = str(tmp_path / "a.npy")
+    np.save(path, np.arange(5, dtype=np.int32))
+    _append(path, np.array([7, 8]), 3)
+    np.testing.assert_array_equal(np.load(path), [0, 1, 2, 7, 8])
+    assert np.load(path).dtype == np.int32
+
+def test_id_table_round_trip(tmp_path):
+    ids = ["a", "a", "b", "a", "c"]
+    IdTable.write(str(tmp_path), ids)
+    table = IdTable.open(str(tmp_path))
+    assert list(table) == ids
+    assert len(table.names) == 3
+    IdTable.append(str(tmp_path), np.array([1, 3], dtype=np.int32), ["d"], 5, 3)
+    assert list(IdTable.open(str(tmp_path))) == ids + ["b", "d"]
+
+def test_vector_database_round_trip(tmp_path):
+    tuples = _tuples(20)
+    db = VectorDatabase(dimension=8)
+    db.create(tuples, ids=[f"d{i // 2}" for i in range(20)], metadata=[{"tenant": str(i % 3)} for i in range(20)])
+    db.save(str(tmp_path / "db"))
+    manifest = read_manifest(str(tmp_path / "db"))
+    assert manifest["count"] == 20 and manifest["dimension"] == 8
+
+    loaded = VectorDatabase(dimension=8)
+    loaded.load(str(tmp_path / "db"))
+    assert list(loaded.sentences) == [text for text, _ in tuples]
+    assert list(loaded.document_ids) == [f"d{i // 2}" for i in range(20)]
+    assert loaded.metadata.row(4) == {"tenant": "1"}
+    query = np.array([tuples[7][1]], dtype=np.float32)
+    assert loaded.search_vectors(query, 1).indices[0][0] == 7
+    assert loaded.search_vectors(query, 1, filter={"document_id": "d3"}).indices[0][0] == 7
+    assert set(loaded.search_vectors(query, 5, filter={"tenant": "0"}).indices[0]) <= set(range(0, 20, 3))
+
+def test_save_back_appends_and_survives_an_interrupted_append(tmp_path, model):
+    path = str(tmp_path / "db")
+    db = VectorDatabase(model_name=model, chunker="rule", delta_size=2, max_segments=2)
+    db.create([f"Doc {i}." for i in range(6)], ids=[f"d{i}" for i in range(6)])
+    db.save(path)
+    chunks = os.path.getsize(os.path.join(path, "chunks.bin"))
+
+    for round in range(3):
+        db.add([f"New {round}."], ids=[f"n{round}"], metadata=[{"round": str(round)}])
+        db.delete(f"d{round}")
+        db.save(path)
+    # Only the new rows were written, not the whole store.
+    assert os.path.getsize(os.path.join(path, "chunks.bin")) == chunks + len("New 0.") * 3
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as file:
+        segments = json.load(file)["segments"]
+    assert sorted(os.listdir(os.path.join(path, "segments"))) == sorted(
+        os.path.basename(name) for segment in segments for name in segment.values() if name.startswith("segments"))
+
+    TextArena.append(path, "chunks", ["never committed"], 9)
+    loaded = VectorDatabase(model_name=model, chunker="rule")
+    loaded.load(path)
+    assert list(loaded.sentences) == [f"Doc {i}." for i in range(6)] + [f"New {i}." for i in range(3)]
+    assert loaded.index.get_n_items() == 6
+    assert loaded.metadata.row(8) == {"round": "2"}
+
+    loaded.add(["After."], ids=["after"])
+    loaded.save(path)
+    again = VectorDatabase(model_name=model, chunker="rule")
+    again.load(path)
+    assert list(again.sentences)[-1] == "After."
+    assert again.delete("after") == 1 and again.delete("d5") == 1 and again.delete("d0") == 0
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("whoosh")
+from whoosh.fields import ID, TEXT, Schema
+from yosemite.ml.data.db import Database
+from yosemite.ml.data.sync import DatabaseSync
+from yosemite.ml.data.vdb import VectorDatabase
+
+@pytest.fixture
+def database(tmp_path) -> Database:
+    db = Database()
+    db.create(str(tmp_path / "whoosh"), schema=Schema(id=ID(stored=True, unique=True), content=TEXT(stored=True)))
+    db.add([{"id": f"d{i}", "content": f"Document {i} is here. It says {i}."} for i in range(12)])
+    return db
+
+def _live_ids(vectors: VectorDatabase) -> set:
+    live = vectors.index.live(np.arange(len(vectors.document_ids)))
+    return {vectors.document_ids[i] for i in np.flatnonzero(live)}
+
+def test_sync_adds_updates_and_deletes(tmp_path, database, model):
+    path = str(tmp_path / "vectors")
+    make = lambda: VectorDatabase(model_name=model, chunker="rule")
+
+    sync = DatabaseSync(database, make(), path, batch_size=5)
+    assert sync.sync()["added"] == 12
+    assert sync.sync()["added"] == 0
+    assert sync.vectors.index.get_n_items() == 24
+
+    writer = database.ix.writer()
+    writer.update_document(id="d3", content="Changed three. Totally new.")
+    writer.delete_by_term("id", "d5")
+    writer.add_document(id="d99", content="Brand new doc.")
+    writer.commit(merge=False)
+    chunks = os.path.getsize(os.path.join(path, "chunks.bin"))
+
+    sync = DatabaseSync(database, make(), path)
+    report = sync.sync()
+    assert (report["added"], report["changed"], report["deleted"]) == (1, 1, 1)
+    # The save appended the new chunks instead of rewriting the store.
+    assert os.path.getsize(os.path.join(path, "chunks.bin")) == chunks + len("Changed three.Totally new.Brand new doc.")
+    vectors = sync.vectors
+    assert vectors.index.get_n_items() == 23
+    hits = vectors.search("Changed three.", 5, filter={"document_id": "d3"})
+    assert sorted(hit[1] for hit in hits) == ["Changed three.", "Totally new."]
+    assert vectors.search("anything", 5, filter={"document_id": "d5"}) == []
+
+    writer = database.ix.writer()
+    writer.delete_by_term("id", "d7")
+    writer.commit(optimize=True)
+    report = DatabaseSync(database, make(), path).sync()
+    assert report["deleted"] == 1 and report["unchanged"] == 11
+
+    reloaded = make()
+    reloaded.load(path)
+    assert reloaded.index.get_n_items() == 21
+    assert _live_ids(reloaded) == {f"d{i}" for i in range(12) if i not in (5, 7)} | {"d99"}
+
+def test_failed_sync_is_retried(tmp_path, database, model):
+    path = str(tmp_path / "vectors")
+    vectors = VectorDatabase(model_name=model, chunker="rule")
+    sync = DatabaseSync(database, vectors, path, batch_size=4)
+    sync.sync()
+
+    writer = database.ix.writer()
+    for i in range(20, 30):
+        writer.add_document(id=f"d{i}", content=f"Document {i} is new.")
+    writer.update_document(id="d1", content="Changed one.")
+    writer.commit(merge=False)
+
+    add, calls = vectors.add, []
+    def failing_add(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            # The first batch is in the index; the rest never get there.
+            raise RuntimeError("embedding failed")
+        return add(*args, **kwargs)
+    vectors.add = failing_add
+    with pytest.raises(RuntimeError):
+        sync.sync()
+
+    vectors.add = add
+    report = sync.sync()
+    assert (report["added"], report["changed"]) == (10, 1)
+    assert vectors.index.get_n_items() == 24 - 1 + 10
+    assert _live_ids(vectors) == {f"d{i}" for i in range(12)} | {f"d{i}" for i in range(20, 30)}
+    assert len(vectors.search("Document 25 is new.", 5, filter={"document_id": "d25"})) == 1
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from yosemite.ml.data import vdb
+from yosemite.ml.data.vdb import VectorDatabase
+
+DIMENSION = 8
+
+def _database(n: int) -> VectorDatabase:
+    vectors = np.random.default_rng(0).standard_normal((n, DIMENSION)).astype(np.float32)
+    db = VectorDatabase(dimension=DIMENSION)
+    db.create([(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)])
+    return db
+
+def test_default_queries_are_held_out_of_the_tuned_corpus(monkeypatch):
+    db, seen, tune = _database(60), {}, vdb.tune
+
+    def spy(vectors, queries, **options):
+        seen.update(vectors=vectors, queries=queries)
+        return tune(vectors, queries, **options)
+
+    monkeypatch.setattr(vdb, "tune", spy)
+    result = db.tune(k=5, sample=20, num_trees=(2, 5))
+    assert len(seen["queries"]) == 20 and len(seen["vectors"]) == 40
+    corpus = {row.tobytes() for row in seen["vectors"]}
+    assert not any(query.tobytes() in corpus for query in seen["queries"])
+    assert db.index.get_n_items() == 60 and db.search_k == result.best.search_k
+
+def test_too_few_chunks_need_queries():
+    with pytest.raises(ValueError):
+        _database(1).tune()
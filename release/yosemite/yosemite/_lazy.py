@@ -0,0 +1,32 @@
+from importlib import import_module
+from typing import Callable, Dict, List, Tuple
+import sys
+
+def attach(package: str, exports: Dict[str, Tuple[str, str]]) -> Tuple[Callable, Callable, List[str]]:
+    """
+    Builds PEP 562 module hooks that import a package's public names on first access.
+
+    Parameters
+    ----------
+    package : str
+        The package's __name__
+    exports : Dict[str, Tuple[str, str]]
+        Maps each public name to the (relative module, attribute) it comes from
+
+    Returns
+    -------
+    Tuple[Callable, Callable, List[str]]
+        The package's __getattr__, __dir__ and __all__
+    """
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module, attribute = exports[name]
+        value = getattr(import_module(module, package), attribute)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__, list(exports)
@@ -1,9 +1,13 @@
-from yosemite.core.modules.text import Text
-from yosemite.core.modules.loaders import Status
+from typing import List, Optional
+import argparse
+import json
+import sys
 import time
-import threading
 
-def main():
+def banner():
+    from yosemite.core.modules.text import Text
+    from yosemite.core.modules.loaders import Status
+
     text = Text()
 
     with Status(message="", styles="moons"):
@@ -14,6 +18,115 @@ def main():
             time.sleep(25)
         except KeyboardInterrupt:
             exit()
-        
+
+def serve(args: argparse.Namespace):
+    import signal
+    from yosemite.serve.server import SearchServer
+
+    server = SearchServer(args.socket, database=args.database, vectors=args.vectors, hybrid=args.hybrid,
+                          model_name=args.model, cross_encoder=None if args.no_rerank else args.cross_encoder,
+                          inference=args.inference, batch_window=args.batch_window or None)
+    signal.signal(signal.SIGTERM, lambda *_: server.stop())
+    print(f"Loading models and stores, then serving on {server.socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def _client(args: argparse.Namespace):
+    from yosemite.serve.client import Client
+    return Client(args.socket, timeout=args.timeout)
+
+def search(args: argparse.Namespace):
+    with _client(args) as client:
+        results = client.search_batch(args.queries, args.k, args.store, args.fields,
+                                      dict(item.split("=", 1) for item in args.filter) if args.filter else None)
+    if args.json:
+        print(json.dumps(results if len(results) > 1 else results[0]))
+        return
+    for query, hits in zip(args.queries, results):
+        if len(args.queries) > 1:
+            print(f"# {query}")
+        for hit in hits:
+            distance = f"{hit['distance']:.4f}\t" if "distance" in hit else ""
+            print(f"{distance}{hit['document_id']}\t{hit['text']}")
+
+def rerank(args: argparse.Namespace):
+    with _client(args) as client:
+        ranked = client.rerank(args.query, args.texts)
+    if args.json:
+        print(json.dumps(ranked))
+        return
+    for text, score in ranked:
+        print(f"{score:.4f}\t{text}")
+
+def embed(args: argparse.Namespace):
+    with _client(args) as client:
+        vectors = client.embed(args.texts)
+    for row in vectors.tolist():
+        print(json.dumps(row))
+
+def stats(args: argparse.Namespace):
+    with _client(args) as client:
+        print(json.dumps(client.stats(), indent=2))
+
+def stop(args: argparse.Namespace):
+    with _client(args) as client:
+        client.shutdown()
+
+def parser() -> argparse.ArgumentParser:
+    root = argparse.ArgumentParser(prog="yosemite")
+    commands = root.add_subparsers(dest="command")
+
+    def command(name: str, handler, help: str) -> argparse.ArgumentParser:
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument("--socket", default=None, help="the server's Unix socket (default: per-user runtime directory)")
+        sub.set_defaults(handler=handler)
+        return sub
+
+    sub = command("serve", serve, "keep models and stores loaded and answer requests over a Unix socket")
+    sub.add_argument("--database", help="a whoosh Database directory (store: text)")
+    sub.add_argument("--vectors", help="a saved VectorDatabase directory (store: vectors)")
+    sub.add_argument("--hybrid", help="a YosemiteDatabase directory (store: hybrid)")
+    sub.add_argument("--model", default="all-MiniLM-L6-v2", help="the embedding model for embed and hybrid search")
+    sub.add_argument("--cross-encoder", default="cross-encoder/ms-marco-MiniLM-L-12-v2", help="the model for rerank")
+    sub.add_argument("--no-rerank", action="store_true", help="do not load a cross-encoder")
+    sub.add_argument("--inference", default="torch", choices=("torch", "onnx"))
+    sub.add_argument("--batch-window", type=float, default=0.002,
+                     help="seconds concurrent requests wait to share a forward pass; 0 disables")
+
+    for name, handler, help in (("search", search, "search a running server"),
+                                ("rerank", rerank, "rerank texts against a query on a running server"),
+                                ("embed", embed, "embed texts on a running server, one JSON vector per line"),
+                                ("stats", stats, "print a running server's stats"),
+                                ("stop", stop, "stop a running server")):
+        sub = command(name, handler, help)
+        sub.add_argument("--timeout", type=float, default=None, help="seconds to wait for the reply")
+        if name == "search":
+            sub.add_argument("queries", nargs="+")
+            sub.add_argument("-k", type=int, default=5)
+            sub.add_argument("--store", choices=("vectors", "hybrid", "text"))
+            sub.add_argument("--fields", nargs="+")
+            sub.add_argument("--filter", nargs="+", metavar="NAME=VALUE", help="metadata filter for the vectors store")
+        elif name == "rerank":
+            sub.add_argument("query")
+            sub.add_argument("texts", nargs="+")
+        elif name == "embed":
+            sub.add_argument("texts", nargs="+")
+        if name in ("search", "rerank"):
+            sub.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    return root
+
+def main(argv: Optional[List[str]] = None):
+    args = parser().parse_args(argv)
+    if args.command is None:
+        banner()
+        return
+    try:
+        args.handler(args)
+    except (ConnectionError, RuntimeError) as e:
+        print(f"yosemite {args.command}: {e}", file=sys.stderr)
+        sys.exit(1)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
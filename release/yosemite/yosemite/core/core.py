@@ -1,6 +1,5 @@
 from yosemite.core.modules.text import Text
 from yosemite.core.modules.loaders import Status, Timer
-from yosemite.core.modules.inputs import Input, Dialog
 
 """
 yosemite.core.core
@@ -34,7 +33,8 @@ class Core:
         self.status = Status
         self.timer = Timer
 
-        # Inputs
+        # Inputs (prompt_toolkit is only imported when a Core is built)
+        from yosemite.core.modules.inputs import Input, Dialog
         self.inputs = Input()
 
         # Dialogs
@@ -1,5 +1,4 @@
 import libhammadpy_text
-from art import text2art
 
 """
 hammadpy.core.text
@@ -106,6 +105,8 @@ class Text:
             import random
             art = random.choice(fonts)
 
+        from art import text2art
+
         art_message = text2art(message, font=art)
         self.say(art_message, color=color, bg=bg, bold=bold, italic=italic, underline=underline)
 
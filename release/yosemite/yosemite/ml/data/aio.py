@@ -0,0 +1,142 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar
+import asyncio
+import os
+import threading
+
+T = TypeVar("T")
+
+class SearchExecutor:
+    """
+    A bounded thread pool for the CPU-bound stages of async searches: embedding, ANN lookups and re-ranking.
+
+    The pool keeps that work off the event loop, and the bound keeps a burst of queries
+    from queueing without limit: once max_pending calls are waiting or running, new ones
+    fail at once with asyncio.QueueFull, so a server can shed load instead of stalling.
+    Numpy, torch and annoy release the GIL for their heavy work, so the threads run in parallel.
+
+    Cancelling a call, or letting it time out, stops a stage that has not started yet.
+    A stage that is already running finishes in its thread, still counted as pending,
+    and its result is dropped.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        """
+        Args:
+            max_workers (Optional[int]): Threads in the pool; defaults to the number of CPUs.
+            max_pending (Optional[int]): Calls allowed to wait or run at once; defaults to 8 per worker.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 8 * self.max_workers
+        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="yosemite-search")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of calls waiting for a thread."""
+        with self._lock:
+            return self._pending - self._running
+
+    @property
+    def pending(self) -> int:
+        """The number of calls waiting or running."""
+        with self._lock:
+            return self._pending
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": self.max_workers, "max_pending": self.max_pending, "pending": self._pending,
+                    "running": self._running, "queued": self._pending - self._running, "rejected": self._rejected}
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise asyncio.QueueFull(f"{self._pending} searches are already pending (max_pending={self.max_pending}).")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, function: Callable[..., T], *args, **kwargs) -> Future:
+        def run():
+            with self._lock:
+                self._running += 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        return self._pool.submit(run)
+
+    async def run(self, function: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+        """
+        Runs function(*args, **kwargs) on the pool and awaits its result.
+
+        Args:
+            function (Callable): The blocking call to run.
+            timeout (Optional[float]): Seconds to wait before raising asyncio.TimeoutError; None waits as long as it takes.
+
+        Returns:
+            The function's return value.
+        """
+        return await self.run_stages([(function, args, kwargs)], timeout=timeout)
+
+    async def run_stages(self, stages, timeout: Optional[float] = None):
+        """
+        Runs dependent calls one after another on the pool, each taking the previous one's result as its first argument.
+
+        The call holds one pending slot for all of its stages, and the event loop can
+        cancel it between any two of them. The timeout covers every stage together.
+
+        Args:
+            stages (List[Tuple[Callable, tuple, dict]]): (function, args, kwargs) for each stage; every stage
+                after the first is called as function(previous_result, *args, **kwargs).
+            timeout (Optional[float]): Seconds to wait in total before raising asyncio.TimeoutError.
+
+        Returns:
+            The last stage's return value.
+        """
+        self._acquire()
+        submitted: List[Future] = []
+        try:
+            return await asyncio.wait_for(self._chain(stages, submitted), timeout)
+        finally:
+            future = submitted[-1] if submitted else None
+            if future is not None and not future.cancel() and not future.done():
+                # A stage that timed out or was cancelled mid-run keeps its thread, and its slot, until it returns.
+                future.add_done_callback(lambda _: self._release())
+            else:
+                self._release()
+
+    async def _chain(self, stages, submitted: List[Future]):
+        result = None
+        for n, (function, args, kwargs) in enumerate(stages):
+            submitted.append(self._submit(function, *((result,) + tuple(args) if n else args), **kwargs))
+            result = await asyncio.wrap_future(submitted[-1])
+        return result
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+_executor: Optional[SearchExecutor] = None
+_executor_lock = threading.Lock()
+
+def default_executor() -> SearchExecutor:
+    """The SearchExecutor shared by every store's async methods unless they are given their own."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = SearchExecutor()
+        return _executor
+
+def set_default_executor(executor: SearchExecutor):
+    """Replaces the shared SearchExecutor, e.g. to size it for the server it runs in."""
+    global _executor
+    with _executor_lock:
+        _executor = executor
@@ -5,9 +5,6 @@ from whoosh import index as whoosh_index
 from whoosh.analysis import StandardAnalyzer, FancyAnalyzer, LanguageAnalyzer, KeywordAnalyzer
 from whoosh.fields import Schema, TEXT, ID, KEYWORD
 from whoosh.qparser import QueryParser, QueryParserError, MultifieldParser
-import pandas as pd
-from PyPDF2 import PdfReader
-from ebooklib import epub
 
 class Database:
     def __init__(self):
@@ -72,6 +69,8 @@ class Database:
         """
         if not self.ix:
             self.create()
+        import pandas as pd
+
         df = pd.read_csv(path)
         writer = self.ix.writer()
         for i, row in df.iterrows():
@@ -101,11 +100,13 @@ class Database:
                     content = file.read()
                     writer.add_document(id=str(uuid.uuid4()), title=file_path.stem, content=content)
             elif file_path.suffix == ".pdf":
+                from PyPDF2 import PdfReader
                 with open(file_path, "rb") as file:
                     reader = PdfReader(file)
                     content = " ".join(page.extract_text() for page in reader.pages)
                     writer.add_document(id=str(uuid.uuid4()), title=file_path.stem, content=content)
             elif file_path.suffix == ".epub":
+                from ebooklib import epub
                 book = epub.read_epub(file_path)
                 content = " ".join(item.get_content().decode("utf-8") for item in book.get_items_of_type(9))
                 writer.add_document(id=str(uuid.uuid4()), title=book.get_metadata("DC", "title")[0][0], content=content)
@@ -0,0 +1,378 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type, Union
+import os
+import numpy as np
+
+class Engine:
+    """
+    The interface every approximate nearest neighbour engine implements.
+
+    Engines index vectors under integer ids and rank them by angular distance,
+    sqrt(2 - 2 cos), the same metric AnnoyIndex(..., 'angular') reports. Subclasses
+    implement add_items, build, search, get_item_vector, get_n_items, save and load;
+    add_item and get_nns_by_vector are provided so an engine can stand in anywhere
+    an AnnoyIndex is used.
+    """
+
+    extension = ""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def add_item(self, i: int, vector: Union[List[float], np.ndarray]):
+        self.add_items(np.array([i], dtype=np.int64), np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def build(self, n_trees: int = -1, n_jobs: int = -1) -> bool:
+        raise NotImplementedError
+
+    def search(self, vector: np.ndarray, n: int, search_k: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids and angular distances of the n nearest items, nearest first."""
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, n: int, search_k: int = -1,
+                     threads: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches many queries at once.
+
+        Args:
+            queries (np.ndarray): A (q, dimension) matrix of query vectors.
+            n (int): The number of neighbours per query.
+            search_k (int): Passed to search().
+            threads (Optional[int]): Threads to spread the queries over; defaults to the number of cores.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (q, n) id and distance arrays, padded with -1 and inf where a query has fewer than n results.
+        """
+        return _pool(lambda query: self.search(query, n, search_k), queries, n, threads)
+
+    def get_nns_by_vector(self, vector: Union[List[float], np.ndarray], n: int, search_k: int = -1,
+                          include_distances: bool = False) -> Union[List[int], Tuple[List[int], List[float]]]:
+        ids, distances = self.search(np.asarray(vector, dtype=np.float32), n, search_k)
+        if not include_distances:
+            return ids.tolist()
+        return ids.tolist(), distances.tolist()
+
+    def get_item_vector(self, i: int) -> List[float]:
+        raise NotImplementedError
+
+    def get_item_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Returns the vectors of many items as one (len(ids), dimension) matrix."""
+        return np.array([self.get_item_vector(i) for i in np.asarray(ids).tolist()],
+                        dtype=np.float32).reshape(-1, self.dimension)
+
+    def get_n_items(self) -> int:
+        raise NotImplementedError
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """(resident, mapped) bytes; by default, an estimate of one float32 vector per item."""
+        return self.get_n_items() * self.dimension * 4, 0
+
+    def save(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def load(self, path: str) -> bool:
+        raise NotImplementedError
+
+def _angular(cosine: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.maximum(0.0, 2.0 - 2.0 * cosine))
+
+def _pool(search, queries: np.ndarray, n: int, threads: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    queries = np.asarray(queries, dtype=np.float32)
+    ids = np.full((len(queries), n), -1, dtype=np.int64)
+    distances = np.full((len(queries), n), np.inf, dtype=np.float32)
+    threads = threads or os.cpu_count() or 1
+    if threads == 1 or len(queries) < 2:
+        results = map(search, queries)
+    else:
+        # Annoy, hnswlib and NumPy release the GIL while they search, so threads run in parallel.
+        with ThreadPoolExecutor(min(threads, len(queries))) as executor:
+            results = list(executor.map(search, queries))
+    for row, (found, found_distances) in enumerate(results):
+        ids[row, :len(found)] = found
+        distances[row, :len(found)] = found_distances
+    return ids, distances
+
+def search_batch(index, queries: np.ndarray, n: int, search_k: int = -1,
+                 threads: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Engine.search_batch for any index with an AnnoyIndex-style get_nns_by_vector, such as SegmentedIndex."""
+    if hasattr(index, "search_batch"):
+        return index.search_batch(queries, n, search_k=search_k, threads=threads)
+    return _pool(lambda query: index.get_nns_by_vector(query, n, search_k=search_k, include_distances=True),
+                 queries, n, threads)
+
+class AnnoyEngine(Engine):
+    """Annoy's random projection forest; n_trees and search_k trade build time and memory for recall."""
+
+    extension = ".ann"
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        from annoy import AnnoyIndex
+        self.index = AnnoyIndex(dimension, "angular")
+        self._path = None
+
+    def add_item(self, i: int, vector: Union[List[float], np.ndarray]):
+        self.index.add_item(i, vector)
+
+    def on_disk_build(self, path: str) -> bool:
+        """Builds straight into the file at path instead of RAM; call before adding items."""
+        self._path = path
+        return self.index.on_disk_build(path)
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        for i, vector in zip(np.asarray(ids).tolist(), vectors):
+            self.index.add_item(i, vector)
+
+    def build(self, n_trees: int = 10, n_jobs: int = -1) -> bool:
+        return self.index.build(n_trees, n_jobs)
+
+    def search(self, vector: np.ndarray, n: int, search_k: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        ids, distances = self.index.get_nns_by_vector(vector, n, search_k=search_k, include_distances=True)
+        return np.array(ids, dtype=np.int64), np.array(distances, dtype=np.float32)
+
+    def get_item_vector(self, i: int) -> List[float]:
+        return self.index.get_item_vector(i)
+
+    def get_n_items(self) -> int:
+        return self.index.get_n_items()
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """A loaded index is one memory-mapped file; a built one is estimated from its item nodes, trees excluded."""
+        if self._path is not None and os.path.isfile(self._path):
+            return 0, os.path.getsize(self._path)
+        return self.get_n_items() * (12 + 4 * self.dimension), 0
+
+    def save(self, path: str) -> bool:
+        return self.index.save(path)
+
+    def load(self, path: str) -> bool:
+        self._path = path
+        return self.index.load(path)
+
+class ExactEngine(Engine):
+    """
+    Exact search: normalized dot products against every vector, held in one contiguous float32 matrix.
+
+    There is nothing to tune and recall is always 1.0. For up to a few hundred thousand
+    vectors this is usually faster than a tree or graph index, and building is free.
+    """
+
+    extension = ".npy"
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self._rows: Optional[Dict[int, int]] = None
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        self._pending.append((np.asarray(ids, dtype=np.int64).copy(), vectors.copy()))
+
+    def build(self, n_trees: int = -1, n_jobs: int = -1) -> bool:
+        if self._pending:
+            self.ids = np.concatenate([self.ids] + [ids for ids, _ in self._pending])
+            vectors = np.concatenate([self.vectors * self.norms[:, None]] + [vectors for _, vectors in self._pending])
+            self._pending = []
+            norms = np.linalg.norm(vectors, axis=1)
+            norms[norms == 0] = 1.0
+            self.norms = norms.astype(np.float32)
+            # Unit rows, so a search is a single matrix-vector product.
+            self.vectors = np.ascontiguousarray(vectors / self.norms[:, None], dtype=np.float32)
+            self._rows = None
+        return True
+
+    def search(self, vector: np.ndarray, n: int, search_k: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        query = vector / (np.linalg.norm(vector) or 1.0)
+        cosine = self.vectors @ query
+        if n < len(cosine):
+            top = np.argpartition(-cosine, n)[:n]
+            top = top[np.argsort(-cosine[top], kind="stable")]
+        else:
+            top = np.argsort(-cosine, kind="stable")
+        return self.ids[top], _angular(cosine[top]).astype(np.float32)
+
+    def search_batch(self, queries: np.ndarray, n: int, search_k: int = -1,
+                     threads: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # One matrix product for the whole batch; BLAS does the threading.
+        cosine = (queries / norms) @ self.vectors.T
+        k = min(n, cosine.shape[1])
+        ids = np.full((len(queries), n), -1, dtype=np.int64)
+        distances = np.full((len(queries), n), np.inf, dtype=np.float32)
+        if k == 0:
+            return ids, distances
+        top = np.argpartition(-cosine, k - 1, axis=1)[:, :k] if k < cosine.shape[1] else np.argsort(-cosine, axis=1)
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(cosine, top, axis=1), axis=1, kind="stable"), axis=1)
+        ids[:, :k] = self.ids[top]
+        distances[:, :k] = _angular(np.take_along_axis(cosine, top, axis=1))
+        return ids, distances
+
+    def get_item_vector(self, i: int) -> List[float]:
+        if self._rows is None:
+            self._rows = {int(i): row for row, i in enumerate(self.ids.tolist())}
+        row = self._rows[int(i)]
+        return (self.vectors[row] * self.norms[row]).tolist()
+
+    def get_item_vectors(self, ids: np.ndarray) -> np.ndarray:
+        if self._rows is None:
+            self._rows = {int(i): row for row, i in enumerate(self.ids.tolist())}
+        rows = np.array([self._rows[i] for i in np.asarray(ids).tolist()], dtype=np.int64)
+        return self.vectors[rows] * self.norms[rows, None]
+
+    def get_n_items(self) -> int:
+        return len(self.ids) + sum(len(ids) for ids, _ in self._pending)
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return (self.vectors.nbytes + self.norms.nbytes + self.ids.nbytes
+                + sum(ids.nbytes + vectors.nbytes for ids, vectors in self._pending)), 0
+
+    def save(self, path: str) -> bool:
+        self.build()
+        with open(path, "wb") as file:
+            np.save(file, self.vectors)
+            np.save(file, self.norms)
+            np.save(file, self.ids)
+        return True
+
+    def load(self, path: str) -> bool:
+        with open(path, "rb") as file:
+            self.vectors = np.load(file)
+            self.norms = np.load(file)
+            self.ids = np.load(file)
+        self._pending = []
+        self._rows = None
+        return True
+
+class HNSWEngine(Engine):
+    """
+    A hierarchical navigable small world graph, through hnswlib.
+
+    Better recall per millisecond than Annoy on large corpora. M and ef_construction
+    fix the graph's quality at build time; search_k sets ef, the size of the candidate
+    list at query time. get_item_vector returns the unit-normalized vector.
+    """
+
+    extension = ".hnsw"
+
+    def __init__(self, dimension: int, M: int = 16, ef_construction: int = 200, ef: int = 64, threads: int = -1):
+        """
+        Args:
+            dimension (int): The vector dimension.
+            M (int): Graph links per node.
+            ef_construction (int): Candidate list size while building.
+            ef (int): Default candidate list size while searching; raised to n when n is larger.
+            threads (int): Threads used while building; -1 uses every core.
+        """
+        super().__init__(dimension)
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("The hnsw engine needs hnswlib: pip install hnswlib")
+        self.index = hnswlib.Index(space="cosine", dim=dimension)
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.threads = threads
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._initialized = False
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        self._pending.append((np.asarray(ids, dtype=np.int64).copy(), vectors.copy()))
+
+    def build(self, n_trees: int = -1, n_jobs: int = -1) -> bool:
+        if not self._pending:
+            if not self._initialized:
+                self.index.init_index(max_elements=1, M=self.M, ef_construction=self.ef_construction)
+                self._initialized = True
+            return True
+        ids = np.concatenate([ids for ids, _ in self._pending])
+        vectors = np.concatenate([vectors for _, vectors in self._pending])
+        self._pending = []
+        if not self._initialized:
+            self.index.init_index(max_elements=len(ids), M=self.M, ef_construction=self.ef_construction)
+            self._initialized = True
+        else:
+            self.index.resize_index(self.index.get_current_count() + len(ids))
+        # Inserting one batch lets hnswlib spread the graph construction over threads.
+        self.index.add_items(vectors, ids, num_threads=n_jobs if n_jobs > 0 else self.threads)
+        return True
+
+    def search(self, vector: np.ndarray, n: int, search_k: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        n = min(n, self.index.get_current_count())
+        if n <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self.index.set_ef(max(search_k if search_k > 0 else self.ef, n))
+        labels, distances = self.index.knn_query(vector.reshape(1, -1), k=n)
+        # hnswlib's cosine distance is 1 - cos; angular distance is sqrt(2 - 2 cos).
+        return labels[0].astype(np.int64), np.sqrt(np.maximum(0.0, 2.0 * distances[0])).astype(np.float32)
+
+    def search_batch(self, queries: np.ndarray, n: int, search_k: int = -1,
+                     threads: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32)
+        ids = np.full((len(queries), n), -1, dtype=np.int64)
+        distances = np.full((len(queries), n), np.inf, dtype=np.float32)
+        k = min(n, self.index.get_current_count())
+        if k <= 0 or not len(queries):
+            return ids, distances
+        self.index.set_ef(max(search_k if search_k > 0 else self.ef, k))
+        labels, found = self.index.knn_query(queries, k=k, num_threads=threads or -1)
+        ids[:, :k] = labels
+        distances[:, :k] = np.sqrt(np.maximum(0.0, 2.0 * found))
+        return ids, distances
+
+    def get_item_vector(self, i: int) -> List[float]:
+        return np.asarray(self.index.get_items([i])[0], dtype=np.float32).tolist()
+
+    def get_n_items(self) -> int:
+        count = self.index.get_current_count() if self._initialized else 0
+        return count + sum(len(ids) for ids, _ in self._pending)
+
+    def memory_usage(self) -> Tuple[int, int]:
+        pending = sum(ids.nbytes + vectors.nbytes for ids, vectors in self._pending)
+        return (self.index.index_file_size() if self._initialized else 0) + pending, 0
+
+    def save(self, path: str) -> bool:
+        self.build()
+        self.index.save_index(path)
+        return True
+
+    def load(self, path: str) -> bool:
+        self.index.load_index(path)
+        self._initialized = True
+        self._pending = []
+        return True
+
+engines: Dict[str, Type[Engine]] = {
+    "annoy": AnnoyEngine,
+    "exact": ExactEngine,
+    "hnsw": HNSWEngine,
+}
+
+def register_engine(name: str, engine: Type[Engine]):
+    """Makes an Engine subclass available by name to VectorDatabase and YosemiteDatabase."""
+    engines[name] = engine
+
+def create_engine(name: str, dimension: int, **options) -> Engine:
+    """
+    Creates an empty engine by name.
+
+    Args:
+        name (str): "annoy", "exact", "hnsw", or a name passed to register_engine.
+        dimension (int): The vector dimension.
+        **options: Passed to the engine's constructor.
+
+    Returns:
+        Engine: The new engine.
+    """
+    if name not in engines:
+        raise ValueError(f"Invalid engine: {name}. Expected one of {tuple(engines)}.")
+    return engines[name](dimension, **options)
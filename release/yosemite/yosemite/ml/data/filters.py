@@ -0,0 +1,266 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import math
+import os
+import numpy as np
+from yosemite.ml.data.engines import _angular, _pool
+from yosemite.ml.data.storage import TextArena, _append, _save, memory_usage
+
+Filter = Dict[str, Union[str, List[str]]]
+
+class Column:
+    """
+    One metadata column: an int32 value code per chunk, the distinct values, and a bitmap per value.
+
+    Bitmaps are packed bits, one per chunk, built on first use and kept until rows are added.
+    A code of -1 means the chunk has no value in this column.
+    """
+
+    def __init__(self, codes: Optional[np.ndarray] = None, values: Optional[Iterable[str]] = None):
+        self._base = codes if codes is not None else np.empty(0, dtype=np.int32)
+        self._tail = array("i")
+        self.values: List[str] = list(values or [])
+        self.lookup = {value: code for code, value in enumerate(self.values)}
+        # Saved tables can list a value more than once (StreamingBuilder only merges runs); lookup keeps the last code.
+        self._duplicates: Dict[str, List[int]] = {}
+        if len(self.lookup) < len(self.values):
+            for code, value in enumerate(self.values):
+                self._duplicates.setdefault(value, []).append(code)
+        self._codes = None
+        self._bitmaps: Dict[int, np.ndarray] = {}
+        self._order = None
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._tail)
+
+    def extend(self, value: Optional[str], count: int):
+        """Appends count rows that all have value (None for no value)."""
+        if value is None:
+            code = -1
+        else:
+            value = str(value)
+            code = self.lookup.get(value)
+            if code is None:
+                code = self.lookup[value] = len(self.values)
+                self.values.append(value)
+        self._tail.extend([code] * count)
+        self._codes = None
+        self._bitmaps = {}
+
+    @property
+    def codes(self) -> np.ndarray:
+        if not self._tail:
+            return self._base
+        if self._codes is None:
+            self._codes = np.concatenate([self._base, np.frombuffer(self._tail, dtype=np.int32)])
+        return self._codes
+
+    def codes_from(self, start: int) -> np.ndarray:
+        """The codes of rows start onwards, without concatenating the rows before them."""
+        if start >= len(self._base):
+            return np.frombuffer(self._tail, dtype=np.int32)[start - len(self._base):].copy()
+        return np.array(self.codes[start:])
+
+    def _codes_of(self, value: str) -> List[int]:
+        value = str(value)
+        if value in self._duplicates:
+            return self._duplicates[value]
+        code = self.lookup.get(value)
+        return [] if code is None else [code]
+
+    def rows(self, values: Iterable[str]) -> np.ndarray:
+        """
+        Returns the sorted rows whose value is one of values.
+
+        Rows are found through an argsort of the codes built once, so a lookup costs the
+        number of matching rows plus the rows added since, not a pass over every row.
+        """
+        codes = [code for value in values for code in self._codes_of(value)]
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        if len(self._tail) > max(65536, len(self._base)):
+            # Fold a long tail into the sorted part, so repeated lookups stay cheap as rows are added.
+            self._base, self._tail, self._codes, self._order = self.codes, array("i"), None, None
+        if self._order is None:
+            self._order = np.argsort(self._base, kind="stable")
+            self._sorted = np.asarray(self._base)[self._order]
+        parts = [self._order[np.searchsorted(self._sorted, code, "left"):np.searchsorted(self._sorted, code, "right")]
+                 for code in codes]
+        if self._tail:
+            tail = np.frombuffer(self._tail, dtype=np.int32)
+            parts.append(np.flatnonzero(np.isin(tail, codes)) + len(self._base))
+        return np.sort(np.concatenate(parts)).astype(np.int64)
+
+    def memory_usage(self) -> Tuple[int, int]:
+        codes = memory_usage(self._base)
+        resident = codes[0] + self._tail.buffer_info()[1] * self._tail.itemsize + memory_usage(self.values)[0]
+        resident += sum(bitmap.nbytes for bitmap in self._bitmaps.values())
+        if self._codes is not None:
+            resident += self._codes.nbytes
+        if self._order is not None:
+            resident += self._order.nbytes + self._sorted.nbytes
+        return resident, codes[1]
+
+    def bitmap(self, value: str) -> np.ndarray:
+        codes = self._codes_of(value)
+        if not codes:
+            return np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        if codes[0] not in self._bitmaps:
+            self._bitmaps[codes[0]] = np.packbits(np.isin(self.codes, codes) if len(codes) > 1 else self.codes == codes[0])
+        return self._bitmaps[codes[0]]
+
+class MetadataColumns:
+    """
+    Per-chunk metadata stored next to VectorDatabase.document_ids, one Column per key.
+
+    A chunk inherits the metadata of the document it came from. A filter such as
+    {"source": "a.txt", "tenant": ["t1", "t2"]} matches chunks whose source is a.txt
+    and whose tenant is t1 or t2: values for one key are OR-ed, keys are AND-ed.
+    """
+
+    def __init__(self, columns: Optional[Dict[str, Column]] = None, rows: int = 0):
+        self.columns = columns or {}
+        self.rows = rows
+
+    def extend(self, metadata: Optional[Dict[str, str]], count: int):
+        """Appends count chunks that share one document's metadata."""
+        metadata = metadata or {}
+        for name in metadata:
+            if name not in self.columns:
+                self.columns[name] = Column()
+                self.columns[name].extend(None, self.rows)
+        for name, column in self.columns.items():
+            column.extend(metadata.get(name), count)
+        self.rows += count
+
+    def memory_usage(self) -> Tuple[int, int]:
+        resident, mapped = 0, 0
+        for column in self.columns.values():
+            usage = column.memory_usage()
+            resident, mapped = resident + usage[0], mapped + usage[1]
+        return resident, mapped
+
+    def row(self, i: int) -> Dict[str, str]:
+        """The metadata of chunk i."""
+        return {name: column.values[int(column.codes[i])] for name, column in self.columns.items()
+                if column.codes[i] >= 0}
+
+    def bitmap(self, filter: Filter, extra: Optional[Dict[str, Column]] = None) -> np.ndarray:
+        """Returns the packed bitmap of chunks that match filter."""
+        columns = {**self.columns, **(extra or {})}
+        result = None
+        for name, wanted in filter.items():
+            if name not in columns:
+                raise ValueError(f"Unknown metadata column: {name}. Expected one of {tuple(columns)}.")
+            column = columns[name]
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matches = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+            for value in wanted:
+                np.bitwise_or(matches, column.bitmap(value), out=matches)
+            result = matches if result is None else np.bitwise_and(result, matches)
+        if result is None:
+            return np.packbits(np.ones(self.rows, dtype=bool))
+        return result
+
+    def mask(self, filter: Filter, extra: Optional[Dict[str, Column]] = None) -> np.ndarray:
+        """Returns a boolean array with one entry per chunk."""
+        return np.unpackbits(self.bitmap(filter, extra), count=self.rows).astype(bool)
+
+    def save(self, path: str):
+        os.makedirs(os.path.join(path, "metadata"), exist_ok=True)
+        for name, column in self.columns.items():
+            _save(os.path.join(path, "metadata", f"{name}.codes.npy"), column.codes)
+            TextArena.write(os.path.join(path, "metadata"), f"{name}.values", column.values)
+
+    def append(self, path: str, saved: int, names: List[str]):
+        """
+        Brings metadata saved under path up to date when only rows have been added since.
+
+        Args:
+            path (str): The directory the columns were saved into.
+            saved (int): How many rows are already on disk.
+            names (List[str]): The columns already on disk; other columns are written whole.
+        """
+        os.makedirs(os.path.join(path, "metadata"), exist_ok=True)
+        for name, column in self.columns.items():
+            if name in names:
+                _append(os.path.join(path, "metadata", f"{name}.codes.npy"), column.codes_from(saved), saved)
+            else:
+                _save(os.path.join(path, "metadata", f"{name}.codes.npy"), column.codes)
+            # One string per distinct value, so rewriting them is cheap.
+            TextArena.write(os.path.join(path, "metadata"), f"{name}.values", column.values)
+
+    @classmethod
+    def open(cls, path: str, names: List[str], rows: int) -> "MetadataColumns":
+        columns = {}
+        for name in names:
+            codes = np.load(os.path.join(path, "metadata", f"{name}.codes.npy"), mmap_mode="r")[:rows]
+            columns[name] = Column(codes, TextArena.open(os.path.join(path, "metadata"), f"{name}.values"))
+        return cls(columns, rows)
+
+def _exact(index, queries: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    if not len(rows):
+        return ids, distances
+    vectors = np.asarray(index.get_item_vectors(rows), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    query_norms = np.linalg.norm(queries, axis=1)
+    query_norms[query_norms == 0] = 1.0
+    cosine = (queries / query_norms[:, None]) @ (vectors / norms[:, None]).T
+    n = min(k, len(rows))
+    top = np.argsort(-cosine, axis=1, kind="stable")[:, :n]
+    ids[:, :n] = rows[top]
+    distances[:, :n] = _angular(np.take_along_axis(cosine, top, axis=1))
+    return ids, distances
+
+def filtered_search(index, queries: np.ndarray, k: int, mask: np.ndarray, search_k: int = -1,
+                    threads: Optional[int] = None, exact_limit: int = 20000,
+                    overfetch: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Searches only the rows where mask is True, choosing a strategy by how many rows match.
+
+    Narrow filters (at most exact_limit matching rows) are answered exactly by scoring just
+    those rows. Broad filters query the ANN index for k / selectivity * overfetch neighbours,
+    drop those outside the filter, and double the request until k survive.
+
+    Args:
+        index: An engine or SegmentedIndex.
+        queries (np.ndarray): A (q, dimension) matrix of query vectors.
+        k (int): The number of results per query.
+        mask (np.ndarray): One boolean per row id.
+        search_k (int): Passed to the index on the ANN path.
+        threads (Optional[int]): Threads to spread ANN queries over.
+        exact_limit (int): The largest number of matching rows that is scanned exactly.
+        overfetch (float): Extra neighbours requested on the ANN path, as a multiple of k / selectivity.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (q, k) id and distance arrays, padded with -1 and inf.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    rows = np.flatnonzero(mask)
+    if hasattr(index, "live"):
+        # A mutable index drops deleted rows, so they must not be scored.
+        rows = rows[index.live(rows)]
+    if len(rows) <= exact_limit:
+        return _exact(index, queries, k, rows)
+
+    total = index.get_n_items()
+    selectivity = len(rows) / max(total, 1)
+    start = min(total, math.ceil(k / selectivity * overfetch))
+
+    def search(query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = start
+        while True:
+            found, distances = index.get_nns_by_vector(query, n, search_k=search_k, include_distances=True)
+            found, distances = np.asarray(found, dtype=np.int64), np.asarray(distances, dtype=np.float32)
+            # Rows added after the mask was taken are outside the filter.
+            keep = np.zeros(len(found), dtype=bool)
+            inside = found < len(mask)
+            keep[inside] = mask[found[inside]]
+            if keep.sum() >= k or n >= total:
+                return found[keep][:k], distances[keep][:k]
+            n = min(total, n * 2)
+
+    return _pool(search, queries, k, threads)
@@ -0,0 +1,222 @@
+from typing import List, Optional, Tuple
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from yosemite.ml.data.engines import Engine
+from yosemite.ml.data.storage import memory_usage
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_BLOCK = 65536
+
+class QuantizedIndex(Engine):
+    """
+    An angular vector index that keeps only quantized codes in memory.
+
+    Vectors are appended to a float32 file on disk as they are added. build() scans that file
+    once to quantize every vector into int8 codes (one byte per dimension) or sign bits
+    (one bit per dimension). A search ranks all codes with NumPy, takes the best
+    n * rescore candidates, and rescores them against the full-precision vectors,
+    which are memory-mapped from disk.
+
+    It implements the Engine interface, so VectorDatabase can use it in place of any other engine.
+    """
+
+    modes = ("int8", "binary")
+
+    def __init__(self, dimension: int, mode: str = "int8", path: Optional[str] = None, rescore: int = 10):
+        """
+        Args:
+            dimension (int): The vector dimension.
+            mode (str): "int8" for scalar quantization or "binary" for 1-bit sign quantization.
+            path (Optional[str]): Directory for the full-precision vectors. If None, a temporary directory is
+                used, owned by the index and removed by close() or when the index is garbage collected.
+            rescore (int): How many candidates per requested neighbour are rescored at full precision.
+        """
+        if mode not in self.modes:
+            raise ValueError(f"Invalid quantization mode: {mode}. Expected one of {self.modes}.")
+        super().__init__(dimension)
+        self.mode = mode
+        self.rescore = rescore
+        self.path = path
+        self.codes = None
+        self.scale = None
+        self.center = None
+        self.norms = None
+        self.vectors = None
+        self._count = 0
+        self._writer = None
+        self._temporary = None
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        """Appends a block of vectors; ids must continue the consecutive sequence 0, 1, 2, ..."""
+        if self.codes is not None:
+            raise ValueError("You can't add an item to a built index.")
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) and (ids[0] != self._count or np.any(np.diff(ids) != 1)):
+            raise ValueError(f"Items must be added in order; expected ids starting at {self._count}.")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}.")
+        if self._writer is None:
+            if self.path is None:
+                self.path = self._temporary = tempfile.mkdtemp(prefix="yosemite-quantized-")
+            os.makedirs(self.path, exist_ok=True)
+            self._writer = open(self._vectors_path, "wb")
+        self._writer.write(vectors.tobytes())
+        self._count += len(vectors)
+
+    def build(self, n_trees: int = -1, n_jobs: int = -1) -> bool:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._map()
+
+        norms = np.empty(self._count, dtype=np.float32)
+        for start in range(0, self._count, _BLOCK):
+            norms[start:start + _BLOCK] = np.linalg.norm(self.vectors[start:start + _BLOCK], axis=1)
+        norms[norms == 0] = 1.0
+        self.norms = norms
+
+        if self.mode == "int8":
+            scale = np.zeros(self.dimension, dtype=np.float32)
+            for start in range(0, self._count, _BLOCK):
+                block = self.vectors[start:start + _BLOCK] / norms[start:start + _BLOCK, None]
+                np.maximum(scale, np.abs(block).max(axis=0), out=scale)
+            scale[scale == 0] = 1.0
+            self.scale = scale / 127.0
+            self.codes = np.empty((self._count, self.dimension), dtype=np.int8)
+        else:
+            # Sign bits carry more information around the corpus mean than around the origin.
+            center = np.zeros(self.dimension, dtype=np.float64)
+            for start in range(0, self._count, _BLOCK):
+                center += (self.vectors[start:start + _BLOCK] / norms[start:start + _BLOCK, None]).sum(axis=0)
+            self.center = (center / max(self._count, 1)).astype(np.float32)
+            self.codes = np.empty((self._count, (self.dimension + 7) // 8), dtype=np.uint8)
+
+        for start in range(0, self._count, _BLOCK):
+            self.codes[start:start + _BLOCK] = self._quantize(self.vectors[start:start + _BLOCK]
+                                                              / norms[start:start + _BLOCK, None])
+        return True
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        return np.packbits(vectors > self.center, axis=-1)
+
+    def _map(self):
+        if self._count:
+            self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self.dimension))
+        else:
+            self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+
+    def _first_pass(self, query: np.ndarray, n: int) -> np.ndarray:
+        """Returns the ids of the n best candidates by quantized score, best first."""
+        if not len(self.codes):
+            return np.empty(0, dtype=np.int64)
+        if self.mode == "int8":
+            weights = query * self.scale
+            scores = np.concatenate([self.codes[start:start + _BLOCK] @ weights
+                                     for start in range(0, len(self.codes), _BLOCK)])
+        else:
+            bits = self._quantize(query)
+            # Fewer differing bits is better, so negate the Hamming distance.
+            scores = -np.concatenate([_POPCOUNT[np.bitwise_xor(self.codes[start:start + _BLOCK], bits)].sum(axis=1, dtype=np.int32)
+                                      for start in range(0, len(self.codes), _BLOCK)])
+        if n >= len(scores):
+            return np.argsort(-scores, kind="stable")
+        candidates = np.argpartition(-scores, n)[:n]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def search(self, vector: np.ndarray, n: int, search_k: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        if self.codes is None:
+            raise ValueError("Index has not been built or loaded.")
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        depth = search_k if search_k > 0 else n * self.rescore
+        shortlist = np.sort(self._first_pass(query, max(depth, n)))
+        cosine = (self.vectors[shortlist] @ query) / self.norms[shortlist]
+        top = np.argsort(-cosine, kind="stable")[:n]
+        # Same distance as Annoy's angular metric: sqrt(2 - 2 cos).
+        return shortlist[top].astype(np.int64), np.sqrt(np.maximum(0.0, 2.0 - 2.0 * cosine[top])).astype(np.float32)
+
+    def get_item_vector(self, i: int) -> List[float]:
+        return self.vectors[i].tolist()
+
+    def get_item_vectors(self, ids: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[np.asarray(ids, dtype=np.int64)], dtype=np.float32)
+
+    def get_n_items(self) -> int:
+        return self._count
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """The codes and norms are resident; the full-precision vectors are memory-mapped."""
+        resident, mapped = 0, 0
+        for values in (self.codes, self.norms, self.scale, self.center, self.vectors):
+            if values is not None:
+                usage = memory_usage(values)
+                resident, mapped = resident + usage[0], mapped + usage[1]
+        return resident, mapped
+
+    def save(self, path: str) -> bool:
+        """Saves the codes and calibration next to the full-precision vectors in path."""
+        if self.codes is None:
+            raise ValueError("Index has not been built.")
+        os.makedirs(path, exist_ok=True)
+        if self.path is None or os.path.abspath(path) != os.path.abspath(self.path):
+            with open(os.path.join(path, "vectors.f32"), "wb") as file:
+                for start in range(0, self._count, _BLOCK):
+                    file.write(np.ascontiguousarray(self.vectors[start:start + _BLOCK]).tobytes())
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        np.save(os.path.join(path, "norms.npy"), self.norms)
+        if self.scale is not None:
+            np.save(os.path.join(path, "scale.npy"), self.scale)
+        if self.center is not None:
+            np.save(os.path.join(path, "center.npy"), self.center)
+        with open(os.path.join(path, "quantized.json"), "w", encoding="utf-8") as file:
+            json.dump({"mode": self.mode, "dimension": self.dimension, "count": self._count}, file)
+        return True
+
+    def load(self, path: str, mmap: bool = False) -> bool:
+        """Loads a saved index; with mmap=True the codes are memory-mapped instead of read into memory."""
+        with open(os.path.join(path, "quantized.json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta["mode"] != self.mode or meta["dimension"] != self.dimension:
+            raise ValueError(f"Index at {path} is {meta['mode']} with dimension {meta['dimension']}, "
+                             f"expected {self.mode} with dimension {self.dimension}.")
+        self.path = path
+        self._count = meta["count"]
+        self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r" if mmap else None)
+        self.norms = np.load(os.path.join(path, "norms.npy"))
+        scale_path = os.path.join(path, "scale.npy")
+        self.scale = np.load(scale_path) if os.path.isfile(scale_path) else None
+        center_path = os.path.join(path, "center.npy")
+        self.center = np.load(center_path) if os.path.isfile(center_path) else None
+        self._map()
+        return True
+
+    def close(self):
+        """
+        Removes the temporary directory the index created for its vectors, if it made one.
+
+        Vectors already memory-mapped stay readable until the index itself is dropped, so a
+        search still running on a replaced segment finishes normally.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._temporary is not None:
+            shutil.rmtree(self._temporary, ignore_errors=True)
+            self._temporary = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,47 @@
+from typing import Iterator, List, Tuple
+import numpy as np
+
+class BatchResults:
+    """
+    Columnar results for a batch of queries.
+
+    indices and distances are (queries, k) arrays, nearest first. A row is padded with -1
+    and inf where a query had fewer than k results. Chunk text, document ids and vectors
+    are looked up only when they are asked for.
+    """
+
+    def __init__(self, indices: np.ndarray, distances: np.ndarray, database):
+        self.indices = indices
+        self.distances = distances
+        self.database = database
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def counts(self) -> np.ndarray:
+        """The number of results for each query."""
+        return (self.indices >= 0).sum(axis=1)
+
+    def _valid(self, q: int) -> np.ndarray:
+        return self.indices[q][self.indices[q] >= 0]
+
+    def texts(self, q: int) -> List[str]:
+        return [self.database.sentences[i] for i in self._valid(q).tolist()]
+
+    def document_ids(self, q: int) -> List[str]:
+        return [self.database.document_ids[i] for i in self._valid(q).tolist()]
+
+    def vectors(self, q: int) -> np.ndarray:
+        indices = self._valid(q).tolist()
+        if not indices:
+            return np.empty((0, self.database.dimension), dtype=np.float32)
+        return np.array([self.database.index.get_item_vector(i) for i in indices], dtype=np.float32)
+
+    def __getitem__(self, q: int) -> List[Tuple[int, str, str, List[float]]]:
+        """The results of query q in the same (index, sentence, document_id, vector) form as VectorDatabase.search."""
+        return [(i, self.database.sentences[i], self.database.document_ids[i], self.database.index.get_item_vector(i))
+                for i in self._valid(q).tolist()]
+
+    def __iter__(self) -> Iterator[List[Tuple[int, str, str, List[float]]]]:
+        for q in range(len(self)):
+            yield self[q]
@@ -0,0 +1,347 @@
+from typing import Callable, List, Optional, Set, Tuple, Union
+import heapq
+import threading
+import numpy as np
+from yosemite.ml.data.storage import memory_usage
+
+class Segment:
+    """An immutable, built index together with the global id of each of its items."""
+
+    def __init__(self, index, ids: np.ndarray, saved: Optional[dict] = None):
+        self.index = index
+        self.ids = np.asarray(ids, dtype=np.int64)
+        # The manifest entry of the files this segment was loaded from or saved to; None until it is on disk.
+        self.saved = saved
+        self._order = np.argsort(self.ids, kind="stable")
+        # How many of ids are tombstoned; a search over-fetches by this much, not by every tombstone.
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def local(self, i: int) -> Optional[int]:
+        """Returns the position of global id i in this segment, or None."""
+        position = np.searchsorted(self.ids, i, sorter=self._order)
+        if position < len(self.ids) and self.ids[self._order[position]] == i:
+            return int(self._order[position])
+        return None
+
+    def search(self, query: np.ndarray, n: int, search_k: int) -> List[Tuple[float, int]]:
+        indices, distances = self.index.get_nns_by_vector(query, min(n, len(self)), search_k=search_k,
+                                                          include_distances=True)
+        return [(distance, int(self.ids[j])) for j, distance in zip(indices, distances)]
+
+class SegmentedIndex:
+    """
+    A mutable angular index made of immutable segments, in the style of an LSM tree.
+
+    New vectors go into an in-memory delta that is searched by brute force, so they are
+    visible as soon as they are added. Once the delta holds delta_size vectors it is
+    frozen, and a background thread builds it into a new immutable segment. When there
+    are more than max_segments segments, the smallest ones are merged into one, and
+    deleted items are dropped along the way. Deletes are tombstones until then.
+
+    A search queries every segment and the delta, and merges the results by distance.
+    Ids are global and chosen by the caller, as with AnnoyIndex.add_item.
+    """
+
+    def __init__(self, dimension: int, factory: Callable[[], object], num_trees: int = 10,
+                 delta_size: int = 10000, max_segments: int = 8, purge_ratio: float = 0.2, background: bool = True):
+        """
+        Args:
+            dimension (int): The vector dimension.
+            factory (Callable[[], object]): Returns a new, empty AnnoyIndex-like index for a segment.
+            num_trees (int): Passed to build() for every new segment.
+            delta_size (int): How many vectors the delta holds before it is frozen into a segment.
+            max_segments (int): How many segments are allowed before the smallest are merged.
+            purge_ratio (float): The fraction of deleted items at which a segment is rewritten without them.
+            background (bool): Whether segments are built on a background thread; if False, add_item builds them inline.
+        """
+        self.dimension = dimension
+        self.factory = factory
+        self.num_trees = num_trees
+        self.delta_size = delta_size
+        self.max_segments = max_segments
+        self.purge_ratio = purge_ratio
+        self.background = background
+        self.segments: List[Segment] = []
+        self.tombstones: Set[int] = set()
+        self._frozen: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta = np.empty((0, dimension), dtype=np.float32)
+        self._count = 0
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._error = None
+
+    def add_segment(self, index, ids: np.ndarray, saved: Optional[dict] = None):
+        """Adds an already built index, e.g. one loaded from disk, as a segment; saved is its manifest entry."""
+        with self._lock:
+            self.segments = self.segments + [Segment(index, ids, saved)]
+
+    def add_item(self, i: int, vector: Union[List[float], np.ndarray]):
+        self.add_items(np.array([i]), np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def add_items(self, ids: np.ndarray, vectors: np.ndarray):
+        """Adds vectors under the given global ids; they are searchable when this returns."""
+        self._raise()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {vectors.shape}.")
+        with self._lock:
+            count = self._count + len(vectors)
+            if count > len(self._delta):
+                capacity = max(count, min(2 * len(self._delta), self.delta_size), 64)
+                # A new array, not a resize: searches may still hold the old one.
+                delta = np.empty((capacity, self.dimension), dtype=np.float32)
+                delta_ids = np.empty(capacity, dtype=np.int64)
+                delta[:self._count] = self._delta[:self._count]
+                delta_ids[:self._count] = self._delta_ids[:self._count]
+                self._delta, self._delta_ids = delta, delta_ids
+            self._delta[self._count:count] = vectors
+            self._delta_ids[self._count:count] = ids
+            self._count = count
+            full = count >= self.delta_size
+            if full:
+                self._freeze()
+        if full:
+            if self.background:
+                self._start()
+                self._wake.set()
+            else:
+                self.compact()
+
+    def delete(self, i: int):
+        """Marks global id i as deleted; it disappears from results immediately. Ids not in the index are ignored."""
+        i = int(i)
+        with self._lock:
+            if i in self.tombstones:
+                return
+            segment = next((segment for segment in self.segments if segment.local(i) is not None), None)
+            if segment is None and not any((ids == i).any() for ids, _ in self._frozen) \
+                    and not (self._delta_ids[:self._count] == i).any():
+                # Already purged, or never added: a tombstone would never be cleared.
+                return
+            self.tombstones = self.tombstones | {i}
+            if segment is not None:
+                segment.dead += 1
+
+    def set_tombstones(self, ids: np.ndarray):
+        """Restores saved deletes, e.g. after the segments are loaded with add_segment(); ids not in the index are dropped."""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            self.tombstones = set()
+            ids = ids[self.live(ids)]
+            self.tombstones = set(ids.tolist())
+            for segment in self.segments:
+                self._count_dead(segment)
+
+    def _count_dead(self, segment: Segment):
+        """Counts the tombstones in segment; call with the lock held."""
+        tombstones = self.tombstones
+        segment.dead = int(np.isin(segment.ids, np.fromiter(tombstones, dtype=np.int64, count=len(tombstones))).sum()) \
+            if tombstones else 0
+
+    def _freeze(self):
+        if self._count:
+            self._frozen = self._frozen + [(self._delta_ids[:self._count].copy(), self._delta[:self._count].copy())]
+            self._delta = np.empty((0, self.dimension), dtype=np.float32)
+            self._delta_ids = np.empty(0, dtype=np.int64)
+            self._count = 0
+
+    def _start(self):
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="yosemite-compactor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self.compact(flush=False)
+            except Exception as e:
+                self._error = e
+                return
+
+    def _raise(self):
+        if self._error is not None:
+            raise RuntimeError("Background compaction failed.") from self._error
+
+    def _build(self, ids: np.ndarray, vectors: np.ndarray) -> Segment:
+        index = self.factory()
+        for j, vector in enumerate(vectors):
+            index.add_item(j, vector)
+        index.build(self.num_trees)
+        return Segment(index, ids)
+
+    def compact(self, flush: bool = True):
+        """
+        Builds frozen deltas into segments, merges segments down to max_segments, and purges deleted items.
+
+        Args:
+            flush (bool): Whether to freeze the current delta first, so that every vector ends up in a segment.
+        """
+        with self._compacting:
+            self._compact(flush)
+
+    def _compact(self, flush: bool):
+        with self._lock:
+            if flush:
+                self._freeze()
+            frozen = list(self._frozen)
+        for ids, vectors in frozen:
+            with self._lock:
+                dead = {i for i in ids.tolist() if i in self.tombstones}
+            live = np.array([i not in dead for i in ids.tolist()], dtype=bool)
+            segment = self._build(ids[live], vectors[live]) if live.any() else None
+            with self._lock:
+                self._frozen = [entry for entry in self._frozen if entry[0] is not ids]
+                if segment is not None:
+                    # Ids deleted while the segment was being built.
+                    self._count_dead(segment)
+                    self.segments = self.segments + [segment]
+                # Replaced, not mutated: a search may be holding the old set.
+                self.tombstones = self.tombstones - dead
+        while len(self.segments) > self.max_segments:
+            with self._lock:
+                smallest = sorted(self.segments, key=len)[:max(2, len(self.segments) - self.max_segments + 1)]
+            self._merge(smallest)
+        # Rewrite segments that are mostly dead weight, so tombstones don't pile up forever.
+        for segment in list(self.segments):
+            if segment.dead > self.purge_ratio * len(segment):
+                self._merge([segment])
+
+    def rebuild(self, num_trees: int):
+        """Rebuilds every item into one segment with num_trees trees, which later segments use too."""
+        with self._compacting:
+            # Under the compactor's lock, so a background merge cannot take the same segments.
+            self.num_trees = num_trees
+            self._compact(flush=True)
+            with self._lock:
+                segments = list(self.segments)
+            if segments:
+                self._merge(segments)
+
+    def _merge(self, segments: List[Segment]):
+        with self._lock:
+            tombstones = set(self.tombstones)
+        ids, vectors, dead = [], [], set()
+        for segment in segments:
+            for j, i in enumerate(segment.ids.tolist()):
+                if i in tombstones:
+                    dead.add(i)
+                else:
+                    ids.append(i)
+                    vectors.append(segment.index.get_item_vector(j))
+        merged = self._build(np.array(ids, dtype=np.int64),
+                             np.array(vectors, dtype=np.float32).reshape(-1, self.dimension)) if ids else None
+        with self._lock:
+            self.tombstones = self.tombstones - dead
+            if merged is not None:
+                self._count_dead(merged)
+            self.segments = [segment for segment in self.segments if segment not in segments] + (
+                [merged] if merged is not None else [])
+        for segment in segments:
+            # Frees what a merged-away index holds outside memory, e.g. a QuantizedIndex's temporary vectors.
+            close = getattr(segment.index, "close", None)
+            if close is not None:
+                close()
+
+    def get_nns_by_vector(self, vector: Union[List[float], np.ndarray], n: int, search_k: int = -1,
+                          include_distances: bool = False) -> Union[List[int], Tuple[List[int], List[float]]]:
+        self._raise()
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            segments, frozen, tombstones = self.segments, self._frozen, self.tombstones
+            delta_ids, delta = self._delta_ids[:self._count], self._delta[:self._count]
+            dead = [segment.dead for segment in segments]
+
+        candidates = []
+        for segment, segment_dead in zip(segments, dead):
+            if len(segment):
+                candidates.extend(segment.search(query, n + segment_dead, search_k))
+        unit = query / (np.linalg.norm(query) or 1.0)
+        deleted = np.fromiter(tombstones, dtype=np.int64, count=len(tombstones)) if tombstones else None
+        for ids, vectors in frozen + [(delta_ids, delta)]:
+            if len(ids):
+                norms = np.linalg.norm(vectors, axis=1)
+                norms[norms == 0] = 1.0
+                cosine = (vectors @ unit) / norms
+                distances = np.sqrt(np.maximum(0.0, 2.0 - 2.0 * cosine))
+                if deleted is not None:
+                    distances[np.isin(ids, deleted)] = np.inf
+                top = np.argsort(distances, kind="stable")[:n]
+                candidates.extend(zip(distances[top].tolist(), ids[top].tolist()))
+
+        best = heapq.nsmallest(n, (candidate for candidate in candidates if candidate[1] not in tombstones))
+        indices = [i for _, i in best]
+        if not include_distances:
+            return indices
+        return indices, [distance for distance, _ in best]
+
+    def get_item_vector(self, i: int) -> List[float]:
+        with self._lock:
+            segments, frozen = self.segments, self._frozen
+            delta_ids, delta = self._delta_ids[:self._count], self._delta[:self._count]
+        for ids, vectors in [(delta_ids, delta)] + frozen[::-1]:
+            match = np.flatnonzero(ids == i)
+            if len(match):
+                return vectors[match[0]].tolist()
+        for segment in segments:
+            j = segment.local(i)
+            if j is not None:
+                return segment.index.get_item_vector(j)
+        raise IndexError(f"Item {i} is not in the index.")
+
+    def get_item_vectors(self, ids: np.ndarray) -> np.ndarray:
+        return np.array([self.get_item_vector(i) for i in np.asarray(ids).tolist()],
+                        dtype=np.float32).reshape(-1, self.dimension)
+
+    def live(self, ids: np.ndarray) -> np.ndarray:
+        """Returns a boolean per id: whether it is in the index and not deleted. Purged items are not."""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            segments, frozen, tombstones = self.segments, self._frozen, self.tombstones
+            delta_ids = self._delta_ids[:self._count]
+        found = np.zeros(len(ids), dtype=bool)
+        for present in [segment.ids for segment in segments] + [frozen_ids for frozen_ids, _ in frozen] + [delta_ids]:
+            found |= np.isin(ids, present)
+        if tombstones:
+            found &= ~np.isin(ids, np.fromiter(tombstones, dtype=np.int64, count=len(tombstones)))
+        return found
+
+    def get_n_items(self) -> int:
+        """The number of live items, excluding deleted ones."""
+        with self._lock:
+            total = sum(len(segment) for segment in self.segments) + sum(len(ids) for ids, _ in self._frozen)
+            return total + self._count - len(self.tombstones)
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """(resident, mapped) bytes of every segment, the frozen deltas and the delta."""
+        with self._lock:
+            segments, frozen, delta, delta_ids = self.segments, self._frozen, self._delta, self._delta_ids
+        resident, mapped = delta.nbytes + delta_ids.nbytes, 0
+        for segment in segments:
+            index_resident, index_mapped = memory_usage(segment.index)
+            resident += index_resident + segment.ids.nbytes + segment._order.nbytes
+            mapped += index_mapped
+        resident += sum(ids.nbytes + vectors.nbytes for ids, vectors in frozen)
+        return resident, mapped
+
+    def close(self):
+        """Stops the background compactor, waiting for a build that is in progress, and closes every segment's index."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for segment in self.segments:
+            close = getattr(segment.index, "close", None)
+            if close is not None:
+                close()
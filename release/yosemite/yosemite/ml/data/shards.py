@@ -0,0 +1,328 @@
+from yosemite.ml.data.filters import Filter
+from yosemite.ml.data.stream import StreamingBuilder
+from typing import Dict, List, Optional, Tuple
+import heapq
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import traceback
+import uuid
+import zlib
+import numpy as np
+
+SHARDS = "shards.json"
+
+ShardHit = Tuple[int, int, str, str, float]
+
+def shard_of(document_id: str, shards: int) -> int:
+    """The shard a document lives on. Every chunk of a document goes to the same shard, so deletes stay local."""
+    return zlib.crc32(document_id.encode("utf-8")) % shards
+
+def _shard_path(path: str, n: int) -> str:
+    return os.path.join(path, f"shard-{n:03d}")
+
+# Manifest fields every shard must agree on, and the VectorDatabase option each one restores.
+_SETTINGS = {"model_name": "model_name", "chunker": "chunker", "chunk_tokens": "chunk_tokens",
+             "chunk_overlap": "chunk_overlap", "quantization": "quantization", "index": "engine",
+             "engine_options": "engine_options"}
+
+def _saved_options(path: str, shards: int, options: Dict) -> Dict:
+    """
+    Reads the settings the saved shards were built with, so queries are embedded with their model.
+
+    Raises:
+        ValueError: If two shards were built with different settings, or options asks for a different one.
+    """
+    from yosemite.ml.data.storage import read_manifest
+
+    saved: Dict = {}
+    for n in range(shards):
+        shard_path = _shard_path(path, n)
+        manifest = read_manifest(shard_path) if os.path.isdir(shard_path) else None
+        if manifest is None:
+            continue
+        for field, option in _SETTINGS.items():
+            value = manifest.get(field)
+            if field == "index" and value == "quantized":
+                continue
+            if option in saved and saved[option] != value:
+                raise ValueError(f"Shards in {path} disagree on {field}: {saved[option]!r} and {value!r} (shard {n}).")
+            saved[option] = value
+    for option, value in saved.items():
+        if option in options and options[option] != value:
+            raise ValueError(f"{path} was built with {option}={value!r}, not {options[option]!r}.")
+    return saved
+
+def _serve(connection, path: str, options: Dict):
+    """The loop run by each shard process: one VectorDatabase, driven by messages on connection."""
+    from yosemite.ml.data.storage import read_manifest
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    db = VectorDatabase(**options)
+    if os.path.isdir(path) and read_manifest(path) is not None:
+        db.load(path)
+
+    def add(documents, ids, metadata, num_trees):
+        if not db.index:
+            db.create(documents, num_trees=num_trees, metadata=metadata, ids=ids)
+        else:
+            db.add(documents, ids=ids, metadata=metadata)
+        return len(documents)
+
+    def search(query_vectors, k, search_k, filter):
+        if not db.index:
+            return [[] for _ in query_vectors]
+        if filter and any(name not in db.metadata.columns and name != "document_id" for name in filter):
+            # A column that no document on this shard has: nothing here can match.
+            return [[] for _ in query_vectors]
+        results = db.search_vectors(query_vectors, k, search_k=search_k, threads=1, filter=filter)
+        return [[(float(distance), int(i), db.sentences[int(i)], db.document_ids[int(i)])
+                 for i, distance in zip(indices, distances) if i >= 0]
+                for indices, distances in zip(results.indices, results.distances)]
+
+    def delete(document_id):
+        return db.delete(document_id) if db.index else 0
+
+    def save():
+        if db.index:
+            db.save(path)
+
+    def count():
+        return db.index.get_n_items() if db.index else 0
+
+    handlers = {"add": add, "search": search, "delete": delete, "save": save, "count": count}
+    while True:
+        command, args = connection.recv()
+        if command == "close":
+            db.close()
+            connection.close()
+            return
+        try:
+            connection.send((True, handlers[command](*args)))
+        except Exception as e:
+            connection.send((False, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+
+class ShardedDatabase:
+    """
+    A VectorDatabase split across shard processes, each with its own index and memory.
+
+    Documents are hash-partitioned by id, so all chunks of a document live on one shard.
+    Adds are embedded by the shards in parallel. A query is embedded once here, sent to
+    every shard at the same time over a multiprocessing pipe, and the per-shard top-k
+    lists are merged by distance. Each shard saves to its own directory under path.
+    """
+
+    def __init__(self, path: str, shards: Optional[int] = None, **options):
+        """
+        Args:
+            path (str): The directory that holds one sub-directory per shard.
+            shards (Optional[int]): The number of shards; read from path when it already holds a sharded database.
+            **options: Passed to each shard's VectorDatabase, e.g. model_name and chunker. A cache_dir is
+                split into one sub-directory per shard, since an EmbeddingCache has a single writer.
+        """
+        self.path = os.path.abspath(path)
+        self.options = options
+        saved = read_shards(self.path)
+        if saved is not None and shards is not None and shards != saved:
+            raise ValueError(f"{path} has {saved} shards, not {shards}; use rebalance() to change the count.")
+        self.shards = shards or saved or os.cpu_count() or 1
+        if saved is not None:
+            options = {**options, **_saved_options(self.path, saved, options)}
+            self.options = options
+        self._embedder = None
+        self._lock = threading.Lock()
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for n in range(self.shards):
+            shard_options = options
+            if options.get("cache_dir"):
+                shard_options = {**options, "cache_dir": _shard_path(options["cache_dir"], n)}
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, _shard_path(self.path, n), shard_options),
+                                      name=f"yosemite-shard-{n}", daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    def _call(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, object]:
+        """Sends one request to each listed shard, then waits for all of them, so the shards work in parallel."""
+        with self._lock:
+            for n, request in requests.items():
+                self._connections[n].send(request)
+            replies = {n: self._connections[n].recv() for n in requests}
+        for n, (ok, value) in replies.items():
+            if not ok:
+                raise RuntimeError(f"Shard {n} failed: {value}")
+        return {n: value for n, (ok, value) in replies.items()}
+
+    def _broadcast(self, command: str, *args) -> List[object]:
+        replies = self._call({n: (command, args) for n in range(self.shards)})
+        return [replies[n] for n in range(self.shards)]
+
+    def add(self, documents: List[str], ids: Optional[List[str]] = None, metadata: Optional[List[Dict[str, str]]] = None,
+            num_trees: int = 10) -> List[str]:
+        """Chunks, embeds and indexes documents on their shards; returns their ids."""
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        if len(ids) != len(documents):
+            raise ValueError("Expected one id per document.")
+        if metadata is not None and len(metadata) != len(documents):
+            raise ValueError("Expected one metadata dict per document.")
+        parts: Dict[int, Tuple[list, list, list]] = {}
+        for i, document_id in enumerate(ids):
+            part = parts.setdefault(shard_of(document_id, self.shards), ([], [], []))
+            part[0].append(documents[i])
+            part[1].append(document_id)
+            part[2].append(metadata[i] if metadata else {})
+        self._call({n: ("add", (texts, document_ids, values if metadata else None, num_trees))
+                    for n, (texts, document_ids, values) in parts.items()})
+        return ids
+
+    def delete(self, document_id: str) -> int:
+        """Removes every chunk of a document; returns the number of chunks."""
+        n = shard_of(document_id, self.shards)
+        return self._call({n: ("delete", (document_id,))})[n]
+
+    def search_batch(self, queries: List[str], k: int = 5, search_k: Optional[int] = None,
+                     filter: Optional[Filter] = None) -> List[List[ShardHit]]:
+        """
+        Searches every shard and merges their results.
+
+        Returns:
+            List[List[ShardHit]]: For each query, up to k (shard, index, sentence, document_id, distance)
+            tuples, nearest first. index is local to the shard.
+        """
+        if self._embedder is None:
+            from yosemite.ml.text.util import SentenceTransformer
+            self._embedder = SentenceTransformer(self.options.get("model_name", "all-MiniLM-L6-v2"),
+                                                 engine=self.options.get("inference", "torch"))
+        query_vectors = self._embedder.embed_query(list(queries))
+        replies = self._broadcast("search", query_vectors, k, search_k, filter)
+        merged = []
+        for q in range(len(queries)):
+            hits = ((distance, n, i, sentence, document_id)
+                    for n, reply in enumerate(replies) for distance, i, sentence, document_id in reply[q])
+            merged.append([(n, i, sentence, document_id, distance)
+                           for distance, n, i, sentence, document_id in heapq.nsmallest(k, hits)])
+        return merged
+
+    def search(self, query: str, k: int = 5, filter: Optional[Filter] = None) -> List[ShardHit]:
+        return self.search_batch([query], k, filter=filter)[0]
+
+    def counts(self) -> List[int]:
+        """The number of live chunks on each shard."""
+        return self._broadcast("count")
+
+    def save(self):
+        """Saves every shard into its directory under path."""
+        os.makedirs(self.path, exist_ok=True)
+        self._broadcast("save")
+        write_shards(self.path, self.shards)
+
+    def close(self):
+        """Stops the shard processes. Unsaved changes are lost."""
+        with self._lock:
+            for connection, process in zip(self._connections, self._processes):
+                try:
+                    connection.send(("close", ()))
+                except (BrokenPipeError, OSError):
+                    pass
+                process.join(timeout=10)
+                connection.close()
+            self._connections, self._processes = [], []
+
+    def __enter__(self) -> "ShardedDatabase":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_shards(path: str) -> Optional[int]:
+    """Returns the shard count of a saved sharded database, or None."""
+    shards_path = os.path.join(path, SHARDS)
+    if not os.path.isfile(shards_path):
+        return None
+    with open(shards_path, "r", encoding="utf-8") as file:
+        return json.load(file)["shards"]
+
+def write_shards(path: str, shards: int):
+    temporary = os.path.join(path, SHARDS + ".tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"shards": shards}, file)
+    os.replace(temporary, os.path.join(path, SHARDS))
+
+def rebalance(path: str, shards: int, num_trees: Optional[int] = None, buffer_size: int = 10000):
+    """
+    Re-partitions a saved sharded database of annoy shards into a new number of shards, offline.
+
+    Live chunks are streamed out of the old shards, with their vectors, document ids and
+    metadata, into new shard directories, so nothing is re-embedded. The old shards are
+    replaced only once every new one is complete. Close any ShardedDatabase on path first.
+
+    Args:
+        path (str): The sharded database directory.
+        shards (int): The new number of shards.
+        num_trees (Optional[int]): Annoy trees per new shard; defaults to the old shards' setting.
+        buffer_size (int): Rows held in memory per new shard while streaming.
+    """
+    from yosemite.ml.data.storage import read_manifest
+    from yosemite.ml.data.vdb import VectorDatabase
+
+    old = read_shards(path)
+    if old is None:
+        raise FileNotFoundError(f"No sharded database in {path}")
+    for n in range(old):
+        shard_path = _shard_path(path, n)
+        manifest = read_manifest(shard_path) if os.path.isdir(shard_path) else None
+        if manifest is not None and (manifest["index"] != "annoy" or manifest.get("quantization")):
+            # StreamingBuilder writes annoy indexes only; rebuilding would silently change the engine.
+            raise ValueError(f"Shard {n} uses the {manifest['index']} index; rebalance only rebuilds annoy shards.")
+    staging = os.path.join(path, "rebalance")
+    shutil.rmtree(staging, ignore_errors=True)
+    builders = None
+    for n in range(old):
+        shard_path = _shard_path(path, n)
+        manifest = read_manifest(shard_path) if os.path.isdir(shard_path) else None
+        if manifest is None:
+            continue
+        db = VectorDatabase()
+        db.load(shard_path)
+        if builders is None:
+            builders = [StreamingBuilder(_shard_path(staging, m), db.dimension,
+                                         num_trees=num_trees or db.num_trees or 10, buffer_size=buffer_size,
+                                         model_name=db.model_name, chunker=db.chunker,
+                                         chunk_tokens=db.chunk_tokens, chunk_overlap=db.chunk_overlap)
+                        for m in range(shards)]
+        rows = np.arange(len(db.sentences))
+        if hasattr(db.index, "live"):
+            rows = rows[db.index.live(rows)]
+        for start in range(0, len(rows), buffer_size):
+            batch = rows[start:start + buffer_size]
+            for i, vector in zip(batch.tolist(), db.index.get_item_vectors(batch)):
+                document_id = db.document_ids[i]
+                builders[shard_of(document_id, shards)].add(db.sentences[i], vector, document_id, db.metadata.row(i))
+        db.close()
+    if builders is None:
+        raise ValueError(f"{path} has no saved shards to rebalance.")
+    for m, builder in enumerate(builders):
+        builder.flush()
+        if builder.count:
+            builder.finish()
+        else:
+            # An empty shard has no directory and starts empty when it is opened.
+            builder.abort()
+            os.makedirs(_shard_path(staging, m))
+
+    retired = os.path.join(path, "retired")
+    os.makedirs(retired, exist_ok=True)
+    for n in range(old):
+        if os.path.isdir(_shard_path(path, n)):
+            os.rename(_shard_path(path, n), _shard_path(retired, n))
+    for m in range(shards):
+        os.rename(_shard_path(staging, m), _shard_path(path, m))
+    write_shards(path, shards)
+    shutil.rmtree(retired)
+    shutil.rmtree(staging)
@@ -0,0 +1,374 @@
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import io
+import json
+import os
+import sys
+import numpy as np
+
+FORMAT = "yosemite-vdb"
+VERSION = 2
+MANIFEST = "manifest.json"
+
+def memory_usage(value) -> Tuple[int, int]:
+    """
+    Returns the (resident, mapped) bytes behind value.
+
+    Arrays backed by a memory-mapped file count as mapped: the OS pages them in on demand
+    and can drop them again. Objects with their own memory_usage() method report
+    themselves; lists and tuples are counted with their items, object headers included.
+    """
+    if hasattr(value, "memory_usage"):
+        return value.memory_usage()
+    if isinstance(value, np.ndarray):
+        base = value
+        while base is not None:
+            if isinstance(base, np.memmap):
+                return 0, value.nbytes
+            base = getattr(base, "base", None)
+        return value.nbytes, 0
+    if isinstance(value, (list, tuple)):
+        resident, mapped = sys.getsizeof(value), 0
+        for item in value:
+            item_resident, item_mapped = memory_usage(item)
+            resident += item_resident
+            mapped += item_mapped
+        return resident, mapped
+    if value is None:
+        return 0, 0
+    return sys.getsizeof(value), 0
+
+def _save(path: str, values: np.ndarray):
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, values)
+    os.replace(path + ".tmp", path)
+
+def _append(path: str, values: np.ndarray, keep: int):
+    """
+    Appends values to a one-dimensional .npy file after its first keep entries.
+
+    Only the header is rewritten in place, so the cost is the length of values, not of
+    the file. Entries past keep, left by an append whose manifest was never written, are
+    cut off first. If the new length no longer fits the header, the file is rewritten.
+    """
+    with open(path, "r+b") as file:
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        _, fortran_order, dtype = read_header(file)
+        offset = file.tell()
+        values = np.ascontiguousarray(values, dtype=dtype).reshape(-1)
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else np.lib.format.write_array_header_2_0
+        write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                              "shape": (keep + len(values),)})
+        if len(header.getvalue()) == offset:
+            file.seek(0)
+            file.write(header.getvalue())
+            file.truncate(offset + keep * dtype.itemsize)
+            file.seek(offset + keep * dtype.itemsize)
+            file.write(values.tobytes())
+            return
+    existing = np.load(path, mmap_mode="r")[:keep]
+    _save(path, np.concatenate([existing, values]))
+
+class ArrayWriter:
+    """
+    Appends to a one-dimensional .npy file whose final length is not known up front.
+
+    Values are written to a raw file as they arrive and framed as .npy on close(), so
+    memory use does not grow with the length of the array.
+    """
+
+    def __init__(self, path: str, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._file = open(path + ".raw", "wb")
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype).reshape(-1)
+        self._file.write(values.tobytes())
+        self.count += len(values)
+
+    def close(self, chunk: int = 1 << 20):
+        self._file.close()
+        raw = np.memmap(self.path + ".raw", dtype=self.dtype, mode="r") if self.count else np.empty(0, self.dtype)
+        target = np.lib.format.open_memmap(self.path + ".tmp", mode="w+", dtype=self.dtype, shape=(self.count,))
+        for start in range(0, self.count, chunk):
+            target[start:start + chunk] = raw[start:start + chunk]
+        target.flush()
+        del target, raw
+        os.replace(self.path + ".tmp", self.path)
+        os.remove(self.path + ".raw")
+
+class ArenaWriter:
+    """Streams strings into the <name>.bin and <name>.idx.npy files that TextArena.open reads."""
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.count = 0
+        self._offset = 0
+        self._file = open(os.path.join(path, f"{name}.bin.tmp"), "wb")
+        self._offsets = ArrayWriter(os.path.join(path, f"{name}.idx.npy"), np.uint64)
+        self._pending = array("Q", [0])
+
+    def append(self, text: str):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._offset += len(data)
+        self._pending.append(self._offset)
+        self.count += 1
+        if len(self._pending) >= 65536:
+            self._flush()
+
+    def _flush(self):
+        self._offsets.append(np.frombuffer(self._pending, dtype=np.uint64))
+        self._pending = array("Q")
+
+    def close(self):
+        self._file.close()
+        self._flush()
+        self._offsets.close()
+        # Replacing rather than truncating keeps readers that still map the old file valid.
+        os.replace(os.path.join(self.path, f"{self.name}.bin.tmp"), os.path.join(self.path, f"{self.name}.bin"))
+
+    def __enter__(self) -> "ArenaWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TextArena:
+    """
+    A read-only list of strings stored as one UTF-8 blob plus an offsets array.
+
+    Both files are memory-mapped, so opening an arena costs the same for ten strings
+    or ten million, and a string is only decoded when it is read.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @staticmethod
+    def write(path: str, name: str, texts: Iterable[str]) -> int:
+        """
+        Streams texts into <name>.bin and <name>.idx.npy under path.
+
+        Args:
+            path (str): The directory to write into.
+            name (str): The file name prefix.
+            texts (Iterable[str]): The strings to store, in order.
+
+        Returns:
+            int: The number of strings written.
+        """
+        with ArenaWriter(path, name) as writer:
+            for text in texts:
+                writer.append(text)
+        return writer.count
+
+    @staticmethod
+    def append(path: str, name: str, texts: Iterable[str], keep: int) -> int:
+        """
+        Appends texts to an arena saved under path, after its first keep strings.
+
+        Args:
+            path (str): The directory the arena was written into.
+            name (str): The file name prefix.
+            texts (Iterable[str]): The strings to add, in order.
+            keep (int): How many saved strings to keep; any past them are dropped.
+
+        Returns:
+            int: The number of strings in the arena afterwards.
+        """
+        offsets_path, blob_path = os.path.join(path, f"{name}.idx.npy"), os.path.join(path, f"{name}.bin")
+        end = int(np.load(offsets_path, mmap_mode="r")[keep])
+        blob = bytearray()
+        offsets = array("Q")
+        for text in texts:
+            blob += text.encode("utf-8")
+            offsets.append(end + len(blob))
+        with open(blob_path, "r+b") as file:
+            file.truncate(end)
+            file.seek(end)
+            file.write(blob)
+        _append(offsets_path, np.frombuffer(offsets, dtype=np.uint64), keep + 1)
+        return keep + len(offsets)
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "TextArena":
+        """Packs texts into an in-memory arena."""
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for text in texts:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+        return cls(np.frombuffer(offsets, dtype=np.uint64), np.frombuffer(blob, dtype=np.uint8))
+
+    @classmethod
+    def open(cls, path: str, name: str, count: Optional[int] = None) -> "TextArena":
+        """Maps an arena written under path; count, if given, ignores strings past the first count."""
+        offsets = np.load(os.path.join(path, f"{name}.idx.npy"), mmap_mode="r")
+        if count is not None:
+            offsets = offsets[:count + 1]
+        blob_path = os.path.join(path, f"{name}.bin")
+        # np.memmap refuses empty files, so an empty arena gets an empty array instead.
+        if os.path.getsize(blob_path):
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.empty(0, dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("TextArena index out of range")
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def memory_usage(self) -> Tuple[int, int]:
+        offsets, blob = memory_usage(self.offsets), memory_usage(self.blob)
+        return offsets[0] + blob[0], offsets[1] + blob[1]
+
+class IdTable:
+    """
+    Document ids for every chunk, stored as one int32 code per chunk plus an arena of the distinct ids.
+
+    Chunks of the same document share a code, so the table stays small when documents
+    are split into many chunks.
+    """
+
+    def __init__(self, codes: np.ndarray, names: TextArena):
+        self.codes = codes
+        self.names = names
+
+    @staticmethod
+    def write(path: str, ids: Iterable[str]) -> int:
+        """
+        Streams per-chunk document ids into doc_ids.npy and the doc_names arena under path.
+
+        Args:
+            path (str): The directory to write into.
+            ids (Iterable[str]): The document id of each chunk, in order.
+
+        Returns:
+            int: The number of chunks written.
+        """
+        lookup: Dict[str, int] = {}
+        codes = array("i")
+        for doc_id in ids:
+            code = lookup.get(doc_id)
+            if code is None:
+                code = lookup[doc_id] = len(lookup)
+            codes.append(code)
+        _save(os.path.join(path, "doc_ids.npy"), np.frombuffer(codes, dtype=np.int32))
+        TextArena.write(path, "doc_names", lookup)
+        return len(codes)
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[str]) -> "IdTable":
+        """Interns per-chunk document ids into an in-memory table."""
+        lookup: Dict[str, int] = {}
+        codes = array("i")
+        for doc_id in ids:
+            code = lookup.get(doc_id)
+            if code is None:
+                code = lookup[doc_id] = len(lookup)
+            codes.append(code)
+        return cls(np.frombuffer(codes, dtype=np.int32), TextArena.from_texts(lookup))
+
+    @staticmethod
+    def append(path: str, codes: np.ndarray, names: Iterable[str], keep: int, keep_names: int):
+        """
+        Appends chunk codes and newly seen document ids to a table saved under path.
+
+        Args:
+            path (str): The directory the table was written into.
+            codes (np.ndarray): The code of each new chunk; new ids are numbered after the saved ones.
+            names (Iterable[str]): The document ids first seen among the new chunks, in code order.
+            keep (int): How many saved chunks to keep.
+            keep_names (int): How many saved document ids to keep.
+        """
+        _append(os.path.join(path, "doc_ids.npy"), codes, keep)
+        TextArena.append(path, "doc_names", names, keep_names)
+
+    @classmethod
+    def open(cls, path: str, count: Optional[int] = None) -> "IdTable":
+        codes = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode="r")
+        return cls(codes[:count] if count is not None else codes, TextArena.open(path, "doc_names"))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.names[int(self.codes[i])]
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def memory_usage(self) -> Tuple[int, int]:
+        codes, names = memory_usage(self.codes), self.names.memory_usage()
+        return codes[0] + names[0], codes[1] + names[1]
+
+class Appended:
+    """A read-only sequence, such as a TextArena, followed by an in-memory list of rows added since it was opened."""
+
+    def __init__(self, base):
+        self.base = base
+        self.tail = []
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values: Iterable):
+        self.tail.extend(values)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.tail)
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if i >= len(self.base):
+            return self.tail[i - len(self.base)]
+        return self.base[i]
+
+    def __iter__(self) -> Iterator:
+        yield from self.base
+        yield from self.tail
+
+    def memory_usage(self) -> Tuple[int, int]:
+        base, tail = memory_usage(self.base), memory_usage(self.tail)
+        return base[0] + tail[0], base[1] + tail[1]
+
+def write_manifest(path: str, **fields):
+    """Writes the manifest last, so a directory without one is never mistaken for a complete save."""
+    manifest = {"format": FORMAT, "version": VERSION, **fields}
+    temporary = os.path.join(path, MANIFEST + ".tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary, os.path.join(path, MANIFEST))
+
+def read_manifest(path: str) -> Optional[dict]:
+    """Returns the manifest in path, or None if path is not a saved database."""
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a {FORMAT} directory.")
+    if manifest.get("version", 0) > VERSION:
+        raise ValueError(f"{path} was written by format version {manifest['version']}; "
+                         f"this version of yosemite reads up to {VERSION}.")
+    return manifest
@@ -0,0 +1,128 @@
+from yosemite.ml.data.engines import AnnoyEngine
+from yosemite.ml.data.filters import MetadataColumns
+from yosemite.ml.data.storage import ArenaWriter, ArrayWriter, write_manifest
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import os
+import shutil
+import uuid
+import numpy as np
+
+class StreamingBuilder:
+    """
+    Builds a saved VectorDatabase directory from a stream of (text, vector) pairs, without holding the corpus in memory.
+
+    Vectors go straight into an Annoy index built on disk, and chunk text and document
+    ids are appended to their files as they arrive. Only buffer_size rows are held at a
+    time, so memory stays flat whether the stream has a thousand chunks or fifty million;
+    metadata, if any, costs four bytes per chunk and column.
+    The directory is loadable with VectorDatabase.load once finish() has written its manifest.
+
+    Chunks of one document should arrive together: consecutive chunks with the same
+    document id share one entry in the id table.
+    """
+
+    def __init__(self, path: str, dimension: Optional[int] = None, num_trees: int = 10, n_jobs: int = -1,
+                 buffer_size: int = 10000, **manifest):
+        """
+        Args:
+            path (str): The directory to write; it is created if needed.
+            dimension (Optional[int]): The vector dimension; taken from the first vector if None.
+            num_trees (int): The number of Annoy trees.
+            n_jobs (int): Threads used to build the trees; -1 uses every core.
+            buffer_size (int): How many rows are held in memory before they are written out.
+            **manifest: Extra manifest fields, such as model_name and chunker, that VectorDatabase.load restores.
+        """
+        self.path = os.path.abspath(path)
+        self.dimension = dimension
+        self.num_trees = num_trees
+        self.n_jobs = n_jobs
+        self.buffer_size = buffer_size
+        self.manifest = manifest
+        self.count = 0
+        self.index = None
+        self._texts: List[str] = []
+        self._vectors: List[np.ndarray] = []
+        self._document_ids: List[Optional[str]] = []
+        self._last_id = None
+        self.metadata = MetadataColumns()
+        os.makedirs(self.path, exist_ok=True)
+        self._chunks = ArenaWriter(self.path, "chunks")
+        self._names = ArenaWriter(self.path, "doc_names")
+        self._codes = ArrayWriter(os.path.join(self.path, "doc_ids.npy"), np.int32)
+
+    def add(self, text: str, vector: Union[List[float], np.ndarray], document_id: Optional[str] = None,
+            metadata: Optional[Dict[str, str]] = None):
+        """Adds one chunk; without a document_id it becomes its own document."""
+        self.metadata.extend(metadata, 1)
+        self._texts.append(text)
+        self._vectors.append(np.asarray(vector, dtype=np.float32))
+        self._document_ids.append(document_id)
+        if len(self._texts) >= self.buffer_size:
+            self.flush()
+
+    def add_many(self, items: Iterable[Union[Tuple[str, list], Tuple[str, list, str]]]):
+        """Adds (text, vector), (text, vector, document_id) or (text, vector, document_id, metadata) tuples from any iterable, such as a generator."""
+        for item in items:
+            self.add(*item)
+
+    def flush(self):
+        """Writes the buffered rows out."""
+        if not self._texts:
+            return
+        vectors = np.stack(self._vectors)
+        if self.index is None:
+            self.dimension = self.dimension or vectors.shape[1]
+            self.index = AnnoyEngine(self.dimension)
+            self.index.on_disk_build(os.path.join(self.path, "index" + AnnoyEngine.extension))
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}.")
+        self.index.add_items(np.arange(self.count, self.count + len(vectors)), vectors)
+        codes = np.empty(len(self._texts), dtype=np.int32)
+        for j, (text, document_id) in enumerate(zip(self._texts, self._document_ids)):
+            self._chunks.append(text)
+            if document_id is None or document_id != self._last_id:
+                self._last_id = document_id
+                self._names.append(document_id if document_id is not None else str(uuid.uuid4()))
+            codes[j] = self._names.count - 1
+        self._codes.append(codes)
+        self.count += len(vectors)
+        self._texts, self._vectors, self._document_ids = [], [], []
+
+    def finish(self) -> int:
+        """
+        Builds the trees and writes the manifest.
+
+        Returns:
+            int: The number of chunks written.
+        """
+        self.flush()
+        if self.index is None:
+            raise ValueError("Nothing was added to the builder.")
+        self.index.build(self.num_trees, self.n_jobs)
+        self.index.index.unload()
+        self._chunks.close()
+        self._names.close()
+        self._codes.close()
+        self.metadata.save(self.path)
+        write_manifest(self.path, count=self.count, live=self.count, dimension=self.dimension, metric="angular",
+                       index="annoy", engine_options={}, quantization=None, num_trees=self.num_trees,
+                       metadata=list(self.metadata.columns),
+                       **self.manifest)
+        return self.count
+
+    def abort(self):
+        """Stops the build and removes the directory."""
+        for writer in (self._chunks, self._names, self._codes):
+            writer._file.close()
+        if self.index is not None:
+            self.index.index.unload()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> "StreamingBuilder":
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
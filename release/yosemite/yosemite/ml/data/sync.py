@@ -0,0 +1,154 @@
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import hashlib
+import json
+import os
+
+STATE = "sync.json"
+
+def _hash(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+class DatabaseSync:
+    """
+    Keeps a VectorDatabase in step with a whoosh Database, re-embedding only what changed.
+
+    Whoosh never rewrites a segment in place: new and updated documents land in new
+    segments, and deletes only mark documents in old ones. A sync therefore reads just
+    the segments it has not seen and the documents newly marked deleted, compares each
+    (id, content hash) with the last sync, and applies upserts and deletes to the vector
+    index in batches. Segments produced by a whoosh merge are read again, but documents
+    whose content hash is unchanged are not re-embedded.
+
+    The sync state is written to sync.json in the VectorDatabase directory right after
+    the database itself is saved. Document ids are expected to be unique in the Database.
+    """
+
+    def __init__(self, database, vectors, path: str, id_field: str = "id", content_field: str = "content",
+                 batch_size: int = 256):
+        """
+        Args:
+            database (Database): The whoosh Database to read from.
+            vectors (VectorDatabase): The database to update; loaded from path if it was saved there.
+            path (str): The directory vectors is saved to after each sync.
+            id_field (str): The stored field holding each document's id.
+            content_field (str): The stored field holding the text to embed.
+            batch_size (int): How many documents are embedded and added at a time.
+        """
+        self.database = database
+        self.vectors = vectors
+        self.path = os.path.abspath(path)
+        self.id_field = id_field
+        self.content_field = content_field
+        self.batch_size = batch_size
+        self.state = self._read_state()
+        if not vectors.index and self.state["documents"]:
+            vectors.load(self.path)
+
+    def close(self):
+        """Closes the VectorDatabase, stopping its background compaction."""
+        self.vectors.close()
+
+    def __enter__(self) -> "DatabaseSync":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_state(self) -> Dict:
+        state_path = os.path.join(self.path, STATE)
+        if not os.path.isfile(state_path):
+            return {"generation": None, "documents": {}, "segments": {}}
+        with open(state_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_state(self):
+        temporary = os.path.join(self.path, STATE + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.state, file)
+        os.replace(temporary, os.path.join(self.path, STATE))
+
+    def _changes(self, reader) -> Tuple[Dict[str, Tuple[str, str, str]], Set[str], Dict[str, List[int]]]:
+        """Returns the documents in unseen segments, the ids deleted since the last sync, and each segment's deletions."""
+        seen = self.state["segments"]
+        found: Dict[str, Tuple[str, str, str]] = {}
+        removed: Set[str] = set()
+        segments: Dict[str, List[int]] = {}
+        for leaf, _ in reader.leaf_readers():
+            segment = leaf.segment()
+            segment_id = segment.segment_id()
+            deleted = ([n for n in range(segment.doc_count_all()) if leaf.is_deleted(n)]
+                       if segment.has_deletions() else [])
+            segments[segment_id] = deleted
+            if segment_id not in seen:
+                for n in leaf.all_doc_ids():
+                    fields = leaf.stored_fields(n)
+                    content = fields.get(self.content_field) or ""
+                    found[fields[self.id_field]] = (content, _hash(content), segment_id)
+            else:
+                for n in sorted(set(deleted) - set(seen[segment_id])):
+                    removed.add(leaf.stored_fields(n)[self.id_field])
+        gone = set(seen) - set(segments)
+        if gone:
+            removed.update(doc_id for doc_id, (_, segment_id) in self.state["documents"].items() if segment_id in gone)
+        return found, removed, segments
+
+    def _batches(self, documents: List[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+        for start in range(0, len(documents), self.batch_size):
+            yield documents[start:start + self.batch_size]
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Applies every change made to the Database since the last sync, then saves.
+
+        The sync state only moves forward once the vectors are saved, so if embedding or
+        saving raises, the next sync applies the same changes again.
+
+        Returns:
+            Dict[str, int]: The number of documents added, changed, deleted and unchanged, and the whoosh generation synced to.
+        """
+        ix = self.database.ix
+        if ix is None:
+            raise ValueError("Database has not been created or loaded.")
+        generation = ix.latest_generation()
+        report = {"added": 0, "changed": 0, "deleted": 0, "unchanged": 0, "generation": generation}
+        if generation == self.state["generation"]:
+            return report
+
+        with ix.reader() as reader:
+            found, removed, segments = self._changes(reader)
+        # Copies, so a failed embed or save leaves the state at the last sync that completed.
+        documents = dict(self.state["documents"])
+        upserts = []
+        for doc_id, (content, content_hash, segment_id) in found.items():
+            removed.discard(doc_id)
+            previous = documents.get(doc_id)
+            if previous is not None and previous[0] == content_hash:
+                # Moved by a merge, not changed.
+                report["unchanged"] += 1
+            else:
+                report["changed" if previous is not None else "added"] += 1
+                upserts.append((doc_id, content))
+            documents[doc_id] = [content_hash, segment_id]
+        removed = {doc_id for doc_id in removed if doc_id in documents}
+        report["deleted"] = len(removed)
+
+        # New documents are deleted too: a sync that failed after adding some of them is retried from scratch.
+        stale = removed.union(doc_id for doc_id, _ in upserts)
+        if stale and self.vectors.index:
+            self.vectors.delete_many(stale)
+        for doc_id in removed:
+            del documents[doc_id]
+        for batch in self._batches(upserts):
+            contents, ids = [content for _, content in batch], [doc_id for doc_id, _ in batch]
+            if not self.vectors.index:
+                self.vectors.create(contents, ids=ids)
+            else:
+                self.vectors.add(contents, ids=ids)
+
+        if self.vectors.index:
+            self.vectors.save(self.path)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+        self.state = {**self.state, "generation": generation, "segments": segments, "documents": documents}
+        self._write_state()
+        return report
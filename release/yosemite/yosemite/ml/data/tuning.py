@@ -0,0 +1,121 @@
+from yosemite.ml.data.engines import create_engine
+from typing import Dict, Iterable, List, Optional, Sequence
+import os
+import tempfile
+import time
+import numpy as np
+
+class Trial:
+    """One measured (num_trees, search_k) setting."""
+
+    def __init__(self, num_trees: int, search_k: int, recall: float, latency_ms: float, memory: int, build_s: float):
+        self.num_trees = num_trees
+        self.search_k = search_k
+        self.recall = recall
+        self.latency_ms = latency_ms
+        self.memory = memory
+        self.build_s = build_s
+
+    def dominates(self, other: "Trial") -> bool:
+        """At least as good as other on recall, latency and memory, and better on one of them."""
+        no_worse = self.recall >= other.recall and self.latency_ms <= other.latency_ms and self.memory <= other.memory
+        better = self.recall > other.recall or self.latency_ms < other.latency_ms or self.memory < other.memory
+        return no_worse and better
+
+    def as_dict(self) -> Dict:
+        return {"num_trees": self.num_trees, "search_k": self.search_k, "recall": self.recall,
+                "latency_ms": self.latency_ms, "memory": self.memory, "build_s": self.build_s}
+
+    def __repr__(self) -> str:
+        return (f"Trial(num_trees={self.num_trees}, search_k={self.search_k}, recall={self.recall:.3f}, "
+                f"latency_ms={self.latency_ms:.3f}, memory={self.memory})")
+
+class TuningResult:
+    """Every trial of a sweep, its Pareto front, and the setting chosen for a recall target."""
+
+    def __init__(self, trials: List[Trial], k: int, target_recall: float):
+        self.trials = trials
+        self.k = k
+        self.target_recall = target_recall
+        self.pareto = sorted((trial for trial in trials if not any(other.dominates(trial) for other in trials)),
+                             key=lambda trial: trial.latency_ms)
+        reaching = [trial for trial in self.pareto if trial.recall >= target_recall]
+        if reaching:
+            self.best = min(reaching, key=lambda trial: (trial.latency_ms, trial.memory))
+        else:
+            self.best = max(self.pareto, key=lambda trial: (trial.recall, -trial.latency_ms))
+
+    def table(self, pareto_only: bool = True) -> str:
+        """The trials as a text table, fastest first; the chosen row is marked with *."""
+        rows = self.pareto if pareto_only else sorted(self.trials, key=lambda trial: trial.latency_ms)
+        lines = [f"  {'num_trees':>9} {'search_k':>9} {f'recall@{self.k}':>10} {'ms/query':>9} {'memory MB':>10} {'build s':>8}"]
+        for trial in rows:
+            mark = "*" if trial is self.best else " "
+            lines.append(f"{mark} {trial.num_trees:>9} {trial.search_k:>9} {trial.recall:>10.3f} "
+                         f"{trial.latency_ms:>9.3f} {trial.memory / 2 ** 20:>10.1f} {trial.build_s:>8.2f}")
+        return "\n".join(lines)
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """The exact k nearest rows of vectors for each query, by brute force."""
+    exact = create_engine("exact", vectors.shape[1])
+    exact.add_items(np.arange(len(vectors)), vectors)
+    exact.build()
+    return exact.search_batch(queries, k)[0]
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row[row >= 0].tolist()) & set(expected.tolist())) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+def tune(vectors: np.ndarray, queries: np.ndarray, k: int = 10, num_trees: Iterable[int] = (5, 10, 25, 50, 100),
+         search_k: Optional[Sequence[int]] = None, target_recall: float = 0.95, engine: str = "annoy",
+         engine_options: Optional[Dict] = None) -> TuningResult:
+    """
+    Sweeps build and search settings and measures recall@k, latency and memory for each.
+
+    Ground truth comes from an exact search over vectors. For every num_trees an index is
+    built once, saved to a temporary file to measure its size, and searched with every
+    search_k. Latency is the median over the queries, searched one at a time.
+
+    Args:
+        vectors (np.ndarray): The (n, dimension) corpus.
+        queries (np.ndarray): A sample of (q, dimension) query vectors.
+        k (int): The number of neighbours recall is measured at.
+        num_trees (Iterable[int]): The build settings to try; engines without trees build once.
+        search_k (Optional[Sequence[int]]): The search settings to try; by default -1 and k * num_trees times 2, 4, 8, 16 and 32.
+        target_recall (float): The recall the chosen setting must reach, if any setting does.
+        engine (str): "annoy" or "hnsw", where search_k is ef.
+        engine_options (Optional[Dict]): Passed to the engine's constructor.
+
+    Returns:
+        TuningResult: The trials, the Pareto front and the chosen setting.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    if engine == "exact":
+        raise ValueError("The exact engine has nothing to tune.")
+    truth = ground_truth(vectors, queries, k)
+    builds = list(num_trees) if engine == "annoy" else [-1]
+    trials = []
+    with tempfile.TemporaryDirectory() as directory:
+        for trees in builds:
+            index = create_engine(engine, vectors.shape[1], **(engine_options or {}))
+            start = time.perf_counter()
+            index.add_items(np.arange(len(vectors)), vectors)
+            index.build(trees)
+            build_s = time.perf_counter() - start
+            path = os.path.join(directory, f"{trees}{index.extension}")
+            index.save(path)
+            memory = os.path.getsize(path)
+            os.remove(path)
+            depth = k * max(trees, 1)
+            for setting in (search_k if search_k is not None else [-1] + [depth * m for m in (2, 4, 8, 16, 32)]):
+                found = np.full((len(queries), k), -1, dtype=np.int64)
+                timings = []
+                for q, query in enumerate(queries):
+                    start = time.perf_counter()
+                    ids, _ = index.search(query, k, setting)
+                    timings.append(time.perf_counter() - start)
+                    found[q, :len(ids)] = ids
+                trials.append(Trial(trees, setting, _recall(found, truth), float(np.median(timings)) * 1000,
+                                    memory, build_s))
+    return TuningResult(trials, k, target_recall)
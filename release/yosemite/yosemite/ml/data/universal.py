@@ -1,20 +1,21 @@
 from yosemite.ml.text.util import Chunker, SentenceTransformer
 from yosemite.ml.text.cross_encode import CrossEncoder as CrossEncode
-from typing import Union, List, Tuple, Optional, Dict
+from yosemite.ml.data.aio import SearchExecutor, default_executor
+from yosemite.ml.data.engines import create_engine, engines
+from collections import deque
+from typing import Union, List, Tuple, Optional, Dict, Iterable
 import os
 import uuid
-from annoy import AnnoyIndex
 from whoosh import index as whoosh_index
 from whoosh.analysis import StandardAnalyzer, FancyAnalyzer, LanguageAnalyzer, KeywordAnalyzer
 from whoosh.fields import Schema, TEXT, ID, KEYWORD, STORED
 from whoosh.qparser import QueryParser, QueryParserError, MultifieldParser
-import pandas as pd
-from PyPDF2 import PdfReader
-from ebooklib import epub
 
 class YosemiteDatabase:
     def __init__(self, dimension: Optional[int] = None, model_name: str = "all-MiniLM-L6-v2", 
-                 schema: Optional[Schema] = None, analyzer: Optional[str] = "standard"):
+                 schema: Optional[Schema] = None, analyzer: Optional[str] = "standard", cache_dir: Optional[str] = None,
+                 chunker: str = "spacy", chunk_tokens: Optional[int] = None, chunk_overlap: int = 0,
+                 inference: str = "torch", engine: str = "annoy", batch_window: Optional[float] = None):
         self.index = None
         self.dimension = dimension
         self.model_name = model_name
@@ -22,6 +23,16 @@ class YosemiteDatabase:
         self.schema = schema
         self.index_dir = None
         self.analyzer = analyzer
+        self.cache_dir = cache_dir
+        self._cache = None
+        self.chunker = chunker
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.inference = inference
+        self.engine = engine
+        self.batch_window = batch_window
+        if engine not in engines:
+            raise ValueError(f"Invalid engine: {engine}. Expected one of {tuple(engines)}.")
 
     def load(self, dir: str):
         self.index_dir = dir
@@ -53,66 +64,106 @@ class YosemiteDatabase:
         os.makedirs(self.index_dir, exist_ok=True)
         self.ix = whoosh_index.create_in(self.index_dir, self.schema)
 
+    def _embedder(self, cache: bool = False) -> SentenceTransformer:
+        if not cache or not self.cache_dir:
+            return SentenceTransformer(self.model_name, engine=self.inference, batch_window=self.batch_window)
+        # One EmbeddingCache per database: opening one reads and sorts its whole index.
+        if self._cache is not None and self._cache.model_name != self.model_name:
+            self._cache = None
+        embedder = SentenceTransformer(self.model_name, cache=self._cache or self.cache_dir, engine=self.inference,
+                                       batch_window=self.batch_window)
+        self._cache = embedder.cache
+        return embedder
+
+    def _chunker(self) -> Chunker:
+        if self.chunk_tokens is None:
+            return Chunker(backend=self.chunker)
+        return Chunker(backend=self.chunker, embedder=self._embedder(),
+                       max_tokens=self.chunk_tokens, overlap=self.chunk_overlap)
+
+    def _add_documents(self, writer, documents: Iterable[Tuple[str, str]], processes: Optional[int] = None):
+        chunker = self._chunker()
+        embedder = self._embedder(cache=True)
+        pending = {}
+
+        def contents():
+            for i, (doc_id, content) in enumerate(documents):
+                pending[i] = (doc_id, content)
+                yield content
+
+        if not processes or processes <= 1:
+            for i, chunks in chunker.chunk_many(contents()):
+                doc_id, content = pending.pop(i)
+                vectors = list(embedder.embed(chunks, as_tuples=False))
+                writer.add_document(id=doc_id, content=content, chunks="\n".join(chunks), vectors=vectors)
+            return
+
+        # Chunks from every document go through the pool as one stream; a document is
+        # written once all of its vectors have come back.
+        waiting = deque()
+        rows = deque()
+
+        def sentences():
+            for i, chunks in chunker.chunk_many(contents()):
+                waiting.append((pending.pop(i), chunks))
+                yield from chunks
+
+        def drain():
+            while waiting and len(rows) >= len(waiting[0][1]):
+                (doc_id, content), chunks = waiting.popleft()
+                vectors = [rows.popleft() for _ in chunks]
+                writer.add_document(id=doc_id, content=content, chunks="\n".join(chunks), vectors=vectors)
+
+        for matrix in embedder.embed_parallel(sentences(), processes=processes):
+            rows.extend(matrix)
+            drain()
+        drain()
+
     def load_dataset(self, path: str, id_column: str, content_column: str):
         if not self.ix:
             self.create()
+        import pandas as pd
+
         df = pd.read_csv(path)
         writer = self.ix.writer()
-        chunker = Chunker()
-        embedder = SentenceTransformer(self.model_name)
-        for _, row in df.iterrows():
-            doc_id = str(row[id_column])
-            doc_content = row[content_column]
-            chunks = chunker.chunk_text(doc_content)
-            vectors = [embedder.embed([chunk])[0][1] for chunk in chunks]
-            writer.add_document(id=doc_id, content=doc_content, chunks="\n".join(chunks), vectors=vectors)
+        self._add_documents(writer, ((str(row[id_column]), row[content_column]) for _, row in df.iterrows()))
         writer.commit()
 
-    def load_docs(self, dir: str):
+    def load_docs(self, dir: str, processes: Optional[int] = None):
         if not self.ix:
             self.create()
         if not os.path.exists(dir):
             raise FileNotFoundError(f"Directory {dir} does not exist.")
 
-        writer = self.ix.writer()
-        chunker = Chunker()
-        embedder = SentenceTransformer(self.model_name)
-        for file_path in os.listdir(dir):
-            file_path = os.path.join(dir, file_path)
-            if file_path.endswith(".txt"):
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read()
-            elif file_path.endswith(".pdf"):
-                with open(file_path, "rb") as file:
-                    reader = PdfReader(file)
-                    content = " ".join(page.extract_text() for page in reader.pages)
-            elif file_path.endswith(".epub"):
-                book = epub.read_epub(file_path)
-                content = " ".join(item.get_content().decode("utf-8") for item in book.get_items_of_type(9))
-            else:
-                continue
+        def read_files():
+            for file_path in os.listdir(dir):
+                file_path = os.path.join(dir, file_path)
+                if file_path.endswith(".txt"):
+                    with open(file_path, "r", encoding="utf-8") as file:
+                        content = file.read()
+                elif file_path.endswith(".pdf"):
+                    from PyPDF2 import PdfReader
+                    with open(file_path, "rb") as file:
+                        reader = PdfReader(file)
+                        content = " ".join(page.extract_text() for page in reader.pages)
+                elif file_path.endswith(".epub"):
+                    from ebooklib import epub
+                    book = epub.read_epub(file_path)
+                    content = " ".join(item.get_content().decode("utf-8") for item in book.get_items_of_type(9))
+                else:
+                    continue
+                yield str(uuid.uuid4()), content
 
-            doc_id = str(uuid.uuid4())
-            chunks = chunker.chunk_text(content)
-            vectors = [embedder.embed([chunk])[0][1] for chunk in chunks]
-            writer.add_document(id=doc_id, content=content, chunks="\n".join(chunks), vectors=vectors)
+        writer = self.ix.writer()
+        self._add_documents(writer, read_files(), processes)
         writer.commit()
 
     def add(self, documents: List[Dict[str, str]], shared_id: Optional[bool] = False):
         if not self.ix:
             self.create()
         writer = self.ix.writer()
-        chunker = Chunker()
-        embedder = SentenceTransformer(self.model_name)
-        for doc in documents:
-            if shared_id:
-                doc_id = "shared"
-            else:
-                doc_id = doc.get("id", str(uuid.uuid4()))
-            doc_content = doc["content"]
-            chunks = chunker.chunk_text(doc_content)
-            vectors = [embedder.embed([chunk])[0][1] for chunk in chunks]
-            writer.add_document(id=doc_id, content=doc_content, chunks="\n".join(chunks), vectors=vectors)
+        self._add_documents(writer, (("shared" if shared_id else doc.get("id", str(uuid.uuid4())), doc["content"])
+                                     for doc in documents))
         writer.commit()
 
     def search(self, query: str, fields: Optional[List[str]] = None, k: int = 5) -> List[Tuple[str, str, List[float]]]:
@@ -127,8 +178,8 @@ class YosemiteDatabase:
             try:
                 q = parser.parse(query)
                 results = searcher.search(q, limit=k)
-                embedder = SentenceTransformer(self.model_name)
-                query_vector = embedder.embed([query])[0][1]
+                embedder = self._embedder()
+                query_vector = embedder.embed_query([query])[0]
                 ranked_results = []
                 for hit in results:
                     doc_id = hit["id"]
@@ -136,7 +187,7 @@ class YosemiteDatabase:
                     doc_vectors = hit["vectors"]
                     if not self.dimension:
                         self.dimension = len(doc_vectors[0])
-                    index = AnnoyIndex(self.dimension, 'angular')
+                    index = create_engine(self.engine, self.dimension)
                     for i, vector in enumerate(doc_vectors):
                         index.add_item(i, vector)
                     index.build(10)
@@ -161,13 +212,13 @@ class YosemiteDatabase:
             except QueryParserError as e:
                 print(f"QueryParserError: {e}")
                 whoosh_chunks = []
-        embedder = SentenceTransformer(self.model_name)
-        query_vector = embedder.embed([query])[0][1]
+        embedder = self._embedder()
+        query_vector = embedder.embed_query([query])[0]
         vector_results = []
         for doc_id, doc_chunks, doc_vectors in zip(self.document_ids, self.sentences, self.vectors):
             if not self.dimension:
                 self.dimension = len(doc_vectors[0])
-            index = AnnoyIndex(self.dimension, 'angular')
+            index = create_engine(self.engine, self.dimension)
             for i, vector in enumerate(doc_vectors):
                 index.add_item(i, vector)
             index.build(10)
@@ -176,10 +227,20 @@ class YosemiteDatabase:
                 vector_results.append((doc_id, doc_chunks[idx]))
 
         combined_results = whoosh_chunks + [chunk for _, chunk in vector_results]
-        cross_encode = CrossEncode()
+        cross_encode = CrossEncode(engine=self.inference, batch_window=self.batch_window)
         ranked_results = cross_encode.rank(query, combined_results, [])
         return [(doc_id, chunk, score) for (doc_id, chunk), score in ranked_results]
 
+    async def asearch(self, query: str, fields: Optional[List[str]] = None, k: int = 5, timeout: Optional[float] = None,
+                      executor: Optional[SearchExecutor] = None) -> List[Tuple[str, str, List[float]]]:
+        """search on a bounded SearchExecutor, so the event loop stays free; raises asyncio.TimeoutError or asyncio.QueueFull."""
+        return await (executor or default_executor()).run(self.search, query, fields, k, timeout=timeout)
+
+    async def asearch_and_rank(self, query: str, k: int = 5, timeout: Optional[float] = None,
+                               executor: Optional[SearchExecutor] = None) -> List[Tuple[str, str, float]]:
+        """search_and_rank on a bounded SearchExecutor; raises asyncio.TimeoutError or asyncio.QueueFull."""
+        return await (executor or default_executor()).run(self.search_and_rank, query, k, timeout=timeout)
+
 if __name__ == "__main__":
     db = YosemiteDatabase()
     db.create()
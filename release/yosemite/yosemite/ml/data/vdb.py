@@ -1,27 +1,322 @@
 from yosemite.ml.text.util import Chunker, SentenceTransformer
-from yosemite.ml.data.db import Database
-from typing import Union, List, Tuple, Optional
+from yosemite.ml.data.aio import SearchExecutor, default_executor
+from yosemite.ml.data.engines import create_engine, engines, search_batch
+from yosemite.ml.data.filters import Column, Filter, MetadataColumns, filtered_search
+from yosemite.ml.data.quantize import QuantizedIndex
+from yosemite.ml.data.results import BatchResults
+from yosemite.ml.data.segments import SegmentedIndex
+from yosemite.ml.data.stream import StreamingBuilder
+from yosemite.ml.data.tuning import TuningResult, tune
+from yosemite.ml.data.storage import Appended, IdTable, TextArena, _save, memory_usage, read_manifest, write_manifest
+from typing import Union, List, Tuple, Optional, Iterable, Iterator, Dict
 import os
+import shutil
 import uuid
-from annoy import AnnoyIndex
+import numpy as np
 
 class VectorDatabase:
-    def __init__(self, dimension: Optional[int] = None, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, dimension: Optional[int] = None, model_name: str = "all-MiniLM-L6-v2", cache_dir: Optional[str] = None,
+                 chunker: str = "spacy", chunk_tokens: Optional[int] = None, chunk_overlap: int = 0,
+                 inference: str = "torch", quantization: Optional[str] = None, rescore: int = 10, storage_dir: Optional[str] = None,
+                 delta_size: int = 10000, max_segments: int = 8, engine: str = "annoy", engine_options: Optional[Dict] = None,
+                 batch_window: Optional[float] = None):
         self.index = None
         self.dimension = dimension
         self.document_ids = []
         self.sentences = []
         self.vectors = []
+        self.metadata = MetadataColumns()
+        self._document_column = None
         self.model_name = model_name
+        self.cache_dir = cache_dir
+        self._cache = None
+        self.chunker = chunker
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.inference = inference
+        self.quantization = quantization
+        self.rescore = rescore
+        self.storage_dir = storage_dir
+        self.delta_size = delta_size
+        self.max_segments = max_segments
+        self.num_trees = None
+        self.search_k = -1
+        self.tuning = None
+        self.path = None
+        self._dirty = False
+        # Rows, document ids and metadata columns already written to self.path, for saves that only append.
+        self._saved = None
+        self._saved_names = 0
+        self._saved_columns: List[str] = []
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        self.batch_window = batch_window
+        if quantization is not None and quantization not in QuantizedIndex.modes:
+            raise ValueError(f"Invalid quantization: {quantization}. Expected one of {QuantizedIndex.modes}.")
+        if engine not in engines:
+            raise ValueError(f"Invalid engine: {engine}. Expected one of {tuple(engines)}.")
+        if quantization is not None and engine != "annoy":
+            raise ValueError("A quantized index is its own engine; leave engine unset when quantization is used.")
+
+    def _new_index(self, storage_dir: Optional[str] = None):
+        if self.quantization:
+            return QuantizedIndex(self.dimension, self.quantization, path=storage_dir, rescore=self.rescore)
+        return create_engine(self.engine, self.dimension, **self.engine_options)
+
+    def _replace_index(self, index):
+        # Stops the old index's compactor thread and frees what it holds outside memory.
+        previous, self.index = self.index, index
+        close = getattr(previous, "close", None)
+        if close is not None and previous is not index:
+            close()
+
+    def close(self):
+        """Stops background compaction and releases the index; the database must not be used afterwards."""
+        self._replace_index(None)
+
+    def _mutable(self) -> SegmentedIndex:
+        if not self.index:
+            raise ValueError("Index has not been built or loaded.")
+        if not isinstance(self.index, SegmentedIndex):
+            segmented = SegmentedIndex(self.dimension, self._new_index, num_trees=self.num_trees or 10,
+                                       delta_size=self.delta_size, max_segments=self.max_segments)
+            base = "quantized" if self.quantization else "index"
+            saved = {"index": self._index_path(base), "ids": base + ".ids.npy"} if self._saved is not None else None
+            segmented.add_segment(self.index, np.arange(self.index.get_n_items()), saved)
+            self.index = segmented
+        for name in ("sentences", "document_ids"):
+            rows = getattr(self, name)
+            if isinstance(rows, tuple):
+                setattr(self, name, list(rows))
+            elif not isinstance(rows, (list, Appended)):
+                setattr(self, name, Appended(rows))
+        self._dirty = True
+        return self.index
+
+    def add(self, documents: List[str], ids: Optional[List[str]] = None, processes: Optional[int] = None,
+            metadata: Optional[List[Dict[str, str]]] = None) -> List[str]:
+        """Chunks, embeds and indexes documents without rebuilding; they are searchable when this returns."""
+        index = self._mutable()
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        if len(ids) != len(documents):
+            raise ValueError("Expected one id per document.")
+        if metadata is not None and len(metadata) != len(documents):
+            raise ValueError("Expected one metadata dict per document.")
+        chunker = self._chunker()
+        sentences, document_ids, counts = [], [], []
+        for i, chunks in chunker.chunk_many(documents):
+            sentences.extend(chunks)
+            document_ids.extend([ids[i]] * len(chunks))
+            counts.append((metadata[i] if metadata else None, len(chunks)))
+
+        # Rows go in before vectors, so a concurrent search never sees an id without its text.
+        start = len(self.sentences)
+        self.sentences.extend(sentences)
+        self.document_ids.extend(document_ids)
+        for vectors in self._encode(sentences, processes):
+            index.add_items(np.arange(start, start + len(vectors)), vectors)
+            start += len(vectors)
+        for values, count in counts:
+            self.metadata.extend(values, count)
+        return ids
+
+    def delete(self, document_id: str) -> int:
+        """Removes every chunk of a document from search results; returns the number of chunks."""
+        return self.delete_many([document_id])
+
+    def delete_many(self, document_ids: Iterable[str]) -> int:
+        """Removes every chunk of several documents in one pass; returns the number of chunks."""
+        index = self._mutable()
+        rows = self._document_ids_column().rows(set(document_ids))
+        rows = rows[index.live(rows)]
+        for i in rows.tolist():
+            index.delete(i)
+        return len(rows)
+
+    def _index_path(self, base: str) -> str:
+        return base if self.quantization else base + engines[self.engine].extension
+
+    def _write_manifest(self, path: str, count: int, **fields):
+        write_manifest(path, count=count, live=self.index.get_n_items(), dimension=self.dimension, metric="angular",
+                       model_name=self.model_name, index="quantized" if self.quantization else self.engine,
+                       engine_options=self.engine_options,
+                       quantization=self.quantization, num_trees=self.num_trees, search_k=self.search_k,
+                       tuning=self.tuning, chunker=self.chunker,
+                       chunk_tokens=self.chunk_tokens, chunk_overlap=self.chunk_overlap,
+                       metadata=list(self.metadata.columns), **fields)
+
+    def _save_segment(self, path: str, segment, name: str) -> dict:
+        segment.index.save(self._index_path(os.path.join(path, name)))
+        np.save(os.path.join(path, name + ".ids.npy"), segment.ids)
+        return {"index": self._index_path(name), "ids": name + ".ids.npy"}
+
+    def _write(self, path: str) -> List[Tuple[object, dict]]:
+        os.makedirs(path, exist_ok=True)
+        fields, written = {}, []
+        if isinstance(self.index, SegmentedIndex):
+            self.index.compact()
+            os.makedirs(os.path.join(path, "segments"), exist_ok=True)
+            for n, segment in enumerate(self.index.segments):
+                written.append((segment, self._save_segment(path, segment, os.path.join("segments", str(n)))))
+            fields["segments"] = [entry for _, entry in written]
+            np.save(os.path.join(path, "tombstones.npy"), np.array(sorted(self.index.tombstones), dtype=np.int64))
+        else:
+            self.index.save(self._index_path(os.path.join(path, "quantized" if self.quantization else "index")))
+        count = TextArena.write(path, "chunks", self.sentences)
+        IdTable.write(path, self.document_ids)
+        self.metadata.save(path)
+        self._write_manifest(path, count, **fields)
+        return written
+
+    def _append(self, path: str):
+        """
+        Brings the save in path, which this database was loaded from, up to date by
+        writing only what changed: new segments, the tombstones, the rows added since
+        and the manifest. Files of segments merged away are removed once the new
+        manifest is in place.
+        """
+        previous = read_manifest(path)
+        base = "quantized" if self.quantization else "index"
+        previous = previous.get("segments") or [{"index": self._index_path(base), "ids": base + ".ids.npy"}]
+        self.index.compact()
+        os.makedirs(os.path.join(path, "segments"), exist_ok=True)
+        segments, tombstones = self.index.segments, self.index.tombstones
+        for segment in segments:
+            if segment.saved is None:
+                segment.saved = self._save_segment(path, segment, os.path.join("segments", uuid.uuid4().hex[:12]))
+            elif not os.path.isfile(os.path.join(path, segment.saved["ids"])):
+                # The single index of a save made before the first add() only gains its ids.
+                np.save(os.path.join(path, segment.saved["ids"]), segment.ids)
+        _save(os.path.join(path, "tombstones.npy"), np.array(sorted(tombstones), dtype=np.int64))
+
+        count = len(self.sentences)
+        column = self._document_ids_column()
+        TextArena.append(path, "chunks", (self.sentences[i] for i in range(self._saved, count)), self._saved)
+        IdTable.append(path, column.codes_from(self._saved), column.values[self._saved_names:], self._saved,
+                       self._saved_names)
+        self.metadata.append(path, self._saved, self._saved_columns)
+        self._write_manifest(path, count, segments=[segment.saved for segment in segments])
+
+        current = {segment.saved["index"] for segment in segments}
+        for entry in previous:
+            if entry["index"] not in current:
+                for name in (entry["index"], entry["ids"]):
+                    name = os.path.join(path, name)
+                    if os.path.isdir(name):
+                        shutil.rmtree(name)
+                    elif os.path.isfile(name):
+                        os.remove(name)
+        self._saved, self._saved_names, self._saved_columns = count, len(column.values), list(self.metadata.columns)
+
+    def save(self, path: str):
+        """
+        Writes the index, chunk text, document ids and a manifest into the directory path.
+
+        Saving back to the directory a database was loaded from or last saved to only
+        appends what changed since, as long as the index is segmented; otherwise the
+        directory is rewritten.
+        """
+        if not self.index:
+            raise ValueError("Index has not been built or loaded.")
+        target = os.path.abspath(path)
+        if self.path == target and not self._dirty:
+            return
+        if self.path == target and self._saved is not None and isinstance(self.index, SegmentedIndex):
+            self._append(target)
+        elif self.path == target:
+            # Files loaded from here are still memory-mapped, so write next to them and swap directories.
+            staging, retired = target + ".saving", target + ".old"
+            shutil.rmtree(staging, ignore_errors=True)
+            written = self._write(staging)
+            os.rename(target, retired)
+            os.rename(staging, target)
+            shutil.rmtree(retired)
+            self._adopt(target, written)
+        else:
+            written = self._write(target)
+            if self.path is None:
+                self._adopt(target, written)
+        self._dirty = False
+
+    def _adopt(self, path: str, written: List[Tuple[object, dict]]):
+        """Reads rows back from a full save in path, so later saves there can append to it."""
+        for segment, entry in written:
+            segment.saved = entry
+        self._open_rows(path, read_manifest(path))
+
+    def _load_index(self, path: str):
+        index = self._new_index()
+        if self.quantization:
+            index.load(path, mmap=True)
+        else:
+            index.load(path)
+        return index
+
+    def _load_saved(self, path: str, manifest: dict):
+        self.dimension = manifest["dimension"]
+        self.model_name = manifest["model_name"]
+        self.quantization = manifest["quantization"]
+        self.num_trees = manifest["num_trees"]
+        self.search_k = manifest.get("search_k", -1)
+        self.tuning = manifest.get("tuning")
+        if not self.quantization:
+            self.engine = manifest["index"]
+            self.engine_options = manifest.get("engine_options", {})
+        # Documents added later are chunked the way the saved ones were.
+        self.chunker = manifest.get("chunker", self.chunker)
+        self.chunk_tokens = manifest.get("chunk_tokens", self.chunk_tokens)
+        self.chunk_overlap = manifest.get("chunk_overlap", self.chunk_overlap)
+        if "segments" in manifest:
+            index = SegmentedIndex(self.dimension, self._new_index, num_trees=self.num_trees or 10,
+                                   delta_size=self.delta_size, max_segments=self.max_segments)
+            for segment in manifest["segments"]:
+                index.add_segment(self._load_index(os.path.join(path, segment["index"])),
+                                  np.load(os.path.join(path, segment["ids"])), segment)
+            index.set_tombstones(np.load(os.path.join(path, "tombstones.npy")))
+        else:
+            index = self._load_index(self._index_path(os.path.join(path, "quantized" if self.quantization else "index")))
+        self._replace_index(index)
+        self._open_rows(path, manifest)
+        self._dirty = False
+
+    def _open_rows(self, path: str, manifest: dict):
+        # Rows past the manifest's count belong to an append that never finished.
+        count = manifest["count"]
+        self.sentences = TextArena.open(path, "chunks", count)
+        self.document_ids = IdTable.open(path, count)
+        self.metadata = MetadataColumns.open(path, manifest.get("metadata", []), count)
+        self._document_column = None
+        self.vectors = []
+        self.path = os.path.abspath(path)
+        self._saved, self._saved_names = count, len(self.document_ids.names)
+        self._saved_columns = list(manifest.get("metadata", []))
 
     def load(self, index_path: str):
-        if not os.path.isfile(index_path):
+        """Loads a directory written by save(), or a bare engine file / quantized index directory."""
+        manifest = read_manifest(index_path) if os.path.isdir(index_path) else None
+        if manifest is not None:
+            self._load_saved(index_path, manifest)
+            return
+        if self.quantization and not os.path.isdir(index_path):
+            raise FileNotFoundError(f"Index directory not found: {index_path}")
+        if not self.quantization and not os.path.isfile(index_path):
             raise FileNotFoundError(f"Index file not found: {index_path}")
 
-        self.index = AnnoyIndex(self.dimension, 'angular')
-        self.index.load(index_path)
+        index = self._new_index()
+        index.load(index_path)
+        self._replace_index(index)
 
-    def create(self, input_data: Union[str, List[str], List[Tuple[str, list]]], num_trees: int = 10):
+    def create(self, input_data: Union[str, List[str], List[Tuple[str, list]]], num_trees: int = 10,
+               processes: Optional[int] = None, metadata: Optional[List[Dict[str, str]]] = None,
+               ids: Optional[List[str]] = None):
+        if ids is not None and (not isinstance(input_data, list) or len(ids) != len(input_data)):
+            raise ValueError("Expected one id per item of input_data.")
+        if metadata is not None and (not isinstance(input_data, list) or len(metadata) != len(input_data)):
+            raise ValueError("Expected one metadata dict per item of input_data.")
+        # A create replaces everything, so metadata from an earlier one must not line up against the new rows.
+        self.sentences, self.document_ids, self.vectors = [], [], []
+        self.metadata = MetadataColumns()
+        self._document_column = None
         if isinstance(input_data, str):
             if os.path.isdir(input_data):
                 self._load_data_from_directory(input_data)
@@ -29,86 +324,309 @@ class VectorDatabase:
                 raise ValueError("Invalid input_data. Expected a directory path.")
         elif isinstance(input_data, list):
             if all(isinstance(item, str) for item in input_data):
-                self._load_data_from_strings(input_data)
+                self._load_data_from_strings(input_data, metadata, ids)
             elif all(isinstance(item, tuple) and len(item) == 2 for item in input_data):
-                self._load_data_from_tuples(input_data)
+                self._load_data_from_tuples(input_data, metadata, ids)
             else:
                 raise ValueError("Invalid input_data. Expected a list of strings or a list of tuples.")
         else:
             raise ValueError("Invalid input_data. Expected a directory path, a list of strings, or a list of tuples.")
 
-        self._build_index(num_trees)
+        self._build_index(num_trees, processes)
+
+    def create_streaming(self, path: str, items: Iterable[Union[Tuple[str, list], Tuple[str, list, str]]],
+                         num_trees: int = 10, n_jobs: int = -1, buffer_size: int = 10000):
+        """
+        Builds a database larger than memory into the directory path, then loads it.
+
+        Args:
+            path (str): The directory to build into.
+            items (Iterable): (text, vector) or (text, vector, document_id) tuples, typically from a generator.
+            num_trees (int): The number of Annoy trees.
+            n_jobs (int): Threads used to build the trees; -1 uses every core.
+            buffer_size (int): How many rows are held in memory at once.
+        """
+        if self.quantization or self.engine != "annoy":
+            raise ValueError("Streaming builds write an Annoy index; use engine='annoy' without quantization.")
+        builder = StreamingBuilder(path, self.dimension, num_trees=num_trees, n_jobs=n_jobs, buffer_size=buffer_size,
+                                   model_name=self.model_name, chunker=self.chunker, chunk_tokens=self.chunk_tokens,
+                                   chunk_overlap=self.chunk_overlap)
+        builder.add_many(items)
+        builder.finish()
+        self.load(path)
+
+    def _embedder(self, cache: bool = False) -> SentenceTransformer:
+        if not cache or not self.cache_dir:
+            return SentenceTransformer(self.model_name, engine=self.inference, batch_window=self.batch_window)
+        # One EmbeddingCache per database: opening one reads and sorts its whole index.
+        if self._cache is not None and self._cache.model_name != self.model_name:
+            self._cache = None
+        embedder = SentenceTransformer(self.model_name, cache=self._cache or self.cache_dir, engine=self.inference,
+                                       batch_window=self.batch_window)
+        self._cache = embedder.cache
+        return embedder
+
+    def _chunker(self) -> Chunker:
+        if self.chunk_tokens is None:
+            return Chunker(backend=self.chunker)
+        return Chunker(backend=self.chunker, embedder=self._embedder(),
+                       max_tokens=self.chunk_tokens, overlap=self.chunk_overlap)
 
     def _load_data_from_directory(self, directory: str):
-        chunker = Chunker()
-        for file_name in os.listdir(directory):
-            if file_name.endswith(".txt"):
-                file_path = os.path.join(directory, file_name)
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read().strip()
-                    self.sentences.extend(chunker.chunk_text(content))
-                    self.document_ids.extend([str(uuid.uuid4()) for _ in chunker.chunk_text(content)])
-
-    def _load_data_from_strings(self, strings: List[str]):
-        chunker = Chunker()
-        self.sentences = [sentence for text in strings for sentence in chunker.chunk_text(text)]
-        self.document_ids = [str(uuid.uuid4()) for _ in self.sentences]
-
-    def _load_data_from_tuples(self, tuples: List[Tuple[str, list]]):
+        sources = []
+        def read_files():
+            for file_name in os.listdir(directory):
+                if file_name.endswith(".txt"):
+                    sources.append(file_name)
+                    with open(os.path.join(directory, file_name), "r", encoding="utf-8") as file:
+                        yield file.read().strip()
+
+        chunker = self._chunker()
+        for i, chunks in chunker.chunk_many(read_files()):
+            self.sentences.extend(chunks)
+            self.document_ids.extend([str(uuid.uuid4()) for _ in chunks])
+            self.metadata.extend({"source": sources[i]}, len(chunks))
+
+    def _load_data_from_strings(self, strings: List[str], metadata: Optional[List[Dict[str, str]]] = None,
+                                ids: Optional[List[str]] = None):
+        chunker = self._chunker()
+        document_ids = []
+        for i, chunks in chunker.chunk_many(strings):
+            self.sentences.extend(chunks)
+            self.metadata.extend(metadata[i] if metadata else None, len(chunks))
+            if ids:
+                document_ids.extend([ids[i]] * len(chunks))
+        self.document_ids = document_ids or [str(uuid.uuid4()) for _ in self.sentences]
+
+    def _load_data_from_tuples(self, tuples: List[Tuple[str, list]], metadata: Optional[List[Dict[str, str]]] = None,
+                               ids: Optional[List[str]] = None):
         self.sentences, self.vectors = zip(*tuples)
-        self.document_ids = [str(uuid.uuid4()) for _ in tuples]
+        self.document_ids = list(ids) if ids else [str(uuid.uuid4()) for _ in tuples]
+        for i in range(len(tuples)):
+            self.metadata.extend(metadata[i] if metadata else None, 1)
+
+    def _encode(self, sentences: List[str], processes: Optional[int] = None) -> Iterator[np.ndarray]:
+        embedder = self._embedder(cache=True)
+        if processes and processes > 1:
+            yield from embedder.embed_parallel(sentences, processes=processes)
+        else:
+            yield embedder.embed(list(sentences), as_tuples=False)
 
-    def _build_index(self, num_trees: int):
+    def _build_index(self, num_trees: int, processes: Optional[int] = None):
+        self.num_trees = num_trees
         if not self.dimension:
-            self.dimension = len(self.vectors[0]) if self.vectors else SentenceTransformer(self.model_name).model.get_sentence_embedding_dimension()
+            self.dimension = len(self.vectors[0]) if len(self.vectors) else self._embedder().dimension
 
-        self.index = AnnoyIndex(self.dimension, 'angular')
+        self._replace_index(self._new_index(self.storage_dir))
 
-        if self.vectors:
+        if len(self.vectors):
             for i, vector in enumerate(self.vectors):
                 self.index.add_item(i, vector)
         else:
-            embedder = SentenceTransformer(self.model_name)
-            for i, sentence in enumerate(self.sentences):
-                vector = embedder.embed([sentence])[0][1]
-                self.index.add_item(i, vector)
+            i = 0
+            for vectors in self._encode(self.sentences, processes):
+                for vector in vectors:
+                    self.index.add_item(i, vector)
+                    i += 1
 
         self.index.build(num_trees)
+        self.compact()
+        # Every row is new, so the next save writes the whole directory.
+        self._saved = None
+        self._dirty = True
+
+    def compact(self):
+        """
+        Packs chunk text into one UTF-8 arena and document ids into int32 codes plus an
+        interned id table, and drops self.vectors, whose values now live in the index.
+
+        Called after every build. Lists turn into arrays; memory-mapped data that is
+        already compact is left as it is.
+        """
+        if isinstance(self.sentences, (list, tuple)):
+            self.sentences = TextArena.from_texts(self.sentences)
+        if isinstance(self.document_ids, (list, tuple)):
+            self.document_ids = IdTable.from_ids(self.document_ids)
+            self._document_column = None
+        self.vectors = []
+
+    def memory_report(self) -> Dict[str, int]:
+        """
+        Breaks down the bytes held by the database, by structure.
+
+        Structures count resident bytes, object headers included. Memory-mapped files
+        are summed separately under "mapped", because the OS pages them in on demand.
+        Annoy's estimate covers its item nodes but not its trees.
+
+        Returns:
+            Dict[str, int]: Bytes for sentences, document_ids, vectors, metadata and index, their total,
+            the mapped bytes, the number of chunks and the resident bytes per chunk.
+        """
+        report, mapped = {}, 0
+        for name in ("sentences", "document_ids", "vectors", "metadata", "index"):
+            resident, on_disk = memory_usage(getattr(self, name))
+            report[name] = resident
+            mapped += on_disk
+        report["total"] = sum(report.values())
+        report["mapped"] = mapped
+        report["chunks"] = len(self.sentences)
+        report["bytes_per_chunk"] = report["total"] // report["chunks"] if report["chunks"] else 0
+        return report
     
-    def create_from_database(self, db_path: str, num_trees: int = 10):
+    def create_from_database(self, db_path: str, num_trees: int = 10, processes: Optional[int] = None):
+        from yosemite.ml.data.db import Database
+
         self.db = Database()
         self.db.load(db_path)
-        chunker = Chunker()
-        embedder = SentenceTransformer(self.model_name)
-        
-        for doc in self.db.ix.searcher().documents():
-            doc_id = doc["id"]
-            doc_content = doc["content"]
-            
-            chunks = chunker.chunk_text(doc_content)
-            for chunk in chunks:
-                self.sentences.append(chunk)
-                self.document_ids.append(doc_id)
-                
-                vector = embedder.embed([chunk])[0][1]
-                self.vectors.append(vector)
-        
-        self._build_index(num_trees)
-
-    def search(self, query: str, k: int = 5) -> List[Tuple[int, str, str, List[float]]]:
+        chunker = self._chunker()
+
+        doc_ids = []
+        def read_documents():
+            for doc in self.db.ix.searcher().documents():
+                doc_ids.append(doc["id"])
+                yield doc["content"]
+
+        self.sentences, self.document_ids = list(self.sentences), list(self.document_ids)
+        for i, chunks in chunker.chunk_many(read_documents()):
+            self.sentences.extend(chunks)
+            self.document_ids.extend([doc_ids[i]] * len(chunks))
+            self.metadata.extend(None, len(chunks))
+
+        self._build_index(num_trees, processes)
+
+    def tune(self, queries: Optional[List[str]] = None, k: int = 10, target_recall: float = 0.95, sample: int = 200,
+             num_trees: Iterable[int] = (5, 10, 25, 50, 100), search_k: Optional[List[int]] = None) -> TuningResult:
+        """
+        Picks num_trees and search_k for a recall target and applies them.
+
+        Each setting is measured against exact search on a sample of queries. Without queries,
+        up to sample chunks (at most half of them) are held out of the corpus the settings are
+        measured on and used as the queries, so no query is in the index it searches. The
+        fastest setting on the Pareto front that reaches target_recall is chosen (or the one with
+        the best recall if none does): the index is rebuilt with its num_trees, search() uses its
+        search_k from now on, and both are saved in the manifest by save().
+
+        Args:
+            queries (Optional[List[str]]): Representative queries; by default, chunks held out of the database.
+            k (int): The number of results recall is measured at.
+            target_recall (float): The recall@k to reach.
+            sample (int): How many chunks to hold out as queries when queries is None.
+            num_trees (Iterable[int]): The tree counts to try (Annoy only).
+            search_k (Optional[List[int]]): The search_k values to try; see tuning.tune.
+
+        Returns:
+            TuningResult: Every trial, the Pareto front and the chosen setting; print result.table() to compare them.
+        """
+        if not self.index:
+            raise ValueError("Index has not been built or loaded.")
+        if self.quantization or self.engine == "exact":
+            raise ValueError("Only the annoy and hnsw engines have settings to tune.")
+        rows = np.arange(len(self.sentences))
+        if isinstance(self.index, SegmentedIndex):
+            rows = rows[self.index.live(rows)]
+        vectors = self.index.get_item_vectors(rows)
+        corpus = vectors
+        if queries:
+            query_vectors = self._embedder().embed_query(list(queries))
+        else:
+            if len(rows) < 2:
+                raise ValueError("Too few chunks to hold queries out of; pass queries.")
+            # A chunk searched for in a corpus that contains it is its own nearest neighbour, which
+            # inflates recall, so the sampled chunks are held out of the corpus that is tuned on.
+            held_out = np.zeros(len(rows), dtype=bool)
+            held_out[np.random.default_rng(0).choice(len(rows), size=min(sample, len(rows) // 2), replace=False)] = True
+            query_vectors, corpus = vectors[held_out], vectors[~held_out]
+        result = tune(corpus, query_vectors, k=k, num_trees=num_trees, search_k=search_k,
+                      target_recall=target_recall, engine=self.engine, engine_options=self.engine_options)
+
+        best = result.best
+        if self.engine == "annoy" and best.num_trees != self.num_trees:
+            if isinstance(self.index, SegmentedIndex):
+                self.index.rebuild(best.num_trees)
+            else:
+                index = self._new_index(self.storage_dir)
+                index.add_items(rows, vectors)
+                index.build(best.num_trees)
+                self._replace_index(index)
+            self.num_trees = best.num_trees
+        self.search_k = best.search_k
+        self.tuning = {"k": k, "target_recall": target_recall, **best.as_dict()}
+        self._dirty = True
+        return result
+
+    def _document_ids_column(self) -> Column:
+        ids = self.document_ids
+        if self._document_column is None or len(self._document_column) > len(ids):
+            table = ids.base if isinstance(ids, Appended) else ids
+            self._document_column = Column(table.codes, table.names) if isinstance(table, IdTable) else Column()
+        # Rows added since the column was built are interned one by one; the saved table is used as it is.
+        column = self._document_column
+        for i in range(len(column), len(ids)):
+            column.extend(ids[i], 1)
+        return column
+
+    def filter_mask(self, filter: Filter) -> np.ndarray:
+        """Returns one boolean per chunk: whether it matches filter. "document_id" can be filtered on as well."""
+        extra = {"document_id": self._document_ids_column()} if "document_id" in filter else None
+        return self.metadata.mask(filter, extra)
+
+    def search_batch(self, queries: List[str], k: int = 5, search_k: Optional[int] = None, threads: Optional[int] = None,
+                     filter: Optional[Filter] = None) -> BatchResults:
+        """
+        Embeds every query in one encode call and runs the lookups across a thread pool.
+
+        With a filter, such as {"source": "a.txt"}, only matching chunks are searched: narrow
+        filters are scanned exactly, broad ones go through the ANN index with over-fetching.
+        search_k defaults to the value chosen by tune(), if it has been run.
+        """
+        if not self.index:
+            raise ValueError("Index has not been built or loaded.")
+
+        return self.search_vectors(self._embed_queries(queries), k, search_k=search_k, threads=threads, filter=filter)
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        return self._embedder().embed_query(list(queries))
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5, search_k: Optional[int] = None,
+                       threads: Optional[int] = None, filter: Optional[Filter] = None) -> BatchResults:
+        """search_batch for queries that are already embedded, as a (q, dimension) matrix."""
+        if not self.index:
+            raise ValueError("Index has not been built or loaded.")
+
+        search_k = self.search_k if search_k is None else search_k
+        if filter:
+            indices, distances = filtered_search(self.index, query_vectors, k, self.filter_mask(filter),
+                                                 search_k=search_k, threads=threads)
+        else:
+            indices, distances = search_batch(self.index, query_vectors, k, search_k=search_k, threads=threads)
+        return BatchResults(indices, distances, self)
+
+    def search(self, query: str, k: int = 5, filter: Optional[Filter] = None) -> List[Tuple[int, str, str, List[float]]]:
+        return self.search_batch([query], k, threads=1, filter=filter)[0]
+
+    async def asearch_batch(self, queries: List[str], k: int = 5, search_k: Optional[int] = None,
+                            filter: Optional[Filter] = None, timeout: Optional[float] = None,
+                            executor: Optional[SearchExecutor] = None) -> BatchResults:
+        """
+        search_batch for asyncio code: the embedding and the lookup run as two stages on a bounded SearchExecutor.
+
+        Args:
+            timeout (Optional[float]): Seconds before asyncio.TimeoutError is raised; None waits as long as it takes.
+            executor (Optional[SearchExecutor]): The pool to run on; defaults to the shared one.
+
+        Raises:
+            asyncio.QueueFull: If the executor already has max_pending searches waiting or running.
+        """
         if not self.index:
             raise ValueError("Index has not been built or loaded.")
+        return await (executor or default_executor()).run_stages([
+            (self._embed_queries, (queries,), {}),
+            (self.search_vectors, (k,), {"search_k": search_k, "threads": 1, "filter": filter}),
+        ], timeout=timeout)
 
-        embedder = SentenceTransformer(self.model_name)
-        query_vector = embedder.embed([query])[0][1]
-        indices = self.index.get_nns_by_vector(query_vector, k, include_distances=False)
-        results = []
-        for index in indices:
-            sentence = self.sentences[index]
-            document_id = self.document_ids[index]
-            vector = self.index.get_item_vector(index)
-            results.append((index, sentence, document_id, vector))
-        return results
+    async def asearch(self, query: str, k: int = 5, filter: Optional[Filter] = None, timeout: Optional[float] = None,
+                      executor: Optional[SearchExecutor] = None) -> List[Tuple[int, str, str, List[float]]]:
+        return (await self.asearch_batch([query], k, filter=filter, timeout=timeout, executor=executor))[0]
     
 if __name__ == "__main__":
     # Create a VectorDatabase from a list of strings
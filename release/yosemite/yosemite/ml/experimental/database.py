@@ -3,19 +3,14 @@ from yosemite.ml.text.cross_encode import CrossEncoder as CrossEncode
 from typing import Union, List, Tuple, Optional, Dict
 import os
 import uuid
-from pyspark.sql import SparkSession, DataFrame, functions as F
-from pyspark.ml.feature import Tokenizer, StopWordsRemover, CountVectorizer, IDF
-from pyspark.ml.pipeline import Pipeline
-from pyspark.ml.linalg import Vectors, VectorUDT
-import pandas as pd
-from PyPDF2 import PdfReader
-from ebooklib import epub
 import numpy as np
 
 class YosemiteDatabase:
     def __init__(self, dimension: Optional[int] = None, model_name: str = "all-MiniLM-L6-v2"):
         self.dimension = dimension
         self.model_name = model_name
+        from pyspark.sql import SparkSession
+
         self.spark = SparkSession.builder \
             .appName("YosemiteDatabase") \
             .config("spark.driver.memory", "3g") \
@@ -24,6 +19,8 @@ class YosemiteDatabase:
         self.df = None
 
     def load_dataset(self, path: str, id_column: str, content_column: str):
+        from pyspark.sql import functions as F
+
         try:
             df = self.spark.read.csv(path, header=True, inferSchema=True)
             chunker = Chunker()
@@ -35,7 +32,7 @@ class YosemiteDatabase:
             
             @F.udf(returnType="array<array<float>>")
             def embed_udf(chunks):
-                return [embedder.embed([chunk])[0].tolist() for chunk in chunks]
+                return embedder.embed(chunks, as_tuples=False).tolist()
             
             self.df = df.select(
                 F.col(id_column).alias("id"),
@@ -61,10 +58,12 @@ class YosemiteDatabase:
                     with open(file_path, "r", encoding="utf-8") as file:
                         content = file.read()
                 elif file_path.endswith(".pdf"):
+                    from PyPDF2 import PdfReader
                     with open(file_path, "rb") as file:
                         reader = PdfReader(file)
                         content = " ".join(page.extract_text() for page in reader.pages)
                 elif file_path.endswith(".epub"):
+                    from ebooklib import epub
                     book = epub.read_epub(file_path)
                     content = " ".join(item.get_content().decode("utf-8") for item in book.get_items_of_type(9))
                 else:
@@ -72,7 +71,7 @@ class YosemiteDatabase:
 
                 doc_id = str(uuid.uuid4())
                 chunks = chunker.chunk_text(content)
-                vectors = [embedder.embed([chunk])[0].tolist() for chunk in chunks]
+                vectors = embedder.embed(chunks, as_tuples=False).tolist()
                 data.append((doc_id, content, chunks, vectors))
 
             self.df = self.spark.createDataFrame(data, ["id", "content", "chunks", "vectors"])
@@ -92,7 +91,7 @@ class YosemiteDatabase:
                     doc_id = doc.get("id", str(uuid.uuid4()))
                 doc_content = doc["content"]
                 chunks = chunker.chunk_text(doc_content)
-                vectors = [embedder.embed([chunk])[0].tolist() for chunk in chunks]
+                vectors = embedder.embed(chunks, as_tuples=False).tolist()
                 data.append((doc_id, doc_content, chunks, vectors))
 
             new_df = self.spark.createDataFrame(data, ["id", "content", "chunks", "vectors"])
@@ -104,12 +103,15 @@ class YosemiteDatabase:
             print(f"Error adding documents: {str(e)}")
 
     def search(self, query: str, k: int = 5) -> List[Tuple[str, str, List[float]]]:
+        from pyspark.sql import functions as F
+        from pyspark.ml.linalg import Vectors, VectorUDT
+
         try:
             if self.df is None:
                 raise ValueError("Data has not been loaded.")
 
             embedder = SentenceTransformer(self.model_name)
-            query_vector = embedder.embed([query])[0].tolist()
+            query_vector = embedder.encode([query])[0].tolist()
             
             @F.udf(returnType=VectorUDT())
             def vector_udf(vec):
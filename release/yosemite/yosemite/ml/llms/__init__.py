@@ -1,2 +1,6 @@
-from .instruct import Instruct as Instructor
-from .claude import AnthropicInstructor as Anthropic
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "Instructor": (".instruct", "Instruct"),
+    "Anthropic": (".claude", "AnthropicInstructor"),
+})
@@ -1,6 +1,5 @@
 import os 
 from typing import Optional, List, Dict 
-import anthropic 
 
 class AnthropicInstructor:
     def __init__(self, api_key: Optional[str] = None):
@@ -13,6 +12,8 @@ class AnthropicInstructor:
         if api_key is None:
             raise ValueError("Anthropic API key is not available")
 
+        import anthropic
+
         self.client = anthropic.Anthropic(api_key=api_key)
 
     def chat( self, system: Optional[str] = None, query: Optional[str] = None, model: str = "claude-3-opus-20240229", max_tokens: int = 1000, temperature: float = 0):
@@ -1,7 +1,5 @@
 import os
 from typing import Optional
-import instructor
-from openai import OpenAI
 from pydantic import BaseModel, Field
 
 class InstructModel(BaseModel):
@@ -32,6 +30,9 @@ class Instruct:
         if api_key is None:
             raise ValueError("OpenAI API key is not available")
 
+        import instructor
+        from openai import OpenAI
+
         self.llm = instructor.patch(OpenAI(api_key=api_key))
 
     def instruct(
@@ -1 +1,5 @@
-from .cross_encode import CrossEncode as CrossEncoder
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "CrossEncoder": (".cross_encode", "CrossEncode"),
+})
@@ -1,8 +1,11 @@
-from typing import List, Tuple
-from sentence_transformers import CrossEncoder
+from functools import partial
+from typing import List, Optional, Tuple
+from yosemite.ml.text.util.batching import MicroBatcher, shared_batcher
+from yosemite.ml.text.util.registry import registry
 
 class CrossEncode:
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-12-v2", max_length: int = None):
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-12-v2", max_length: int = None, device: str = None,
+                 engine: str = "torch", batch_window: Optional[float] = None, max_batch_size: int = 32):
         """
         Initializes the CrossEncode with a specified model.
 
@@ -12,8 +15,31 @@ class CrossEncode:
             The name of the CrossEncoder model to use (default is "cross-encoder/ms-marco-MiniLM-L-12-v2")
         max_length : int, optional
             The maximum length of the input sequences (default is None)
+        device : str, optional
+            The device to load the model on (default is None)
+        engine : str, optional
+            "torch", or "onnx" to run an exported, int8-quantized copy through ONNX Runtime (default is "torch")
+        batch_window : float, optional
+            Seconds a rank() call with fewer than max_batch_size pairs waits to share a forward pass with
+            concurrent calls from other threads (default is None, no micro-batching)
+        max_batch_size : int, optional
+            The number of pairs that fills a micro-batch (default is 32)
         """
-        self.model = CrossEncoder(model_name, max_length=max_length)
+        if engine not in ("torch", "onnx"):
+            raise ValueError(f"Invalid engine: {engine}. Expected 'torch' or 'onnx'.")
+        if engine == "onnx":
+            # The exported engine is shared across max_lengths, so truncation is applied per call.
+            self.model = registry.get("onnx_cross_encoder", model_name)
+            self.predict = partial(self.model.predict, max_length=max_length)
+        else:
+            self.model = registry.get("cross_encoder", model_name, device=device, max_length=max_length)
+            self.predict = self.model.predict
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = shared_batcher(
+                ("cross_encode", model_name, engine, device, max_length, max_batch_size, batch_window),
+                lambda: MicroBatcher(self.predict, max_batch_size=max_batch_size, max_wait=batch_window,
+                                     name=f"yosemite-rank-{model_name}"))
 
     def rank(self, query: str, x: List[str], y: List[str]) -> List[Tuple[str, float]]:
         """
@@ -37,7 +63,11 @@ class CrossEncode:
         if not sentences:
             return []
 
-        scores = self.model.predict([(query, sentence) for sentence in sentences])
+        pairs = [(query, sentence) for sentence in sentences]
+        if self.batcher is not None and len(pairs) < self.batcher.max_batch_size:
+            scores = self.batcher(pairs)
+        else:
+            scores = self.predict(pairs)
 
         ranked_sentences = [(sentence, score) for sentence, score in sorted(zip(sentences, scores), key=lambda x: x[1], reverse=True)]
 
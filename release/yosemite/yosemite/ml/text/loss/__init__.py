@@ -1 +1,5 @@
-from .loss import Loss
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "Loss": (".loss", "Loss"),
+})
@@ -1,5 +1,3 @@
-from sentence_transformers import SentenceTransformer, losses
-
 class Loss:
     def __init__(self, loss_type: str, data_format: str, model_name: str = "all-MiniLM-L6-v2"):
         """
@@ -14,6 +12,8 @@ class Loss:
         model_name : str, optional
             The name of the SentenceTransformer model to use (default is "all-MiniLM-L6-v2")
         """
+        from sentence_transformers import SentenceTransformer
+
         self.model = SentenceTransformer(model_name)
         self.loss = self._initialize_loss(loss_type, data_format)
 
@@ -28,6 +28,8 @@ class Loss:
             raise ValueError("Unsupported data format")
 
     def _init_single_sentence_loss(self, loss_type: str):
+        from sentence_transformers import losses
+
         if loss_type == "BatchAllTripletLoss":
             return losses.BatchAllTripletLoss(model=self.model)
         elif loss_type == "BatchHardTripletLoss":
@@ -38,6 +40,8 @@ class Loss:
             raise ValueError("Unsupported loss type for single sentences")
 
     def _init_sentence_pair_loss(self, loss_type: str):
+        from sentence_transformers import losses
+
         if loss_type == "SoftmaxLoss":
             return losses.SoftmaxLoss(model=self.model)
         elif loss_type == "ContrastiveLoss":
@@ -46,6 +50,8 @@ class Loss:
             raise ValueError("Unsupported loss type for sentence pairs")
 
     def _init_triplet_loss(self, loss_type: str):
+        from sentence_transformers import losses
+
         if loss_type == "TripletLoss":
             return losses.TripletLoss(model=self.model)
         elif loss_type == "MultipleNegativesRankingLoss":
@@ -1 +1,5 @@
-from .semantic_search import SemanticSearch
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "SemanticSearch": (".semantic_search", "SemanticSearch"),
+})
@@ -1,6 +1,8 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
-from typing import List, Tuple
+from yosemite.ml.text.util.registry import registry
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    import torch
 
 class SemanticSearch:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
@@ -12,9 +14,9 @@ class SemanticSearch:
         model_name : str, optional
             The name of the SentenceTransformer model to use (default is "all-MiniLM-L6-v2")
         """
-        self.model = SentenceTransformer(model_name)
+        self.model = registry.get("sentence_transformer", model_name)
 
-    def encode_corpus(self, corpus: List[str]) -> torch.Tensor:
+    def encode_corpus(self, corpus: List[str]) -> "torch.Tensor":
         """
         Encodes a list of sentences into embeddings.
 
@@ -30,7 +32,7 @@ class SemanticSearch:
         """
         return self.model.encode(corpus, convert_to_tensor=True)
 
-    def search(self, query: str, corpus_embeddings: torch.Tensor, corpus: List[str], top_k: int = 5) -> List[Tuple[str, float]]:
+    def search(self, query: str, corpus_embeddings: "torch.Tensor", corpus: List[str], top_k: int = 5) -> List[Tuple[str, float]]:
         """
         Performs semantic search on a list of sentences.
 
@@ -50,6 +52,9 @@ class SemanticSearch:
         List[Tuple[str, float]]
             A list of tuples, each containing a sentence from the corpus and its similarity score to the query
         """
+        import torch
+        from sentence_transformers import util
+
         query_embedding = self.model.encode(query, convert_to_tensor=True)
         cos_scores = util.cos_sim(query_embedding, corpus_embeddings)[0]
         
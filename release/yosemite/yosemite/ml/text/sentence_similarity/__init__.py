@@ -1 +1,5 @@
-from .sentence_similarity import SentenceSimilarity
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "SentenceSimilarity": (".sentence_similarity", "SentenceSimilarity"),
+})
@@ -1,4 +1,4 @@
-from sentence_transformers import SentenceTransformer, util
+from yosemite.ml.text.util.registry import registry
 from typing import List, Tuple
 
 class SentenceSimilarity:
@@ -11,7 +11,7 @@ class SentenceSimilarity:
         model_name : str, optional
             The name of the SentenceTransformer model to use (default is "all-MiniLM-L6-v2")
         """
-        self.model = SentenceTransformer(model_name)
+        self.model = registry.get("sentence_transformer", model_name)
 
     def compute_similarity(self, sentences1: List[str], sentences2: List[str]) -> List[Tuple[str, str, float]]:
         """
@@ -29,6 +29,8 @@ class SentenceSimilarity:
         List[Tuple[str, str, float]]
             A list of tuples, each containing a pair of sentences and their cosine similarity
         """
+        from sentence_transformers import util
+
         embeddings1 = self.model.encode(sentences1, convert_to_tensor=True)
         embeddings2 = self.model.encode(sentences2, convert_to_tensor=True)
         cosine_scores = util.cos_sim(embeddings1, embeddings2)
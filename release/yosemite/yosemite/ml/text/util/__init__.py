@@ -1,2 +1,14 @@
-from .util import Chunker
-from .util import Embedder as SentenceTransformer
\ No newline at end of file
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "Chunker": (".util", "Chunker"),
+    "SentenceTransformer": (".util", "Embedder"),
+    "ModelRegistry": (".registry", "ModelRegistry"),
+    "registry": (".registry", "registry"),
+    "MicroBatcher": (".batching", "MicroBatcher"),
+    "EmbeddingCache": (".cache", "EmbeddingCache"),
+    "QueryCache": (".cache", "QueryCache"),
+    "query_cache": (".cache", "query_cache"),
+    "RuleSplitter": (".splitter", "RuleSplitter"),
+    "TokenWindows": (".windows", "TokenWindows"),
+})
@@ -0,0 +1,196 @@
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+import queue
+import threading
+import time
+import numpy as np
+
+class _Request:
+    __slots__ = ("items", "future", "arrived")
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = items
+        self.future = Future()
+        self.arrived = time.perf_counter()
+
+class MicroBatcher:
+    """
+    Merges small concurrent calls to a batched function into one call.
+
+    Requests are queued for a single scheduler thread. It takes the oldest request and
+    waits up to max_wait seconds after that request arrived for more, or until
+    max_batch_size items are collected. It then calls the function once on all of them
+    and hands each caller its slice of the results. When the function is slower than
+    the arrival rate, requests pile up while it runs, and the next batch is taken
+    without waiting. Under load, batches fill by themselves.
+
+    A request cancelled before its batch starts is dropped. If the function raises,
+    every request in the batch gets the exception.
+    """
+
+    def __init__(self, function: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait: float = 0.002, name: str = "batcher", samples: int = 10000):
+        """
+        Parameters
+        ----------
+        function : Callable[[List[Any]], Sequence[Any]]
+            Maps a list of items to a sliceable sequence of results (a list or an array), one per item, in order
+        max_batch_size : int, optional
+            The number of items that triggers a batch without waiting out the window (default is 32)
+        max_wait : float, optional
+            Seconds a batch waits for more requests after its first one arrived (default is 0.002)
+        name : str, optional
+            The name of the scheduler thread (default is "batcher")
+        samples : int, optional
+            The number of recent queueing delays kept for percentiles (default is 10000)
+        """
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: "queue.SimpleQueue[Optional[_Request]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._delays = deque(maxlen=samples)
+        self._sizes: Dict[int, int] = {}
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        """
+        Queues items for the next batch.
+
+        Parameters
+        ----------
+        items : Sequence[Any]
+            The items of one request
+
+        Returns
+        -------
+        Future
+            Resolves to the request's results, in the order of items
+        """
+        request = _Request(items)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._queue.put(request)
+        return request.future
+
+    def __call__(self, items: Sequence[Any], timeout: Optional[float] = None) -> Sequence[Any]:
+        """Submits items and blocks until their results are ready."""
+        return self.submit(items).result(timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch, size = [first], len(first.items)
+        deadline = first.arrived + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0))
+            except queue.Empty:
+                break
+            if request is None:
+                # Closing: run what was collected, then let the loop see the sentinel.
+                self._queue.put(None)
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [request for request in self._collect(first) if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for request in batch for item in request.items]
+            started = time.perf_counter()
+            try:
+                results = self.function(items)
+            except BaseException as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finally:
+                self._record(batch, len(items), started)
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.items)])
+                offset += len(request.items)
+
+    def _record(self, batch: List[_Request], size: int, started: float):
+        with self._lock:
+            self.requests += len(batch)
+            self.items += size
+            self.batches += 1
+            bucket = 1 << max(size - 1, 0).bit_length()
+            self._sizes[bucket] = self._sizes.get(bucket, 0) + 1
+            self._delays.extend(started - request.arrived for request in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the batcher's counters and distributions.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Request, item and batch counts, the mean batch size, a histogram of batch sizes keyed
+            by power-of-two upper bound, the number of requests waiting, and the mean, median,
+            99th percentile and maximum queueing delay in milliseconds over recent requests
+        """
+        with self._lock:
+            delays = np.array(self._delays, dtype=np.float64) * 1000
+            return {
+                "requests": self.requests,
+                "items": self.items,
+                "batches": self.batches,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self._sizes.items())),
+                "waiting": self._queue.qsize(),
+                "delay_ms": {
+                    "mean": float(delays.mean()) if len(delays) else 0.0,
+                    "p50": float(np.percentile(delays, 50)) if len(delays) else 0.0,
+                    "p99": float(np.percentile(delays, 99)) if len(delays) else 0.0,
+                    "max": float(delays.max()) if len(delays) else 0.0,
+                },
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._delays.clear()
+            self._sizes.clear()
+            self.requests = self.items = self.batches = 0
+
+    def close(self):
+        """Runs the requests already queued, then stops the scheduler thread."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+_batchers: Dict[Hashable, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+def shared_batcher(key: Hashable, factory: Callable[[], MicroBatcher]) -> MicroBatcher:
+    """
+    Returns the process-wide MicroBatcher for key, creating it with factory on first use.
+
+    Stores build a fresh Embedder or CrossEncode for each call, so batchers are shared
+    by model and settings rather than owned by one instance; otherwise concurrent calls
+    would never meet in the same batch.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = factory()
+        return batcher
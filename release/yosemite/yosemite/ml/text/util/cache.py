@@ -0,0 +1,332 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+import numpy as np
+
+_RECORD = np.dtype([("key", "S20"), ("shard", "<u4"), ("row", "<u4")])
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed store of sentence embeddings.
+
+    Vectors for one model live under their own directory as fixed-size float32 shards
+    that are memory-mapped on read, next to an append-only index of (sha1 of text,
+    shard, row) records. The index is held in memory as a sorted record array, so a
+    lookup is a binary search rather than a Python dict entry per vector.
+
+    The cache is safe to share between threads of one process; only one process
+    should write to a given directory at a time.
+    """
+
+    def __init__(self, path: str, model_name: str, shard_size: int = 65536, backend: str = "torch"):
+        """
+        Parameters
+        ----------
+        path : str
+            The root cache directory, shared by all models
+        model_name : str
+            The name of the model whose embeddings are stored
+        shard_size : int, optional
+            The number of vectors per shard file (default is 65536)
+        backend : str, optional
+            The inference backend the vectors come from, e.g. "torch", "onnx" or "onnx-int8" (default is "torch").
+            Backends produce slightly different vectors, so each gets its own directory
+        """
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}-{backend}")
+        digest = hashlib.sha1(f"{model_name}:{backend}".encode("utf-8")).hexdigest()[:8]
+        self.path = os.path.join(path, f"{slug}-{digest}")
+        self.model_name = model_name
+        self.backend = backend
+        self.shard_size = shard_size
+        self.dimension = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._index = np.empty(0, dtype=_RECORD)
+        self._pending: Dict[bytes, Tuple[int, int]] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self._rows = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.isfile(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            if meta.get("backend", backend) != backend or meta.get("model", model_name) != model_name:
+                raise ValueError(f"{self.path} holds {meta.get('model')} vectors from the {meta.get('backend')} backend, "
+                                 f"not {model_name} from {backend}.")
+            self.dimension = meta["dimension"]
+            self.shard_size = meta["shard_size"]
+        index_path = os.path.join(self.path, "index.bin")
+        if os.path.isfile(index_path):
+            size = os.path.getsize(index_path)
+            if size % _RECORD.itemsize:
+                # A record torn by an interrupted append; the vectors it pointed at are dropped below.
+                with open(index_path, "r+b") as file:
+                    file.truncate(size - size % _RECORD.itemsize)
+            records = np.fromfile(index_path, dtype=_RECORD)
+            self._rows = len(records)
+            self._index = np.sort(records, order="key")
+        if self.dimension is not None:
+            self._recover()
+
+    def _recover(self):
+        """
+        Drops vectors written by an interrupted put_many() that never reached the index.
+
+        Rows are appended in order, so the index's row count says exactly how many rows
+        every shard should hold. A put_many() spanning several shards can leave orphan rows
+        in each of them; all shards are cut back, and shards wholly past the end removed.
+        """
+        last, rows = divmod(self._rows, self.shard_size)
+        row_bytes = 4 * self.dimension
+        for name in os.listdir(self.path):
+            match = re.fullmatch(r"shard-(\d+)\.f32", name)
+            if match is None:
+                continue
+            shard = int(match.group(1))
+            expected = self.shard_size if shard < last else rows if shard == last else 0
+            shard_path = os.path.join(self.path, name)
+            if not expected:
+                os.remove(shard_path)
+            elif os.path.getsize(shard_path) > expected * row_bytes:
+                with open(shard_path, "r+b") as file:
+                    file.truncate(expected * row_bytes)
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.path, f"shard-{shard:05d}.f32")
+
+    def _shard(self, shard: int, row: int) -> np.memmap:
+        mapped = self._maps.get(shard)
+        if mapped is None or row >= len(mapped):
+            rows = os.path.getsize(self._shard_path(shard)) // (4 * self.dimension)
+            mapped = np.memmap(self._shard_path(shard), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+            self._maps[shard] = mapped
+        return mapped
+
+    def _locate(self, key: bytes) -> Optional[Tuple[int, int]]:
+        found = self._pending.get(key)
+        if found is not None:
+            return found
+        i = np.searchsorted(self._index["key"], key)
+        if i < len(self._index) and self._index["key"][i] == key:
+            return int(self._index["shard"][i]), int(self._index["row"][i])
+        return None
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up cached vectors for a list of texts.
+
+        Parameters
+        ----------
+        texts : List[str]
+            The texts to look up
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            A (len(texts), dimension) float32 matrix and a boolean mask of which rows were found
+        """
+        with self._lock:
+            found = np.zeros(len(texts), dtype=bool)
+            if self.dimension is None:
+                self.misses += len(texts)
+                return np.empty((len(texts), 0), dtype=np.float32), found
+            vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+            for i, text in enumerate(texts):
+                location = self._locate(_digest(text))
+                if location is not None:
+                    shard, row = location
+                    vectors[i] = self._shard(shard, row)[row]
+                    found[i] = True
+            hits = int(found.sum())
+            self.hits += hits
+            self.misses += len(texts) - hits
+            return vectors, found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Stores vectors for texts that are not cached yet."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as file:
+                    json.dump({"model": self.model_name, "backend": self.backend, "dimension": self.dimension,
+                               "shard_size": self.shard_size}, file)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}.")
+
+            keys, rows = [], []
+            seen = set()
+            for text, vector in zip(texts, vectors):
+                key = _digest(text)
+                if key in seen or self._locate(key) is not None:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                rows.append(vector)
+            if not keys:
+                return
+
+            records = np.empty(len(keys), dtype=_RECORD)
+            start, total = 0, self._rows
+            while start < len(keys):
+                shard, row = divmod(total, self.shard_size)
+                stop = min(len(keys), start + self.shard_size - row)
+                with open(self._shard_path(shard), "ab") as file:
+                    file.write(np.stack(rows[start:stop]).tobytes())
+                records["key"][start:stop] = keys[start:stop]
+                records["shard"][start:stop] = shard
+                records["row"][start:stop] = np.arange(row, row + stop - start)
+                total += stop - start
+                start = stop
+
+            # The rows count only once their index records are written; until then they are orphans _recover() drops.
+            with open(os.path.join(self.path, "index.bin"), "ab") as file:
+                file.write(records.tobytes())
+            self._rows = total
+            for record in records:
+                self._pending[bytes(record["key"])] = (int(record["shard"]), int(record["row"]))
+            if len(self._pending) >= 4096:
+                self._merge()
+
+    def _merge(self):
+        pending = np.array([(key, shard, row) for key, (shard, row) in self._pending.items()], dtype=_RECORD)
+        self._index = np.sort(np.concatenate([self._index, pending]), order="key")
+        self._pending = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index) + len(self._pending)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self),
+                "bytes": size,
+                "shards": len([name for name in os.listdir(self.path) if name.startswith("shard-")]),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+def normalize_query(text: str) -> str:
+    """The form a query is cached under: Unicode NFC with runs of whitespace collapsed to one space."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class QueryCache:
+    """
+    An in-memory LRU cache of query vectors with a time-to-live, bounded by bytes.
+
+    Entries are keyed by (model, normalized query text), so one cache can serve every
+    Embedder in the process. Unlike EmbeddingCache it never touches disk: it exists to
+    turn a repeated query from a forward pass into a dictionary lookup.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20, ttl: Optional[float] = 3600.0):
+        """
+        Parameters
+        ----------
+        max_bytes : int, optional
+            The memory budget for all entries, vectors and keys included (default is 64 MiB)
+        ttl : float, optional
+            Seconds an entry stays valid after it is stored (default is 3600; None never expires)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, model: str, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], np.ndarray]:
+        """
+        Looks up the vectors of texts under model.
+
+        Parameters
+        ----------
+        model : str
+            The model the vectors came from
+        texts : List[str]
+            The queries, normalized or not
+
+        Returns
+        -------
+        Tuple[List[Optional[np.ndarray]], np.ndarray]
+            A read-only vector or None per text, and a boolean mask of which were found
+        """
+        now = time.monotonic()
+        vectors: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = (model, normalize_query(text))
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    self._remove(key)
+                    entry = None
+                if entry is None:
+                    vectors.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                vectors.append(entry[0])
+            found = np.array([vector is not None for vector in vectors], dtype=bool)
+            self.hits += int(found.sum())
+            self.misses += len(texts) - int(found.sum())
+        return vectors, found
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray):
+        """Stores one vector per text, evicting the least recently used entries beyond max_bytes."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, normalize_query(text))
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                size = vector.nbytes + sys.getsizeof(key[1])
+                if size > self.max_bytes:
+                    continue
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = (vector, expires, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+# Shared by every Embedder in the process unless one is given its own.
+query_cache = QueryCache()
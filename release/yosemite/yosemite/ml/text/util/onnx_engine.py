@@ -0,0 +1,206 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import hashlib
+import inspect
+import json
+import os
+import re
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yosemite", "onnx")
+
+_PARITY_SAMPLES = [
+    "Paris is the capital of France.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Who is tow mater?",
+    "Embeddings map sentences to points in a vector space, so that similar sentences end up close together.",
+]
+
+class OnnxEngine:
+    """
+    Runs a sentence-transformer or cross-encoder model through ONNX Runtime on the CPU.
+
+    On first use the torch model is exported to ONNX, with pooling and normalization
+    included in the graph, and optionally dynamically quantized to int8. The exported
+    graph, the tokenizer and a small manifest are cached under cache_dir, so later
+    processes load them without importing torch.
+    """
+
+    kinds = ("sentence_transformer", "cross_encoder")
+
+    def __init__(self, model_name: str, kind: str = "sentence_transformer", cache_dir: Optional[str] = None,
+                 quantize: bool = True, threads: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        model_name : str
+            The sentence-transformers or cross-encoder model name
+        kind : str, optional
+            "sentence_transformer" or "cross_encoder" (default is "sentence_transformer")
+        cache_dir : str, optional
+            Where exported models are cached (default is ~/.cache/yosemite/onnx)
+        quantize : bool, optional
+            Whether to run the dynamically int8-quantized graph (default is True)
+        threads : int, optional
+            ONNX Runtime intra-op threads (default is None, the runtime default)
+        """
+        if kind not in self.kinds:
+            raise ValueError(f"Invalid kind: {kind}. Expected one of {self.kinds}.")
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.model_name = model_name
+        self.kind = kind
+        self.quantize = quantize
+        self.path = os.path.join(cache_dir or DEFAULT_CACHE_DIR, kind,
+                                 f"{slug}-{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}")
+        if not os.path.isfile(os.path.join(self.path, "meta.json")):
+            self.export()
+
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as file:
+            self.meta = json.load(file)
+
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        graph = "model.int8.onnx" if quantize else "model.onnx"
+        self.session = onnxruntime.InferenceSession(os.path.join(self.path, graph), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.path)
+
+    @property
+    def dimension(self) -> int:
+        return self.meta["dimension"]
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.meta["max_length"]
+
+    def export(self):
+        """Exports the torch model to ONNX and writes the int8-quantized copy next to it."""
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from .registry import registry
+
+        os.makedirs(self.path, exist_ok=True)
+        if self.kind == "sentence_transformer":
+            model = registry.get("sentence_transformer", self.model_name, device="cpu")
+            tokenizer = model.tokenizer
+            max_length = model.max_seq_length
+            meta = {"dimension": model.get_sentence_embedding_dimension()}
+
+            class Graph(torch.nn.Module):
+                def __init__(self):
+                    super().__init__()
+                    self.model = model
+
+                def forward(self, input_ids, attention_mask, token_type_ids=None):
+                    features = {"input_ids": input_ids, "attention_mask": attention_mask}
+                    if token_type_ids is not None:
+                        features["token_type_ids"] = token_type_ids
+                    return self.model(features)["sentence_embedding"]
+        else:
+            model = registry.get("cross_encoder", self.model_name, device="cpu")
+            tokenizer = model.tokenizer
+            max_length = model.max_length or tokenizer.model_max_length
+            meta = {"num_labels": model.config.num_labels}
+
+            class Graph(torch.nn.Module):
+                def __init__(self):
+                    super().__init__()
+                    self.model = model.model
+
+                def forward(self, input_ids, attention_mask, token_type_ids=None):
+                    return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                                      token_type_ids=token_type_ids).logits
+
+        dummy = tokenizer(["yosemite"], ["yosemite"] if self.kind == "cross_encoder" else None,
+                          padding=True, return_tensors="pt")
+        names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        output = "sentence_embedding" if self.kind == "sentence_transformer" else "logits"
+        graph = Graph().eval()
+        # Newer torch releases default to the dynamo exporter, which needs onnxscript; the
+        # TorchScript exporter handles these models with plain dynamic axes.
+        legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+        with torch.no_grad():
+            torch.onnx.export(graph, tuple(dummy[name] for name in names), os.path.join(self.path, "model.onnx"),
+                              input_names=names, output_names=[output], opset_version=14,
+                              dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in names}, output: {0: "batch"}},
+                              **legacy)
+        quantize_dynamic(os.path.join(self.path, "model.onnx"), os.path.join(self.path, "model.int8.onnx"),
+                         weight_type=QuantType.QInt8)
+        tokenizer.save_pretrained(self.path)
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump({"model": self.model_name, "kind": self.kind, "max_length": int(max_length), **meta}, file)
+
+    def _run(self, first: List[str], second: Optional[List[str]] = None, max_length: Optional[int] = None) -> np.ndarray:
+        features = self.tokenizer(first, second, padding=True, truncation=True,
+                                  max_length=max_length or self.max_seq_length, return_tensors="np")
+        feeds = {name: features[name].astype(np.int64) for name in self.input_names if name in features}
+        return self.session.run(None, feeds)[0]
+
+    def encode(self, sentences: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        """Encodes sentences into a (len(sentences), dimension) float32 matrix."""
+        if self.kind != "sentence_transformer":
+            raise ValueError("encode() needs a sentence_transformer engine.")
+        if not sentences:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.concatenate([self._run(list(sentences[start:start + batch_size]))
+                               for start in range(0, len(sentences), batch_size)]).astype(np.float32, copy=False)
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32,
+                max_length: Optional[int] = None) -> np.ndarray:
+        """
+        Scores (query, passage) pairs the way CrossEncoder.predict does.
+
+        Pairs are truncated to max_length tokens, as CrossEncoder(max_length=...) truncates them; the
+        default is the length the model was exported with.
+        """
+        if self.kind != "cross_encoder":
+            raise ValueError("predict() needs a cross_encoder engine.")
+        if not pairs:
+            return np.empty(0, dtype=np.float32)
+        logits = np.concatenate([self._run([a for a, _ in pairs[start:start + batch_size]],
+                                           [b for _, b in pairs[start:start + batch_size]], max_length)
+                                 for start in range(0, len(pairs), batch_size)]).astype(np.float32, copy=False)
+        if self.meta["num_labels"] == 1:
+            return 1.0 / (1.0 + np.exp(-logits[:, 0]))
+        return logits
+
+    def check_parity(self, texts: Optional[List[str]] = None, atol: float = 0.05,
+                     max_length: Optional[int] = None) -> Dict[str, Union[float, bool]]:
+        """
+        Compares this engine against the torch model on a few inputs.
+
+        Parameters
+        ----------
+        texts : List[str], optional
+            The sentences to compare on; for cross-encoders each is paired with the first (default is a built-in sample)
+        atol : float, optional
+            The largest acceptable absolute difference (default is 0.05)
+        max_length : int, optional
+            For cross-encoders, the truncation length both models are run with (default is None, the model's own)
+
+        Returns
+        -------
+        Dict[str, Union[float, bool]]
+            max_abs_diff, min_cosine for embeddings, and whether the engine passed
+        """
+        from .registry import registry
+
+        texts = texts or _PARITY_SAMPLES
+        if self.kind == "sentence_transformer":
+            reference = registry.get("sentence_transformer", self.model_name, device="cpu").encode(
+                texts, convert_to_numpy=True, show_progress_bar=False)
+            candidate = self.encode(texts)
+            cosine = (reference * candidate).sum(axis=1) / (
+                np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+            report = {"max_abs_diff": float(np.abs(reference - candidate).max()), "min_cosine": float(cosine.min())}
+        else:
+            pairs = [(texts[0], text) for text in texts]
+            reference = np.asarray(registry.get("cross_encoder", self.model_name, device="cpu",
+                                                max_length=max_length).predict(pairs))
+            report = {"max_abs_diff": float(np.abs(reference - self.predict(pairs, max_length=max_length)).max())}
+        report["passed"] = report["max_abs_diff"] <= atol
+        return report
@@ -0,0 +1,154 @@
+from itertools import islice
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, List, Optional
+import multiprocessing
+import os
+import queue
+import traceback
+import numpy as np
+
+def _work(model: str, engine: str, device: Optional[str], threads: int, batch_size: int, dimension: int,
+          capacity: int, slot_names: List[str], tasks, results):
+    """Worker loop: encodes batches of sentences and writes the vectors into the parent's shared memory slots."""
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    views = [np.ndarray((capacity, dimension), dtype=np.float32, buffer=slot.buf) for slot in slots]
+    try:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+        from .util import Embedder
+        embedder = Embedder(model, batch_size=batch_size, device=device, engine=engine)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, sentences = task
+            try:
+                views[slot][:len(sentences)] = embedder.encode(sentences)
+                results.put((seq, slot, len(sentences), None))
+            except Exception:
+                results.put((seq, slot, 0, traceback.format_exc()))
+    except Exception:
+        results.put((-1, -1, 0, traceback.format_exc()))
+    finally:
+        del views
+        for slot in slots:
+            slot.close()
+
+class EncodePool:
+    """
+    A pool of worker processes, each holding its own copy of an embedding model.
+
+    Sentences are sent to the workers in chunks. Each worker writes its vectors into a
+    shared memory slot owned by the pool, and only a (chunk, slot, count) message
+    travels back. Results are yielded in input order, and the number of chunks in
+    flight is bounded by the number of slots.
+    """
+
+    def __init__(self, model: str, dimension: int, processes: Optional[int] = None, chunk_size: int = 1024,
+                 batch_size: int = 32, device: Optional[str] = None, engine: str = "torch"):
+        """
+        Parameters
+        ----------
+        model : str
+            The sentence-transformers model name
+        dimension : int
+            The embedding dimension of the model
+        processes : int, optional
+            The number of worker processes (default is os.cpu_count())
+        chunk_size : int, optional
+            The number of sentences sent to a worker at a time (default is 1024)
+        batch_size : int, optional
+            The forward-pass batch size inside each worker (default is 32)
+        device : str, optional
+            The device each worker loads its model on (default is None)
+        engine : str, optional
+            The Embedder engine used by the workers (default is "torch")
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.dimension = dimension
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._slots = [shared_memory.SharedMemory(create=True, size=chunk_size * dimension * 4)
+                       for _ in range(2 * self.processes)]
+        self._views = [np.ndarray((chunk_size, dimension), dtype=np.float32, buffer=slot.buf) for slot in self._slots]
+        threads = max(1, (os.cpu_count() or 1) // self.processes)
+        self._workers = [context.Process(target=_work, daemon=True,
+                                         args=(model, engine, device, threads, batch_size, dimension, chunk_size,
+                                               [slot.name for slot in self._slots], self._tasks, self._results))
+                         for _ in range(self.processes)]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _result(self):
+        while True:
+            try:
+                seq, slot, count, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError("An encoding worker exited unexpectedly.")
+                continue
+            if error is not None:
+                raise RuntimeError(f"An encoding worker failed:\n{error}")
+            return seq, slot, count
+
+    def map(self, sentences: Iterable[str]) -> Iterator[np.ndarray]:
+        """
+        Encodes a stream of sentences.
+
+        Parameters
+        ----------
+        sentences : Iterable[str]
+            The sentences to encode; consumed lazily
+
+        Yields
+        ------
+        np.ndarray
+            A float32 matrix for each consecutive chunk of up to chunk_size sentences, in input order
+        """
+        sentences = iter(sentences)
+        free = list(range(len(self._slots)))
+        done = {}
+        submitted = emitted = 0
+        exhausted = False
+        while True:
+            while free and not exhausted:
+                chunk = list(islice(sentences, self.chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                self._tasks.put((submitted, free.pop(), chunk))
+                submitted += 1
+            if exhausted and emitted == submitted:
+                return
+            seq, slot, count = self._result()
+            done[seq] = (slot, count)
+            while emitted in done:
+                slot, count = done.pop(emitted)
+                yield self._views[slot][:count].copy()
+                free.append(slot)
+                emitted += 1
+
+    def close(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._views = []
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+
+def _load_sentence_transformer(name: str, device: Optional[str] = None, **options):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name, device=device, **options)
+
+def _load_cross_encoder(name: str, device: Optional[str] = None, **options):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name, device=device, **options)
+
+def _load_onnx_sentence_transformer(name: str, device: Optional[str] = None, **options):
+    from .onnx_engine import OnnxEngine
+    return OnnxEngine(name, kind="sentence_transformer", **options)
+
+def _load_onnx_cross_encoder(name: str, device: Optional[str] = None, **options):
+    from .onnx_engine import OnnxEngine
+    return OnnxEngine(name, kind="cross_encoder", **options)
+
+def _load_spacy(name: str, device: Optional[str] = None, **options):
+    import spacy
+    if device is not None and device.startswith("cuda"):
+        spacy.require_gpu()
+    return spacy.load(name, **options)
+
+def _load_spacy_sentences(name: str, device: Optional[str] = None, **options):
+    """Loads a spaCy pipeline with every component not needed for sentence boundaries disabled."""
+    nlp = _load_spacy(name, device=device, **options)
+    if "senter" in nlp.component_names:
+        keep = {"senter"}
+    elif "parser" in nlp.component_names:
+        keep = {"tok2vec", "transformer", "parser"}
+    else:
+        keep = set()
+    for pipe in nlp.pipe_names:
+        if pipe not in keep:
+            nlp.disable_pipe(pipe)
+    if "senter" in keep and "senter" not in nlp.pipe_names:
+        nlp.enable_pipe("senter")
+    if not keep:
+        nlp.add_pipe("sentencizer")
+    return nlp
+
+def _estimate_bytes(model: Any) -> int:
+    """Best-effort resident size of a loaded model, counted from its torch parameters."""
+    module = getattr(model, "model", model)
+    parameters = getattr(module, "parameters", None)
+    if not callable(parameters):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+class _Entry:
+    def __init__(self, model: Any, size: int):
+        self.model = model
+        self.size = size
+        self.leases = 0
+
+class ModelRegistry:
+    """
+    A thread-safe, process-wide cache of loaded models.
+
+    Models are keyed by (kind, name, device, options), loaded once, and evicted
+    least-recently-used first when the registry exceeds its memory budget or model
+    count. Models currently held through lease() are never evicted.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_models: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        max_bytes : int, optional
+            The memory budget for all idle and leased models (default is None, unbounded)
+        max_models : int, optional
+            The maximum number of loaded models (default is None, unbounded)
+        """
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self._loaders: Dict[str, Callable[..., Any]] = {
+            "sentence_transformer": _load_sentence_transformer,
+            "cross_encoder": _load_cross_encoder,
+            "spacy": _load_spacy,
+            "spacy_sentences": _load_spacy_sentences,
+            "onnx_sentence_transformer": _load_onnx_sentence_transformer,
+            "onnx_cross_encoder": _load_onnx_cross_encoder,
+        }
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._loading: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+    def register_loader(self, kind: str, loader: Callable[..., Any]):
+        """Registers a loader called as loader(name, device=device, **options) for a new model kind."""
+        with self._lock:
+            self._loaders[kind] = loader
+
+    @staticmethod
+    def _key(kind: str, name: str, device: Optional[str], options: Dict[str, Any]) -> Tuple:
+        return (kind, name, device, tuple(sorted((k, repr(v)) for k, v in options.items())))
+
+    def get(self, kind: str, name: str, device: Optional[str] = None, **options) -> Any:
+        """
+        Returns the shared instance for a model, loading it on first use.
+
+        Parameters
+        ----------
+        kind : str
+            The model kind ("sentence_transformer", "cross_encoder", "spacy", "onnx_sentence_transformer", ...)
+        name : str
+            The model name or path
+        device : str, optional
+            The device to load the model on (default is None, the library default)
+
+        Returns
+        -------
+        Any
+            The loaded model
+        """
+        if kind not in self._loaders:
+            raise ValueError(f"Unknown model kind: {kind}")
+        key = self._key(kind, name, device, options)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.model
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so that other models stay available, while
+        # concurrent requests for the same model wait on its own lock.
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry.model
+            model = self._loaders[kind](name, device=device, **options)
+            with self._lock:
+                self._entries[key] = _Entry(model, _estimate_bytes(model))
+                self._loading.pop(key, None)
+                self._evict()
+            return model
+
+    @contextmanager
+    def lease(self, kind: str, name: str, device: Optional[str] = None, **options):
+        """Yields a model that is pinned against eviction for the duration of the block."""
+        model = self.get(kind, name, device=device, **options)
+        key = self._key(kind, name, device, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.leases += 1
+        try:
+            yield model
+        finally:
+            with self._lock:
+                if entry is not None:
+                    entry.leases -= 1
+                self._evict()
+
+    def _over_budget(self) -> bool:
+        if self.max_models is not None and len(self._entries) > self.max_models:
+            return True
+        return self.max_bytes is not None and self.memory_usage() > self.max_bytes
+
+    def _evict(self):
+        for key in list(self._entries):
+            if not self._over_budget():
+                break
+            # The most recently used model is kept even when it alone exceeds the budget.
+            if self._entries[key].leases or key == next(reversed(self._entries)):
+                continue
+            del self._entries[key]
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    def evict(self, kind: Optional[str] = None, name: Optional[str] = None):
+        """Drops idle models, optionally only those matching a kind and/or name."""
+        with self._lock:
+            for key in list(self._entries):
+                if kind is not None and key[0] != kind:
+                    continue
+                if name is not None and key[1] != name:
+                    continue
+                if not self._entries[key].leases:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": [{"kind": key[0], "name": key[1], "device": key[2],
+                            "bytes": entry.size, "leases": entry.leases}
+                           for key, entry in self._entries.items()],
+                "bytes": self.memory_usage(),
+                "max_bytes": self.max_bytes,
+                "max_models": self.max_models,
+            }
+
+registry = ModelRegistry()
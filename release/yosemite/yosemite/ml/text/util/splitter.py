@@ -0,0 +1,78 @@
+from typing import Iterable, List, Optional, Tuple
+import re
+
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "ft", "rev", "gen", "gov", "sen", "rep", "col",
+    "capt", "lt", "sgt", "vs", "etc", "e.g", "i.e", "cf", "al", "approx", "dept", "est", "fig", "inc", "ltd",
+    "co", "corp", "no", "vol", "pp", "ch", "sec", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "u.s", "u.k", "a.m", "p.m", "ph.d",
+})
+
+# A run of terminal punctuation, any closing quotes or brackets, whitespace, and a
+# lookahead for something that can start a sentence.
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s+[\"'“‘(\[]*[A-Z0-9])")
+_PARAGRAPH = re.compile(r"\n[ \t]*\n\s*")
+
+class RuleSplitter:
+    """
+    A model-free, abbreviation-aware sentence splitter built on compiled regular expressions.
+
+    Sentences end at terminal punctuation followed by whitespace and an uppercase letter,
+    digit or opening quote, unless the preceding word is a known abbreviation or a single
+    initial. Blank lines always end a sentence.
+    """
+
+    def __init__(self, abbreviations: Optional[Iterable[str]] = None):
+        """
+        Parameters
+        ----------
+        abbreviations : Iterable[str], optional
+            Lowercase abbreviations, without their final period, that never end a sentence
+            (default is ABBREVIATIONS)
+        """
+        self.abbreviations = frozenset(abbreviations) if abbreviations is not None else ABBREVIATIONS
+
+    def _is_abbreviation(self, text: str, end: int) -> bool:
+        start = end
+        while start > 0 and end - start < 32 and not text[start - 1].isspace():
+            start -= 1
+        word = text[start:end].lstrip("\"'(“‘[").lower()
+        if not word:
+            return False
+        return len(word) == 1 and word.isalpha() or word in self.abbreviations
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Returns the (start, end) character offsets of each sentence, with surrounding whitespace excluded.
+        """
+        spans = []
+        for start, end in self._paragraphs(text):
+            for match in _BOUNDARY.finditer(text, start, end):
+                if text[match.start()] == "." and self._is_abbreviation(text, match.start()):
+                    continue
+                spans.append((start, match.end()))
+                start = match.end()
+            spans.append((start, end))
+
+        stripped = []
+        for start, end in spans:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                stripped.append((start, end))
+        return stripped
+
+    @staticmethod
+    def _paragraphs(text: str) -> Iterable[Tuple[int, int]]:
+        start = 0
+        for match in _PARAGRAPH.finditer(text):
+            yield start, match.start()
+            start = match.end()
+        yield start, len(text)
+
+    def split(self, text: str) -> List[str]:
+        if not text:
+            return []
+        return [text[start:end] for start, end in self.spans(text)]
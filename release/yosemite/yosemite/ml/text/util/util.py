@@ -1,25 +1,354 @@
-from typing import List, Tuple
-from sentence_transformers import SentenceTransformer
-import spacy
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from .batching import MicroBatcher, shared_batcher
+from .cache import EmbeddingCache, QueryCache, query_cache
+from .registry import registry
+from .splitter import RuleSplitter
+from .windows import TokenWindows
+import numpy as np
 
 class Embedder:
-    def __init__(self, model: str = "paraphrase-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model)
+    engines = ("torch", "onnx")
 
-    def embed(self, sentences: List[str]) -> List[Tuple[str, List[float]]]:
+    def __init__(self, model: str = "paraphrase-MiniLM-L6-v2", batch_size: int = 32, device: Optional[str] = None,
+                 cache: Union[str, EmbeddingCache, None] = None, engine: str = "torch",
+                 queries: Optional[QueryCache] = query_cache, batch_window: Optional[float] = None):
+        if engine not in self.engines:
+            raise ValueError(f"Invalid engine: {engine}. Expected one of {self.engines}.")
+        self.model_name = model
+        self.device = device
+        self.engine = registry.get("onnx_sentence_transformer", model) if engine == "onnx" else None
+        self.model = registry.get("sentence_transformer", model, device=device) if self.engine is None else None
+        self.batch_size = batch_size
+        self.cache = EmbeddingCache(cache, model, backend=self.backend) if isinstance(cache, str) else cache
+        if self.cache is not None and (self.cache.model_name, self.cache.backend) != (model, self.backend):
+            raise ValueError(f"The cache holds {self.cache.model_name} vectors from {self.cache.backend}, "
+                             f"not {model} from {self.backend}.")
+        self.queries = queries
+        self.batcher = None
+        if batch_window is not None:
+            # Calls smaller than one batch from every Embedder of this model share a MicroBatcher.
+            self.batcher = shared_batcher(
+                ("embed", model, engine, device, batch_size, batch_window),
+                lambda: MicroBatcher(self._encode_batch, max_batch_size=batch_size, max_wait=batch_window,
+                                     name=f"yosemite-embed-{model}"))
+
+    @property
+    def backend(self) -> str:
+        """Which runtime produces the vectors, e.g. "torch" or "onnx-int8"; vectors from different backends are cached apart."""
+        if self.engine is None:
+            return "torch"
+        return "onnx-int8" if getattr(self.engine, "quantize", False) else "onnx"
+
+    @property
+    def dimension(self) -> int:
+        if self.engine is not None:
+            return self.engine.dimension
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def tokenizer(self):
+        return (self.engine or self.model).tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        """The number of text tokens the model reads before truncating, excluding its two special tokens."""
+        return (self.engine or self.model).max_seq_length - 2
+
+    def _encode(self, sentences: List[str], batch_size: int) -> np.ndarray:
+        if self.engine is not None:
+            return self.engine.encode(sentences, batch_size=batch_size)
+        return self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        """Encodes a micro-batch merged from several calls, longest first so it pads evenly."""
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]), reverse=True)
+        vectors = np.empty((len(sentences), self.dimension), dtype=np.float32)
+        vectors[order] = self._encode([sentences[i] for i in order], self.batch_size)
+        return vectors
+
+    def _forward(self, sentences: List[str], batch_size: int) -> np.ndarray:
+        if self.batcher is not None and len(sentences) < self.batcher.max_batch_size:
+            return self.batcher(sentences)
+        return self._encode(sentences, batch_size)
+
+    def encode(self, sentences: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Encodes a list of sentences into a single contiguous float32 matrix.
+
+        Duplicate sentences are encoded once, sentences already in the Embedder's
+        cache are not encoded at all, and the remaining sentences are sorted by
+        length before batching so that each batch pads to a similar length.
+        With a batch_window, calls smaller than one batch wait up to that many seconds
+        to share a forward pass with concurrent calls from other threads.
+
+        Parameters
+        ----------
+        sentences : List[str]
+            The sentences to encode
+        batch_size : int, optional
+            The number of sentences per forward pass (default is the Embedder's batch_size)
+
+        Returns
+        -------
+        np.ndarray
+            A (len(sentences), dimension) float32 matrix, in input order
+        """
         if not sentences:
-            return []
-        return [(sentence, self.model.encode(sentence)) for sentence in sentences]
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        slots = {}
+        inverse = np.fromiter((slots.setdefault(sentence, len(slots)) for sentence in sentences),
+                              dtype=np.int64, count=len(sentences))
+        unique = list(slots)
+        vectors = np.empty((len(unique), self.dimension), dtype=np.float32)
+        missing = range(len(unique))
+        if self.cache is not None:
+            cached, found = self.cache.get_many(unique)
+            if found.any():
+                vectors[found] = cached[found]
+            missing = np.flatnonzero(~found).tolist()
+
+        if missing:
+            order = sorted(missing, key=lambda i: len(unique[i]), reverse=True)
+            encoded = self._forward([unique[i] for i in order], batch_size or self.batch_size)
+            vectors[order] = encoded
+            if self.cache is not None:
+                self.cache.put_many([unique[i] for i in order], vectors[order])
+        return np.ascontiguousarray(vectors[inverse])
+
+    def embed(self, sentences: List[str], batch_size: int = None,
+              as_tuples: bool = True) -> Union[List[Tuple[str, np.ndarray]], np.ndarray]:
+        if not sentences:
+            return [] if as_tuples else self.encode(sentences)
+        vectors = self.encode(sentences, batch_size=batch_size)
+        if not as_tuples:
+            return vectors
+        return list(zip(sentences, vectors))
+
+    def embed_query(self, queries: List[str]) -> np.ndarray:
+        """
+        Encodes search queries through the Embedder's QueryCache.
+
+        Queries seen recently, up to whitespace, come straight from the cache; the rest
+        are encoded in one batch and stored. With queries=None this is encode().
+
+        Parameters
+        ----------
+        queries : List[str]
+            The queries to encode
+
+        Returns
+        -------
+        np.ndarray
+            A (len(queries), dimension) float32 matrix, in input order
+        """
+        if self.queries is None or not queries:
+            return self.encode(queries)
+        key = f"{self.model_name}:{self.backend}"
+        cached, found = self.queries.get_many(key, queries)
+        if found.all():
+            return np.stack(cached)
+        missing = np.flatnonzero(~found).tolist()
+        encoded = self.encode([queries[i] for i in missing])
+        self.queries.put_many(key, [queries[i] for i in missing], encoded)
+        vectors = np.empty((len(queries), encoded.shape[1]), dtype=np.float32)
+        vectors[missing] = encoded
+        for i in np.flatnonzero(found).tolist():
+            vectors[i] = cached[i]
+        return vectors
+
+    def embed_parallel(self, sentences: Iterable[str], processes: Optional[int] = None,
+                       chunk_size: int = 1024) -> Iterator[np.ndarray]:
+        """
+        Encodes a stream of sentences across a pool of worker processes.
+
+        Each worker loads its own copy of the model and writes its vectors into shared
+        memory. Sentences found in the Embedder's cache are not sent to the workers; with a
+        cache, input is read at most 2 * processes chunks ahead of the output.
+
+        Parameters
+        ----------
+        sentences : Iterable[str]
+            The sentences to encode; consumed lazily
+        processes : int, optional
+            The number of worker processes (default is os.cpu_count())
+        chunk_size : int, optional
+            The number of sentences per chunk (default is 1024)
+
+        Yields
+        ------
+        np.ndarray
+            A float32 matrix for each consecutive chunk of up to chunk_size sentences, in input order
+        """
+        from .pool import EncodePool
+
+        sentences = iter(sentences)
+        with EncodePool(self.model_name, self.dimension, processes=processes, chunk_size=chunk_size,
+                        batch_size=self.batch_size, device=self.device,
+                        engine="onnx" if self.engine is not None else "torch") as pool:
+            if self.cache is None:
+                yield from pool.map(sentences)
+                return
+
+            # Input is read one window of chunks at a time, so a mostly cached stream is never
+            # buffered far ahead of what has been yielded, however long it goes between misses.
+            window = 2 * pool.processes
+            while True:
+                lookups = []
+                for chunk in iter(lambda: list(islice(sentences, chunk_size)), []):
+                    cached, found = self.cache.get_many(chunk)
+                    lookups.append((chunk, cached, found))
+                    if len(lookups) == window:
+                        break
+                if not lookups:
+                    return
+                misses = [sentence for chunk, _, found in lookups for sentence, hit in zip(chunk, found) if not hit]
+                rows = np.concatenate(list(pool.map(misses))) if misses else None
+                start = 0
+                for chunk, cached, found in lookups:
+                    missing = np.flatnonzero(~found)
+                    vectors = cached if cached.shape[1] else np.empty((len(chunk), self.dimension), dtype=np.float32)
+                    if len(missing):
+                        vectors[missing] = rows[start:start + len(missing)]
+                        self.cache.put_many([chunk[i] for i in missing], vectors[missing])
+                        start += len(missing)
+                    yield vectors
 
 class Chunker:
-    def __init__(self, model: str = "en_core_web_sm"):
-        self.nlp = spacy.load(model)
+    backends = {"rule": RuleSplitter}
+
+    def __init__(self, model: str = "en_core_web_sm", backend: str = "spacy", embedder: Optional[Embedder] = None,
+                 max_tokens: Optional[int] = None, overlap: int = 0):
+        """
+        Parameters
+        ----------
+        model : str, optional
+            The spaCy pipeline used by the "spacy" backend (default is "en_core_web_sm")
+        backend : str or object, optional
+            "spacy", a name in Chunker.backends, or any object with a split(text) method (default is "spacy")
+        embedder : Embedder, optional
+            The Embedder whose tokenizer sizes token windows (default is None)
+        max_tokens : int, optional
+            Pack sentences into windows of at most this many model tokens, capped at the
+            embedder's own limit (default is None, one chunk per sentence)
+        overlap : int, optional
+            The number of tokens repeated between consecutive windows (default is 0)
+        """
+        if max_tokens is not None and embedder is None:
+            raise ValueError("max_tokens requires an embedder whose tokenizer sizes the windows.")
+        self.model = model
+        self.embedder = embedder
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self._nlp = None
+        self._sentence_nlp = None
+        if isinstance(backend, str):
+            if backend != "spacy" and backend not in self.backends:
+                raise ValueError(f"Unknown chunker backend: {backend}. Expected 'spacy' or one of {sorted(self.backends)}.")
+            self.splitter = self.backends[backend]() if backend in self.backends else None
+        else:
+            self.splitter = backend
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = registry.get("spacy", self.model)
+        return self._nlp
+
+    @property
+    def sentence_nlp(self):
+        """The shared pipeline with only sentence segmentation enabled (senter, or the parser if there is none)."""
+        if self._sentence_nlp is None:
+            self._sentence_nlp = registry.get("spacy_sentences", self.model)
+        return self._sentence_nlp
+
+    def _windows(self) -> Optional[TokenWindows]:
+        if self.max_tokens is None:
+            return None
+        return TokenWindows(self.embedder.tokenizer, min(self.max_tokens, self.embedder.max_tokens), self.overlap)
+
+    def _pack(self, sentences: List[str]) -> List[str]:
+        windows = self._windows()
+        if windows is None:
+            return sentences
+        return windows.add(sentences) + windows.flush()
+
+    def _sentences(self, text: str) -> List[str]:
+        if self.splitter is not None:
+            return self.splitter.split(text)
+        return [sent.text.strip() for sent in self.sentence_nlp(text).sents if sent.text.strip()]
 
     def chunk_text(self, text: str) -> List[str]:
         if not text:
             return []
-        doc = self.nlp(text)
-        return [sent.text.strip() for sent in doc.sents]
+        # The same path as chunk_many, so one text gets the sentence-only pipeline and no empty sentences.
+        return next(self.chunk_many([text]))[1]
+
+    def chunk_many(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1) -> Iterator[Tuple[int, List[str]]]:
+        """
+        Splits a stream of texts into sentences with nlp.pipe.
+
+        Parameters
+        ----------
+        texts : Iterable[str]
+            The texts to split; consumed lazily
+        batch_size : int, optional
+            The number of texts per nlp.pipe batch (default is 64)
+        n_process : int, optional
+            The number of worker processes used by nlp.pipe (default is 1)
+
+        Yields
+        ------
+        Tuple[int, List[str]]
+            The index of each text in the input and its sentences, in input order
+        """
+        if self.splitter is not None:
+            for i, text in enumerate(texts):
+                yield i, self._pack(self.splitter.split(text or ""))
+            return
+
+        docs = self.sentence_nlp.pipe(((text or "", i) for i, text in enumerate(texts)), as_tuples=True,
+                                      batch_size=batch_size, n_process=n_process)
+        for doc, i in docs:
+            yield i, self._pack([sent.text.strip() for sent in doc.sents if sent.text.strip()])
+
+    def chunk_stream(self, stream: Iterable[str]) -> Iterator[str]:
+        """
+        Chunks one long text that arrives in pieces, such as pages or file reads.
+
+        The last sentence of each piece is held back until the next piece shows where it
+        ends, so pieces may be cut anywhere. With max_tokens set, windows are yielded as
+        soon as they fill up; otherwise each sentence is yielded.
+
+        Parameters
+        ----------
+        stream : Iterable[str]
+            Consecutive pieces of the text
+
+        Yields
+        ------
+        str
+            The chunks, in order
+        """
+        windows = self._windows()
+        carry = ""
+        for piece in stream:
+            text = carry + piece
+            sentences = self._sentences(text)
+            if not sentences:
+                carry = text
+                continue
+            carry = text[text.rfind(sentences[-1]):]
+            sentences.pop()
+            yield from windows.add(sentences) if windows is not None else sentences
+
+        sentences = self._sentences(carry) if carry.strip() else []
+        if windows is None:
+            yield from sentences
+        else:
+            yield from windows.add(sentences)
+            yield from windows.flush()
 
 if __name__ == "__main__":
     transformer = Embedder()
@@ -31,9 +360,16 @@ if __name__ == "__main__":
         print(f"Embedding: {embedding}")
         print()
 
+    matrix = transformer.embed(sentences * 4, as_tuples=False)
+    print(f"Batched Example: {matrix.shape} {matrix.dtype}")
+    print()
+
     chunker = Chunker()
     text = "This is a long text. It consists of multiple sentences. The Chunker class will split it into individual sentences."
     sentences = chunker.chunk_text(text)
     print("Chunker Example:")
     for sentence in sentences:
-        print(sentence)
\ No newline at end of file
+        print(sentence)
+
+    for i, chunks in chunker.chunk_many([text, "A second document. With two sentences."]):
+        print(f"Document {i}: {chunks}")
@@ -0,0 +1,100 @@
+from typing import List, Tuple
+
+class TokenWindows:
+    """
+    Packs a stream of sentences into windows of at most max_tokens model tokens.
+
+    Sentences are added incrementally and completed windows are returned as soon as
+    the next sentence no longer fits. Each new window starts with the trailing
+    sentences of the previous one, up to overlap tokens. A sentence longer than
+    max_tokens is cut at token boundaries into overlapping pieces of its own.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int, overlap: int = 0):
+        """
+        Parameters
+        ----------
+        tokenizer : transformers.PreTrainedTokenizerBase
+            The embedding model's tokenizer
+        max_tokens : int
+            The maximum number of tokens per window, excluding special tokens
+        overlap : int, optional
+            The number of tokens carried over from the end of one window into the next (default is 0)
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive.")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be at least 0 and smaller than max_tokens.")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self._window: List[Tuple[str, int]] = []
+        self._tokens = 0
+        self._fresh = False
+
+    def count(self, sentences: List[str]) -> List[int]:
+        if not sentences:
+            return []
+        return [len(ids) for ids in self.tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+
+    def _split(self, sentence: str) -> List[str]:
+        try:
+            offsets = self.tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        except NotImplementedError:
+            # Slow tokenizers have no offsets; fall back to whole words.
+            words = sentence.split()
+            counts = self.count(words)
+            offsets, position = [], 0
+            for word, count in zip(words, counts):
+                start = sentence.index(word, position)
+                position = start + len(word)
+                offsets.extend([(start, position)] * max(count, 1))
+
+        pieces = []
+        step = self.max_tokens - self.overlap
+        for start in range(0, len(offsets), step):
+            window = offsets[start:start + self.max_tokens]
+            pieces.append(sentence[window[0][0]:window[-1][1]].strip())
+            if start + self.max_tokens >= len(offsets):
+                break
+        return [piece for piece in pieces if piece]
+
+    def _emit(self) -> str:
+        window = " ".join(sentence for sentence, _ in self._window)
+        carried, tokens = [], 0
+        for sentence, count in reversed(self._window):
+            if tokens + count > self.overlap:
+                break
+            carried.insert(0, (sentence, count))
+            tokens += count
+        self._window, self._tokens, self._fresh = carried, tokens, False
+        return window
+
+    def add(self, sentences: List[str]) -> List[str]:
+        """Adds sentences and returns the windows they completed."""
+        windows = []
+        for sentence, count in zip(sentences, self.count(sentences)):
+            if count > self.max_tokens:
+                if self._fresh:
+                    windows.append(self._emit())
+                self._window, self._tokens, self._fresh = [], 0, False
+                windows.extend(self._split(sentence))
+                continue
+            if self._tokens + count > self.max_tokens:
+                if self._fresh:
+                    windows.append(self._emit())
+                # Drop carried sentences until the new one fits next to them.
+                while self._window and self._tokens + count > self.max_tokens:
+                    self._tokens -= self._window.pop(0)[1]
+            self._window.append((sentence, count))
+            self._tokens += count
+            self._fresh = True
+        return windows
+
+    def flush(self) -> List[str]:
+        """Returns the last, partially filled window, if it holds anything beyond the overlap already emitted."""
+        window, fresh = self._window, self._fresh
+        self._window, self._tokens, self._fresh = [], 0, False
+        if not fresh:
+            return []
+        return [" ".join(sentence for sentence, _ in window)]
@@ -0,0 +1,7 @@
+from yosemite._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "Client": (".client", "Client"),
+    "SearchServer": (".server", "SearchServer"),
+    "default_socket_path": (".protocol", "default_socket_path"),
+})
@@ -0,0 +1,90 @@
+from yosemite.serve.protocol import EMBED, ERROR, PING, RERANK, SEARCH, SHUTDOWN, STATS, default_socket_path, recv_frame, send_frame
+from typing import Dict, List, Optional, Tuple
+import socket
+
+class Client:
+    """
+    A connection to a running `yosemite serve` process.
+
+    Importing and using the client loads no models and no torch, so a script
+    that only sends a few queries starts in milliseconds. One connection serves many
+    requests; open one Client per thread.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            socket_path (Optional[str]): The server's socket; defaults to default_socket_path().
+            timeout (Optional[float]): Seconds to wait for each reply; None waits as long as it takes.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+        try:
+            self.connection.connect(self.socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            self.connection.close()
+            raise ConnectionError(f"No yosemite server at {self.socket_path}; start one with `yosemite serve`.") from e
+
+    def request(self, operation: int, body: Optional[Dict] = None, blob: bytes = b"") -> Tuple[Dict, bytes]:
+        """Sends one request and returns the reply's (body, blob); raises RuntimeError with the server's message if it failed."""
+        send_frame(self.connection, operation, body or {}, blob)
+        frame = recv_frame(self.connection)
+        if frame is None:
+            raise ConnectionError("The server closed the connection.")
+        status, reply, reply_blob = frame
+        if status == ERROR:
+            raise RuntimeError(reply.get("error", "Request failed."))
+        return reply, reply_blob
+
+    def ping(self) -> int:
+        """Returns the server's process id."""
+        return self.request(PING)[0]["pid"]
+
+    def search_batch(self, queries: List[str], k: int = 5, store: Optional[str] = None,
+                     fields: Optional[List[str]] = None, filter: Optional[Dict[str, str]] = None) -> List[List[Dict]]:
+        """
+        Searches one of the server's stores.
+
+        Args:
+            queries (List[str]): The queries.
+            k (int): The number of hits per query.
+            store (Optional[str]): "vectors", "hybrid" or "text"; defaults to the first of those the server has.
+            fields (Optional[List[str]]): The fields a "text" or "hybrid" query is parsed against.
+            filter (Optional[Dict[str, str]]): A metadata filter for "vectors".
+
+        Returns:
+            List[List[Dict]]: For each query, hits with document_id and text, plus index and distance from "vectors".
+        """
+        body = {"queries": list(queries), "k": k, "store": store, "fields": fields, "filter": filter}
+        return self.request(SEARCH, body)[0]["results"]
+
+    def search(self, query: str, k: int = 5, store: Optional[str] = None, fields: Optional[List[str]] = None,
+               filter: Optional[Dict[str, str]] = None) -> List[Dict]:
+        return self.search_batch([query], k, store, fields, filter)[0]
+
+    def rerank(self, query: str, texts: List[str]) -> List[Tuple[str, float]]:
+        """Scores texts against query with the server's cross-encoder; best first."""
+        return [(text, score) for text, score in self.request(RERANK, {"query": query, "texts": list(texts)})[0]["results"]]
+
+    def embed(self, texts: List[str]):
+        """Returns a (len(texts), dimension) float32 numpy matrix."""
+        import numpy as np
+        reply, blob = self.request(EMBED, {"texts": list(texts)})
+        return np.frombuffer(blob, dtype=reply["dtype"]).reshape(reply["shape"])
+
+    def stats(self) -> Dict:
+        return self.request(STATS)[0]
+
+    def shutdown(self):
+        """Asks the server to stop once this reply is sent."""
+        self.request(SHUTDOWN)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
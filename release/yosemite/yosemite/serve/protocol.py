@@ -0,0 +1,62 @@
+from typing import Dict, Optional, Tuple
+import json
+import os
+import socket
+import struct
+
+VERSION = 1
+
+# Request operations.
+PING, SEARCH, RERANK, EMBED, STATS, SHUTDOWN = range(6)
+OPERATIONS = {"ping": PING, "search": SEARCH, "rerank": RERANK, "embed": EMBED, "stats": STATS, "shutdown": SHUTDOWN}
+
+# Response statuses, sent in the operation byte.
+OK, ERROR = 0, 1
+
+# version, operation or status, length of the JSON body, length of the binary body.
+HEADER = struct.Struct("!BBII")
+MAX_FRAME = 1 << 30
+
+def default_socket_path() -> str:
+    """The socket `yosemite serve` listens on unless told otherwise: one per user, in the runtime directory if there is one."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "yosemite.sock")
+    return os.path.join("/tmp", f"yosemite-{os.getuid()}.sock")
+
+def _read_exactly(connection: socket.socket, size: int, eof_ok: bool = False) -> Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = connection.recv_into(view[received:])
+        if n == 0:
+            if received == 0 and eof_ok:
+                return None
+            raise ConnectionError("Connection closed in the middle of a frame.")
+        received += n
+    return bytes(buffer)
+
+def send_frame(connection: socket.socket, code: int, body: Dict, blob: bytes = b""):
+    """
+    Writes one frame: a 10-byte header, a JSON body, then an optional binary body.
+
+    The binary body carries bulk data, such as float32 embeddings, without any
+    encoding; the JSON body describes it (e.g. its shape).
+    """
+    payload = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    connection.sendall(HEADER.pack(VERSION, code, len(payload), len(blob)) + payload + blob)
+
+def recv_frame(connection: socket.socket) -> Optional[Tuple[int, Dict, bytes]]:
+    """Reads one frame; returns (code, body, blob), or None if the peer closed the connection between frames."""
+    header = _read_exactly(connection, HEADER.size, eof_ok=True)
+    if header is None:
+        return None
+    version, code, body_size, blob_size = HEADER.unpack(header)
+    if version != VERSION:
+        raise ConnectionError(f"Unsupported protocol version {version}; expected {VERSION}.")
+    if body_size + blob_size > MAX_FRAME:
+        raise ConnectionError(f"Frame of {body_size + blob_size} bytes exceeds the {MAX_FRAME} byte limit.")
+    body = json.loads(_read_exactly(connection, body_size)) if body_size else {}
+    blob = _read_exactly(connection, blob_size) if blob_size else b""
+    return code, body, blob
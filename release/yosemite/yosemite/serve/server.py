@@ -0,0 +1,240 @@
+from yosemite.serve.protocol import (EMBED, ERROR, OK, PING, RERANK, SEARCH, SHUTDOWN, STATS, default_socket_path,
+                                     recv_frame, send_frame)
+from typing import Dict, List, Optional, Tuple
+import os
+import socket
+import socketserver
+import threading
+import time
+import numpy as np
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves every frame sent over one client connection, in order."""
+
+    def handle(self):
+        server: SearchServer = self.server.search_server
+        while True:
+            try:
+                frame = recv_frame(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if frame is None:
+                return
+            operation, body, blob = frame
+            try:
+                reply, reply_blob = server.dispatch(operation, body, blob)
+                send_frame(self.request, OK, reply, reply_blob)
+            except Exception as e:
+                try:
+                    send_frame(self.request, ERROR, {"error": f"{type(e).__name__}: {e}"})
+                except OSError:
+                    return
+            if operation == SHUTDOWN:
+                server.stop()
+                return
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class SearchServer:
+    """
+    Keeps the models and stores loaded in one long-lived process and answers requests over a Unix socket.
+
+    Scripts pay for importing torch and loading models once, when the server starts,
+    instead of on every run; each request is a round trip over the socket. Requests
+    are framed as described in yosemite.serve.protocol. Connections are served on
+    their own threads. Concurrent queries go through the Embedder's MicroBatcher, so
+    they share forward passes.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, database: Optional[str] = None, vectors: Optional[str] = None,
+                 hybrid: Optional[str] = None, model_name: str = "all-MiniLM-L6-v2",
+                 cross_encoder: Optional[str] = "cross-encoder/ms-marco-MiniLM-L-12-v2", inference: str = "torch",
+                 batch_window: Optional[float] = 0.002):
+        """
+        Args:
+            socket_path (Optional[str]): The socket to listen on; defaults to default_socket_path().
+            database (Optional[str]): A whoosh Database directory, searched with store="text".
+            vectors (Optional[str]): A saved VectorDatabase directory, searched with store="vectors".
+            hybrid (Optional[str]): A YosemiteDatabase directory, searched with store="hybrid".
+            model_name (str): The embedding model for embed requests and the hybrid store; a VectorDatabase uses the model it was saved with.
+            cross_encoder (Optional[str]): The model for rerank requests; None disables them.
+            inference (str): "torch" or "onnx".
+            batch_window (Optional[float]): Seconds concurrent embeddings wait to share a forward pass; None disables micro-batching.
+        """
+        self.socket_path = os.path.abspath(socket_path or default_socket_path())
+        self.database_path = database
+        self.vectors_path = vectors
+        self.hybrid_path = hybrid
+        self.model_name = model_name
+        self.cross_encoder_name = cross_encoder
+        self.inference = inference
+        self.batch_window = batch_window
+        self.database = None
+        self.vectors = None
+        self.hybrid = None
+        self.embedder = None
+        self.cross_encoder = None
+        self.started = None
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._models = threading.Lock()
+        self._stopping = threading.Event()
+        self._server: Optional[_UnixServer] = None
+
+    def load(self):
+        """
+        Loads the stores, so the first request is as fast as the rest.
+
+        The embedding model and cross-encoder are loaded here too when a vectors or hybrid
+        store already pulls in torch; a text-only server loads each on its first embed or
+        rerank request instead.
+        """
+        if self.database_path:
+            from yosemite.ml.data.db import Database
+            self.database = Database()
+            self.database.load(self.database_path)
+            if self.database.ix is None:
+                raise FileNotFoundError(f"No whoosh index in {self.database_path}")
+            self.database.schema = self.database.ix.schema
+        if self.vectors_path:
+            from yosemite.ml.data.vdb import VectorDatabase
+            self.vectors = VectorDatabase(inference=self.inference, batch_window=self.batch_window)
+            self.vectors.load(self.vectors_path)
+            self.vectors._embedder()
+        if self.hybrid_path:
+            from yosemite.ml.data.universal import YosemiteDatabase
+            self.hybrid = YosemiteDatabase(model_name=self.model_name, inference=self.inference,
+                                           batch_window=self.batch_window)
+            self.hybrid.load(self.hybrid_path)
+            self.hybrid.schema = self.hybrid.ix.schema
+        if self.vectors is not None or self.hybrid is not None:
+            self._embedder()
+            if self.cross_encoder_name:
+                self._cross_encoder()
+
+    def _embedder(self):
+        with self._models:
+            if self.embedder is None:
+                from yosemite.ml.text.util import SentenceTransformer
+                self.embedder = SentenceTransformer(self.model_name, engine=self.inference, batch_window=self.batch_window)
+            return self.embedder
+
+    def _cross_encoder(self):
+        with self._models:
+            if self.cross_encoder is None:
+                from yosemite.ml.text.cross_encode import CrossEncoder
+                self.cross_encoder = CrossEncoder(self.cross_encoder_name, engine=self.inference,
+                                                  batch_window=self.batch_window)
+            return self.cross_encoder
+
+    def _bind(self) -> _UnixServer:
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Left behind by a server that did not shut down cleanly.
+                os.unlink(self.socket_path)
+            else:
+                raise OSError(f"A server is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+        previous = os.umask(0o177)
+        try:
+            server = _UnixServer(self.socket_path, _Handler)
+        finally:
+            os.umask(previous)
+        server.search_server = self
+        return server
+
+    def serve_forever(self):
+        """Loads everything, then answers requests until stop() is called or a shutdown request arrives."""
+        try:
+            self.load()
+            if self._stopping.is_set():
+                return
+            self._server = self._bind()
+            self.started = time.time()
+            try:
+                # A stop() that came while the server was binding found no server to shut down.
+                if not self._stopping.is_set():
+                    self._server.serve_forever()
+            finally:
+                self._server.server_close()
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+        finally:
+            if self.vectors is not None:
+                self.vectors.close()
+
+    def stop(self):
+        """Stops serve_forever from any thread other than its own, including while it is still loading."""
+        self._stopping.set()
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def dispatch(self, operation: int, body: Dict, blob: bytes) -> Tuple[Dict, bytes]:
+        with self._lock:
+            self.requests += 1
+        if operation == PING:
+            return {"pid": os.getpid()}, b""
+        if operation == SEARCH:
+            return {"results": self.search(body.get("queries") or [body["query"]], body.get("k", 5), body.get("store"),
+                                           body.get("fields"), body.get("filter"))}, b""
+        if operation == RERANK:
+            if self.cross_encoder_name is None:
+                raise ValueError("This server was started without a cross-encoder.")
+            ranked = self._cross_encoder().rank(body["query"], list(body["texts"]), [])
+            return {"results": [[text, float(score)] for text, score in ranked]}, b""
+        if operation == EMBED:
+            vectors = np.ascontiguousarray(self._embedder().encode(list(body["texts"])), dtype=np.float32)
+            return {"shape": list(vectors.shape), "dtype": "float32"}, vectors.tobytes()
+        if operation == STATS:
+            return self.stats(), b""
+        if operation == SHUTDOWN:
+            return {}, b""
+        raise ValueError(f"Unknown operation {operation}.")
+
+    def _default_store(self) -> str:
+        for name in ("vectors", "hybrid", "database"):
+            if getattr(self, name) is not None:
+                return "text" if name == "database" else name
+        raise ValueError("This server was started without any store to search.")
+
+    def search(self, queries: List[str], k: int, store: Optional[str], fields: Optional[List[str]],
+               filter: Optional[Dict]) -> List[List[Dict]]:
+        """Runs queries against one store; each hit is a dict with document_id and text, plus index and distance for vectors."""
+        store = store or self._default_store()
+        if store == "vectors":
+            if self.vectors is None:
+                raise ValueError("This server was started without a VectorDatabase.")
+            results = self.vectors.search_batch(queries, k, threads=1, filter=filter)
+            return [[{"index": int(i), "document_id": self.vectors.document_ids[int(i)], "text": self.vectors.sentences[int(i)],
+                      "distance": float(distance)}
+                     for i, distance in zip(indices, distances) if i >= 0]
+                    for indices, distances in zip(results.indices, results.distances)]
+        if store == "hybrid":
+            if self.hybrid is None:
+                raise ValueError("This server was started without a YosemiteDatabase.")
+            return [[{"document_id": doc_id, "text": chunk} for doc_id, chunk, _ in self.hybrid.search(query, fields, k)]
+                    for query in queries]
+        if store == "text":
+            if self.database is None:
+                raise ValueError("This server was started without a Database.")
+            return [[{"document_id": hit["id"], "text": hit["content"]} for hit in (self.database.search(query, fields) or [])[:k]]
+                    for query in queries]
+        raise ValueError(f"Invalid store: {store}. Expected 'vectors', 'hybrid' or 'text'.")
+
+    def stats(self) -> Dict:
+        stores = {}
+        if self.vectors is not None:
+            stores["vectors"] = {"path": self.vectors_path, "chunks": self.vectors.index.get_n_items()}
+        if self.hybrid is not None:
+            stores["hybrid"] = {"path": self.hybrid_path, "documents": self.hybrid.ix.doc_count()}
+        if self.database is not None:
+            stores["text"] = {"path": self.database_path, "documents": self.database.ix.doc_count()}
+        batcher = self.embedder.batcher if self.embedder is not None else None
+        return {"pid": os.getpid(), "uptime": time.time() - self.started if self.started else 0.0,
+                "requests": self.requests, "model_name": self.model_name, "cross_encoder": self.cross_encoder_name,
+                "stores": stores, "batching": batcher.stats() if batcher is not None else None}